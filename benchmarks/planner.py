@@ -0,0 +1,182 @@
+"""
+Benchmark of the planner hot path.
+
+Times single calculator calls, full grid sweeps, the find_* searches and multi-model plans
+over synthetic GPU catalogs (10 to 10,000 SKUs derived from the built-in cards), using the
+config.json fixtures in tests/fixtures/models. Reports throughput, peak traced memory and the
+allocations each call leaves behind; --baseline compares with an earlier --output and exits
+non-zero on regressions.
+
+    python benchmarks/planner.py -o before.json
+    python benchmarks/planner.py --baseline before.json --tolerance 0.2
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+# Fitted calibration profiles change the work done per sweep; keep runs comparable
+os.environ["RUNPOD_SERVE_CALIBRATION"] = tempfile.mkdtemp(prefix="runpod-serve-bench-")
+
+import numpy as np
+
+from runpod_model_serving.calculator import calculate_performance, sweep_performance
+from runpod_model_serving.hf_loader import get_model_params
+from runpod_model_serving.planner import PLAN_DEFAULTS, _plan_job
+from runpod_model_serving.runpod_manager import RunpodManager
+from runpod_model_serving.utils.gpu_data import GPU_CARDS, GpuCatalog
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests", "fixtures", "models")
+CATALOG_SIZES = [10, 100, 1000, 10000]
+
+# Grid of the sweep scenario: 2 x 1 x 2 x 2 x 4 = 32 points per SKU
+SWEEP_GRID = {
+    "quants": ["fp16", "int4"],
+    "kv_quants": ["fp8"],
+    "max_lengths": [8192, 32768],
+    "user_counts": [1, 32],
+    "parallel_gpus": [1, 2, 4, 8],
+}
+
+
+def synthetic_catalog(size, seed=0):
+    """GpuCatalog of size SKUs: the built-in cards with jittered speed and price, VRAM kept as is."""
+    rng = np.random.default_rng(seed)
+    cards = []
+    for i in range(size):
+        card = GPU_CARDS[i % len(GPU_CARDS)]
+        speed = rng.uniform(0.8, 1.25)
+        cards.append({
+            **card,
+            "name": f"{card['name']} #{i}",
+            "runpod_id": f"{card['runpod_id']} #{i}",
+            "memoryBandwidthGBs": card['memoryBandwidthGBs'] * speed,
+            "processPower": {"fp16": card['processPower']['fp16'] * speed},
+            "price_hr": round(card['price_hr'] * rng.uniform(0.7, 1.4), 3),
+        })
+    return GpuCatalog(cards)
+
+
+def load_models(cache_dir):
+    """{fixture name: resolved params} for every fixture model directory."""
+    models = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        path = os.path.join(FIXTURES_DIR, name)
+        if os.path.isdir(path):
+            models[name] = get_model_params(path, cache_dir=cache_dir)
+    return models
+
+
+def scenarios(models, catalog):
+    """(name, units per call, unit, fn) for one catalog; units turn call times into throughput."""
+    manager = RunpodManager()
+    params = models["llama-3.1-8b-instruct"]
+    points = len(catalog) * int(np.prod([len(values) for values in SWEEP_GRID.values()]))
+    entries = [{**PLAN_DEFAULTS, "model": name, "users": 16, "max_gpus": 16} for name in models]
+
+    def plan():
+        # The per-(model, quant) work of `runpod-serve plan`, without the process pool around it
+        return [_plan_job(entry, quant, models[entry["model"]], catalog) for entry in entries for quant in ("int4", "fp8")]
+
+    return [
+        ("sweep_performance", points, "points", lambda: sweep_performance(catalog, params, **SWEEP_GRID)),
+        ("find_best_gpu", 1, "plans", lambda: manager.find_best_gpu(params, user_count=16, catalog=catalog)),
+        ("find_parallel_setups", 1, "plans", lambda: manager.find_parallel_setups(params, user_count=64, max_gpus=16, catalog=catalog)),
+        ("find_best_gpu_for_slo", 1, "plans", lambda: manager.find_best_gpu_for_slo(
+            params, request_rate=2.0, prompt_lens=1000, output_lens=200, ttft_p99=2.0, itl_p99=0.1, catalog=catalog)),
+        ("plan_models", len(entries) * 2, "jobs", plan),
+    ]
+
+
+def measure(fn, repeat):
+    """(best seconds per call, peak traced KiB of one call, net allocated blocks one call leaves behind)."""
+    # Warm up caches (calibration profile, filtered catalogs, ...); calls slower than 1s are timed once
+    warmup = timeit.Timer(fn).timeit(number=1)
+    timer = timeit.Timer(fn)
+    if warmup > 1.0:
+        seconds = warmup if repeat <= 1 else timer.timeit(number=1)
+    else:
+        number, _ = timer.autorange()
+        seconds = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    return seconds, (peak - start) / 1024, blocks
+
+
+def compare(results, baseline, tolerance):
+    """Messages for every result that is slower or uses more memory than its baseline entry."""
+    previous = {(r["scenario"], r["catalog"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = previous.get((r["scenario"], r["catalog"]))
+        if not old:
+            continue
+        if r["throughput"] < old["throughput"] * (1 - tolerance):
+            regressions.append(f"{r['scenario']} @ {r['catalog']} SKUs: {r['throughput']:,.1f} {r['unit']}/s, was {old['throughput']:,.1f}")
+        if r["peak_kib"] > old["peak_kib"] * (1 + tolerance) + 64:
+            regressions.append(f"{r['scenario']} @ {r['catalog']} SKUs: peak {r['peak_kib']:,.0f} KiB, was {old['peak_kib']:,.0f}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the planner hot path over synthetic GPU catalogs")
+    parser.add_argument("--sizes", type=int, nargs="+", default=CATALOG_SIZES, help="Catalog sizes (SKUs)")
+    parser.add_argument("--scenarios", type=str, nargs="+", help="Only run these scenarios")
+    parser.add_argument("--repeat", type=int, default=5, help="Timing repeats per scenario (the best is reported)")
+    parser.add_argument("--output", "-o", type=str, help="Write the results as JSON")
+    parser.add_argument("--baseline", type=str, help="Results of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput loss / peak memory growth vs. the baseline")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        models = load_models(cache_dir)
+
+    results = []
+    seconds, peak_kib, blocks = measure(
+        lambda: calculate_performance(GPU_CARDS[1], models["llama-3.1-8b-instruct"], "int4", "fp8", 8192, 16), args.repeat
+    )
+    results.append({"scenario": "calculate_performance", "catalog": 1, "unit": "calls", "seconds": seconds,
+                    "throughput": 1 / seconds, "peak_kib": peak_kib, "net_blocks": blocks})
+
+    for size in args.sizes:
+        catalog = synthetic_catalog(size)
+        for name, units, unit, fn in scenarios(models, catalog):
+            if args.scenarios and name not in args.scenarios:
+                continue
+            seconds, peak_kib, blocks = measure(fn, args.repeat)
+            results.append({"scenario": name, "catalog": size, "unit": unit, "seconds": seconds,
+                            "throughput": units / seconds, "peak_kib": peak_kib, "net_blocks": blocks})
+
+    print(f"  {'scenario':<22} {'SKUs':>6} {'per call':>11} {'throughput':>20} {'peak KiB':>10} {'net blocks':>10}")
+    for r in results:
+        per_call = f"{r['seconds'] * 1000:.3f} ms" if r['seconds'] < 1 else f"{r['seconds']:.2f} s"
+        print(f"  {r['scenario']:<22} {r['catalog']:>6} {per_call:>11} {r['throughput']:>13,.1f} {r['unit'] + '/s':<6} "
+              f"{r['peak_kib']:>10,.0f} {r['net_blocks']:>10}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"python": sys.version.split()[0], "numpy": np.__version__, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
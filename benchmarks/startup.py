@@ -0,0 +1,120 @@
+"""
+Startup-time benchmark for planning-only invocations.
+
+Runs each scenario in fresh interpreters, reports the fastest wall time and the median overhead over an
+interpreter that only imports numpy in the same round (which the calculator needs anyway), and fails if a scenario
+exceeds its budget or executes one of the modules that only the deploy, bench and autoscale
+paths need (Runpod, HuggingFace, aiohttp, requests, asyncio).
+
+    python benchmarks/startup.py            # check against the default budgets
+    python benchmarks/startup.py --scale 2  # slower CI runners
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Modules that must not be executed on the planning path
+DEPLOY_ONLY_MODULES = ("runpod", "huggingface_hub", "aiohttp", "requests", "asyncio")
+
+# Overhead over `python -c "import numpy"` in ms; an SDK creeping back onto the import path
+# costs hundreds of ms (the Runpod SDK alone takes seconds)
+BUDGETS_MS = {
+    "import calculator": 80,
+    "import package": 80,
+    "cli --help": 120,
+    "cli --dry-run": 160,
+    "cli --dry-run --offline": 160,
+}
+
+# Small Qwen2-7B-like config, planned from a local snapshot so no network is touched
+SNAPSHOT_CONFIG = {
+    "model_type": "qwen2", "num_hidden_layers": 28, "num_attention_heads": 28, "num_key_value_heads": 4,
+    "hidden_size": 3584, "num_parameters": 7615616512,
+}
+
+_REPORT_LOADED = f"""
+import sys, types
+print("\\nLOADED=" + ",".join(m for m in {DEPLOY_ONLY_MODULES!r} if type(sys.modules.get(m)) is types.ModuleType))
+"""
+
+
+def scenarios(snapshot_dir):
+    main = "from runpod_model_serving.cli import main\ntry:\n    main({argv!r})\nexcept SystemExit:\n    pass\n"
+    return {
+        "import calculator": "import runpod_model_serving.calculator",
+        "import package": "import runpod_model_serving; runpod_model_serving.calculate_performance",
+        "cli --help": main.format(argv=["--help"]),
+        "cli --dry-run": main.format(argv=["--model", snapshot_dir, "--dry-run"]),
+        "cli --dry-run --offline": main.format(argv=["--model", snapshot_dir, "--dry-run", "--offline"]),
+    }
+
+
+def run_code(code, env):
+    """Wall time (s) of running code in a fresh interpreter, and the SDK modules it executed."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", code + _REPORT_LOADED], capture_output=True, text=True, env=env)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"scenario failed:\n{result.stderr}")
+    line = result.stdout.rsplit("LOADED=", 1)[-1].strip()
+    return elapsed, {name for name in line.split(",") if name}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Startup-time benchmark with budgets")
+    parser.add_argument("--runs", type=int, default=7, help="Rounds of fresh interpreters per scenario")
+    parser.add_argument("--scale", type=float, default=float(os.getenv("RUNPOD_SERVE_STARTUP_BUDGET_SCALE", 1.0)), help="Multiply all budgets (slow runners)")
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot_dir = os.path.join(tmp, "model")
+        os.makedirs(snapshot_dir)
+        with open(os.path.join(snapshot_dir, "config.json"), 'w') as f:
+            json.dump(SNAPSHOT_CONFIG, f)
+        # Isolated cache, so calibration profiles or cached params of the user do not change the timing.
+        # Without an API key, as in CI and scripts that only plan: live prices must not load the SDK.
+        env = {**os.environ, "RUNPOD_SERVE_CACHE": os.path.join(tmp, "cache"), "RUNPOD_SERVE_CALIBRATION": os.path.join(tmp, "calibration")}
+        env.pop("RUNPOD_API_KEY", None)
+        env.pop("RUNPOD_SERVE_GPU_MARKET", None)
+
+        # Rounds interleave all scenarios, so drift of the machine hits baseline and scenarios alike
+        codes = {"interpreter": "pass", "numpy": "import numpy", **scenarios(snapshot_dir)}
+        times = {name: [] for name in codes}
+        loaded = {name: set() for name in codes}
+        for _ in range(args.runs):
+            for name, code in codes.items():
+                elapsed, modules = run_code(code, env)
+                times[name].append(elapsed)
+                loaded[name] |= modules
+
+    interpreter, baseline = min(times["interpreter"]), min(times["numpy"])
+    results = []
+    for name in BUDGETS_MS:
+        best = min(times[name])
+        # Paired with the numpy run of the same round, then the median: robust to bursts of load
+        overhead_ms = statistics.median(t - b for t, b in zip(times[name], times["numpy"])) * 1000
+        budget_ms = BUDGETS_MS[name] * args.scale
+        results.append({
+            "scenario": name, "best_ms": best * 1000, "overhead_ms": overhead_ms, "budget_ms": budget_ms,
+            "sdk_loaded": sorted(loaded[name]), "ok": overhead_ms <= budget_ms and not loaded[name],
+        })
+
+    if args.json:
+        print(json.dumps({"interpreter_ms": interpreter * 1000, "numpy_ms": baseline * 1000, "results": results}, indent=2))
+    else:
+        print(f"Baseline: interpreter {interpreter * 1000:.0f} ms, with numpy {baseline * 1000:.0f} ms ({args.runs} runs per scenario)")
+        print(f"  {'scenario':<24} {'best':>8} {'overhead':>9} {'budget':>8}  status")
+        for r in results:
+            status = "ok" if r["ok"] else "FAIL" + (f" (loaded {', '.join(r['sdk_loaded'])})" if r["sdk_loaded"] else "")
+            print(f"  {r['scenario']:<24} {r['best_ms']:>6.0f}ms {r['overhead_ms']:>7.0f}ms {r['budget_ms']:>6.0f}ms  {status}")
+    return 0 if all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
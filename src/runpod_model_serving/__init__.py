@@ -1,5 +1,25 @@
-from .hf_loader import get_model_params
-from .calculator import calculate_performance
-from .runpod_manager import RunpodManager
+import importlib
 
-__all__ = ["get_model_params", "calculate_performance", "RunpodManager"]
+# Public API -> defining module; resolved on first access, so importing one submodule
+# (e.g. the calculator) does not load the others
+_EXPORTS = {
+    "get_model_params": "hf_loader",
+    "prefetch_model_params": "hf_loader",
+    "calculate_performance": "calculator",
+    "sweep_performance": "calculator",
+    "RunpodManager": "runpod_manager",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,262 @@
+import asyncio
+import functools
+import math
+import re
+import time
+
+from . import telemetry
+from .readiness import PROBE_TIMEOUT, pod_url
+from .utils.lazy import lazy_import
+
+aiohttp = lazy_import("aiohttp")
+
+# Scaling policy; every key can be overridden per Autoscaler
+SCALING_DEFAULTS = {
+    "min_replicas": 1,
+    "max_replicas": 4,
+    "target_utilization": 0.75,  # in-flight requests per replica as share of its estimated capacity
+    "scale_down_utilization": 0.4,  # scale in only if the smaller fleet stays below this share
+    "kv_high_watermark": 0.9,  # KV cache usage that, with queued requests, forces a scale out
+    "up_stabilization": 2,  # consecutive evaluations that must agree before scaling out
+    "down_stabilization": 5,  # ... before scaling in
+    "up_cooldown_s": 120.0,  # since the last scaling action
+    "down_cooldown_s": 600.0,
+    "max_step": 2,  # replicas added per scale out
+    "startup_timeout_s": 1200.0,  # a new replica that serves no metrics by then is terminated
+    "max_missed_scrapes": 5,  # consecutive failed scrapes before a serving replica counts as dead
+}
+
+# vLLM metric names (older names first); label sets of one metric are summed, KV usage takes the max
+VLLM_METRICS = {
+    "running": ("vllm:num_requests_running",),
+    "waiting": ("vllm:num_requests_waiting",),
+    "kv_cache_usage": ("vllm:gpu_cache_usage_perc", "vllm:kv_cache_usage_perc"),
+    "generation_tokens": ("vllm:generation_tokens_total",),
+    "prompt_tokens": ("vllm:prompt_tokens_total",),
+}
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})?\s+(\S+)')
+
+
+def parse_vllm_metrics(text):
+    """
+    Load figures from a vLLM /metrics page: {"running", "waiting", "kv_cache_usage",
+    "generation_tokens", "prompt_tokens"}; metrics the server does not export are None.
+    """
+    totals = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if not match or line.startswith("#"):
+            continue
+        try:
+            value = float(match.group(3))
+        except ValueError:
+            continue
+        name = match.group(1)
+        totals.setdefault(name, []).append(value)
+
+    metrics = {}
+    for key, names in VLLM_METRICS.items():
+        values = next((totals[name] for name in names if name in totals), None)
+        if values is None:
+            metrics[key] = None
+        else:
+            metrics[key] = max(values) if key == "kv_cache_usage" else sum(values)
+    return metrics
+
+
+async def scrape_replica(session, url, timeout=PROBE_TIMEOUT):
+    """Parsed /metrics of one replica (see parse_vllm_metrics), or None if it does not answer."""
+    try:
+        async with session.get(f"{url.rstrip('/')}/metrics", timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                return None
+            text = await response.text()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        return None
+    metrics = parse_vllm_metrics(text)
+    return metrics if metrics["running"] is not None else None
+
+
+class Autoscaler:
+    """
+    Keeps a fleet of identical vLLM replicas sized to its load. Each step scrapes every replica's
+    /metrics, compares the in-flight requests with the calculator's per-replica capacity and adds
+    or removes replicas through the manager (RunpodManager.deploy_fleet / terminate_pods), with
+    stabilization windows and cooldowns so that short bursts and lulls do not flap the fleet.
+    """
+
+    def __init__(self, manager, capacity, pod_ids, deploy_kwargs=None, url_for=None, clock=None, on_event=None, **policy):
+        unknown = set(policy) - set(SCALING_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown scaling options: {', '.join(sorted(unknown))}")
+        self.manager = manager
+        self.capacity = capacity
+        self.deploy_kwargs = deploy_kwargs or {}
+        self.url_for = url_for or pod_url
+        self.clock = clock or time.monotonic
+        self.on_event = on_event
+        self.policy = {**SCALING_DEFAULTS, **policy}
+
+        self.serving = {pod_id: {"missed": 0, "last": None} for pod_id in pod_ids}
+        self.starting = {}  # pod_id -> time it was created
+        self.created = []  # pods this autoscaler deployed
+        self.last_action = None  # time of the last scale out / in
+        self.up_votes = 0
+        self.down_votes = 0
+
+    @property
+    def replicas(self):
+        return len(self.serving) + len(self.starting)
+
+    def _event(self, action, message):
+        telemetry.count("autoscale_events", action=action)
+        if self.on_event:
+            self.on_event(action, message)
+
+    def decide(self, samples, now):
+        """
+        Target replica count for the current samples ({pod_id: metrics} of serving replicas).
+        Updates the stabilization counters; returns (target, reason).
+        """
+        p = self.policy
+        current = self.replicas
+        if not samples:
+            self.up_votes = self.down_votes = 0
+            target = max(current, p["min_replicas"])
+            return target, "below minimum" if target > current else "no metrics"
+
+        load = sum(m["running"] + (m["waiting"] or 0) for m in samples.values())
+        per_replica = self.capacity * p["target_utilization"]
+        wanted = math.ceil(load / per_replica) if per_replica > 0 else current
+        # Queued requests on a full KV cache mean latency is already suffering
+        saturated = any(
+            (m["waiting"] or 0) > 0 and (m["kv_cache_usage"] or 0) >= p["kv_high_watermark"] for m in samples.values()
+        )
+        if saturated:
+            wanted = max(wanted, current + 1)
+        since_action = now - self.last_action if self.last_action is not None else math.inf
+
+        if current < p["min_replicas"]:
+            self.up_votes = self.down_votes = 0
+            return p["min_replicas"], "below minimum"
+        if wanted > current and current < p["max_replicas"]:
+            self.down_votes = 0
+            self.up_votes += 1
+            if self.up_votes < p["up_stabilization"]:
+                return current, f"scale out pending ({self.up_votes}/{p['up_stabilization']})"
+            if since_action < p["up_cooldown_s"]:
+                return current, "scale out cooling down"
+            target = min(wanted, current + p["max_step"], p["max_replicas"])
+            return target, f"{load:.0f} in-flight requests for {current} x {self.capacity:.0f} capacity" + (" (KV cache saturated)" if saturated else "")
+
+        self.up_votes = 0
+        # Scale in only if one replica fewer would still stay well below the target
+        if not self.starting and current > p["min_replicas"] and load <= (current - 1) * self.capacity * p["scale_down_utilization"]:
+            self.down_votes += 1
+            if self.down_votes < p["down_stabilization"]:
+                return current, f"scale in pending ({self.down_votes}/{p['down_stabilization']})"
+            if since_action < p["down_cooldown_s"]:
+                return current, "scale in cooling down"
+            return current - 1, f"{load:.0f} in-flight requests fit on {current - 1} replicas"
+        self.down_votes = 0
+        return current, "steady"
+
+    async def _scrape(self, session, pod_ids):
+        results = await asyncio.gather(*[scrape_replica(session, self.url_for(pod_id)) for pod_id in pod_ids])
+        telemetry.count("autoscale_scrapes", value=len(pod_ids))
+        return dict(zip(pod_ids, results))
+
+    async def step(self, session):
+        """One scrape / decide / act cycle. Returns a status dict for logging."""
+        p = self.policy
+        now = self.clock()
+        scraped = await self._scrape(session, list(self.serving) + list(self.starting))
+
+        # Replicas that answer are serving; replicas that stop answering are replaced
+        for pod_id, started in list(self.starting.items()):
+            if scraped[pod_id]:
+                del self.starting[pod_id]
+                self.serving[pod_id] = {"missed": 0, "last": None}
+                self._event("ready", f"{pod_id} is serving after {now - started:.0f}s")
+            elif now - started > p["startup_timeout_s"]:
+                del self.starting[pod_id]
+                await self._terminate([pod_id], f"{pod_id} did not start within {p['startup_timeout_s']:.0f}s")
+        dead = []
+        for pod_id, state in self.serving.items():
+            if scraped.get(pod_id):
+                state["missed"] = 0
+            else:
+                state["missed"] += 1
+                if state["missed"] >= p["max_missed_scrapes"]:
+                    dead.append(pod_id)
+        if dead:
+            for pod_id in dead:
+                del self.serving[pod_id]
+            await self._terminate(dead, f"{', '.join(dead)} stopped answering")
+
+        samples = {pod_id: scraped[pod_id] for pod_id in self.serving if scraped.get(pod_id)}
+        gen_tok_s = 0.0
+        for pod_id, metrics in samples.items():
+            last = self.serving[pod_id]["last"]
+            if last and metrics["generation_tokens"] is not None and last[1] is not None and now > last[0]:
+                gen_tok_s += max(0.0, metrics["generation_tokens"] - last[1]) / (now - last[0])
+            self.serving[pod_id]["last"] = (now, metrics["generation_tokens"])
+
+        target, reason = self.decide(samples, now)
+        if target > self.replicas:
+            await self._scale_out(target - self.replicas, reason, now)
+        elif target < self.replicas:
+            await self._scale_in(self.replicas - target, samples, reason, now)
+
+        return {
+            "serving": len(self.serving),
+            "starting": len(self.starting),
+            "running": sum(m["running"] for m in samples.values()),
+            "waiting": sum(m["waiting"] or 0 for m in samples.values()),
+            "kv_cache_usage": max((m["kv_cache_usage"] or 0 for m in samples.values()), default=None),
+            "gen_tok_s": gen_tok_s,
+            "target": target,
+            "reason": reason,
+        }
+
+    async def _scale_out(self, count, reason, now):
+        self._event("up", f"adding {count} replica(s): {reason}")
+        pods = await asyncio.get_running_loop().run_in_executor(None, functools.partial(self.manager.deploy_fleet, count, **self.deploy_kwargs))
+        self.up_votes = 0
+        self.last_action = now
+        if not pods:
+            self._event("error", "could not create replicas; retrying after the cooldown")
+            return
+        for pod in pods:
+            self.starting[pod['id']] = now
+            self.created.append(pod['id'])
+
+    async def _scale_in(self, count, samples, reason, now):
+        # The least busy replicas drop the fewest in-flight requests
+        victims = sorted(samples, key=lambda pod_id: samples[pod_id]["running"] + (samples[pod_id]["waiting"] or 0))[:count]
+        for pod_id in victims:
+            del self.serving[pod_id]
+        self.down_votes = 0
+        self.last_action = now
+        await self._terminate(victims, f"removing {', '.join(victims)}: {reason}", action="down")
+
+    async def _terminate(self, pod_ids, message, action="replace"):
+        self._event(action, message)
+        results = await asyncio.get_running_loop().run_in_executor(None, self.manager.terminate_pods, pod_ids)
+        failed = [pod_id for pod_id, success in (results or {}).items() if not success]
+        if failed:
+            self._event("error", f"failed to terminate {', '.join(failed)}")
+
+    async def run(self, interval=15.0, max_steps=None, on_step=None, max_connections=100):
+        """Scales until cancelled (or for max_steps cycles); on_step(status) is called after each cycle."""
+        connector = aiohttp.TCPConnector(limit=max_connections)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            steps = 0
+            while max_steps is None or steps < max_steps:
+                with telemetry.span("autoscale_step"):
+                    status = await self.step(session)
+                if on_step:
+                    on_step(status)
+                steps += 1
+                if max_steps is None or steps < max_steps:
+                    await asyncio.sleep(interval)
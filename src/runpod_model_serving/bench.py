@@ -0,0 +1,298 @@
+import asyncio
+import json
+import re
+import time
+
+import numpy as np
+
+from .calculator import (
+    attention_layout, calculate_performance, compute_kv_block_bytes, compute_layered_kv_cache_vram_gb, compute_model_vram_gb,
+    predict_latency, quant_bytes_per_param, sweep_performance
+)
+from .utils.gpu_data import GPU_CATALOG
+from .utils.lazy import lazy_import
+
+aiohttp = lazy_import("aiohttp")
+requests = lazy_import("requests")
+
+PERCENTILES = (50, 95, 99)
+
+# Filler words for synthetic prompts; each is one token for common BPE vocabularies
+_WORDS = ["the", "of", "and", "to", "in", "is", "for", "on", "with", "as", "by", "at", "from", "it", "an", "be"]
+
+
+def sample_requests(workload, num_requests, seed=0):
+    """
+    Draws num_requests (prompt_len, output_len) pairs from a workload profile, weighted by its counts.
+    """
+    rng = np.random.default_rng(seed)
+    counts = workload["counts"]
+    idx = rng.choice(len(counts), size=num_requests, p=counts / counts.sum())
+    return [(int(workload["prompt_lens"][i]), max(1, int(workload["output_lens"][i]))) for i in idx]
+
+
+def synthetic_prompt(prompt_len, index, shared_len=0):
+    """
+    Prompt of about prompt_len tokens. The first shared_len tokens are the same for every request
+    (a cacheable prefix), the rest starts with the request index so it is never a cache hit.
+    """
+    shared = " ".join(_WORDS[i % len(_WORDS)] for i in range(shared_len))
+    unique = " ".join(_WORDS[(i * 7 + index) % len(_WORDS)] for i in range(max(prompt_len - shared_len - 1, 0)))
+    return f"{shared} {index} {unique}".strip()
+
+
+def _payload(endpoint, model, prompt, output_len):
+    payload = {
+        "model": model,
+        "max_tokens": output_len,
+        "stream": True,
+        "stream_options": {"include_usage": True},
+        # vLLM extension: always generate max_tokens, so output lengths follow the trace
+        "ignore_eos": True,
+        "temperature": 0.0,
+    }
+    if endpoint == "chat":
+        payload["messages"] = [{"role": "user", "content": prompt}]
+    else:
+        payload["prompt"] = prompt
+    return payload
+
+
+async def _send(session, url, payload, timeout):
+    # Only chunks carrying usage are JSON-decoded; content chunks are just timestamped as they arrive
+    result = {"ok": False, "error": None, "ttft": None, "chunk_times": [], "output_tokens": 0, "latency": None}
+    start = time.perf_counter()
+    try:
+        async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=timeout)) as response:
+            if response.status != 200:
+                result["error"] = f"HTTP {response.status}: {(await response.text())[:200]}"
+                return result
+            async for line in response.content:
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                if b'"usage"' in data:
+                    chunk = json.loads(data)
+                    usage = chunk.get("usage") or {}
+                    result["output_tokens"] = usage.get("completion_tokens", result["output_tokens"])
+                    if not chunk.get("choices"):
+                        continue
+                if b'"content":""' in data or b'"content": ""' in data:
+                    # Chat streams open with a role-only delta that carries no token
+                    continue
+                result["chunk_times"].append(time.perf_counter() - start)
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+    result["latency"] = time.perf_counter() - start
+    if not result["chunk_times"]:
+        result["error"] = "empty response"
+        return result
+    result["ok"] = True
+    result["ttft"] = result["chunk_times"][0]
+    result["output_tokens"] = result["output_tokens"] or len(result["chunk_times"])
+    return result
+
+
+async def run_benchmark(base_url, model, requests, endpoint="completions", rate=None, concurrency=None,
+                        shared_prefix_ratio=0.0, timeout=600, seed=0):
+    """
+    Replays (prompt_len, output_len) requests against an OpenAI-compatible server with streaming.
+    With rate, requests arrive as a Poisson process at rate req/s (open loop); otherwise
+    concurrency requests are kept in flight (closed loop, default 1).
+    Returns (results, wall_seconds); every result carries ok / error, ttft, chunk_times and output_tokens.
+    """
+    url = base_url.rstrip("/") + ("/v1/chat/completions" if endpoint == "chat" else "/v1/completions")
+    payloads = [
+        _payload(endpoint, model, synthetic_prompt(prompt_len, i, int(prompt_len * shared_prefix_ratio)), output_len)
+        for i, (prompt_len, output_len) in enumerate(requests)
+    ]
+    results = [None] * len(payloads)
+    connector = aiohttp.TCPConnector(limit=0 if rate else (concurrency or 1))
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        if rate:
+            arrivals = np.cumsum(np.random.default_rng(seed).exponential(1 / rate, len(payloads)))
+
+            async def fire(i):
+                await asyncio.sleep(max(0.0, arrivals[i] - (time.perf_counter() - start)))
+                results[i] = await _send(session, url, payloads[i], timeout)
+
+            await asyncio.gather(*[fire(i) for i in range(len(payloads))])
+        else:
+            pending = iter(range(len(payloads)))
+
+            async def worker():
+                for i in pending:
+                    results[i] = await _send(session, url, payloads[i], timeout)
+
+            await asyncio.gather(*[worker() for _ in range(concurrency or 1)])
+        wall = time.perf_counter() - start
+
+    for result, (prompt_len, output_len) in zip(results, requests):
+        result["prompt_len"] = prompt_len
+        result["requested_output_len"] = output_len
+    return results, wall
+
+
+def _percentiles(values, name):
+    if len(values) == 0:
+        return {f"{name}_p{p}": None for p in PERCENTILES}
+    points = np.percentile(np.asarray(values), PERCENTILES)
+    return {f"{name}_p{p}": float(v) for p, v in zip(PERCENTILES, points)}
+
+
+def summarize_results(results, wall_s):
+    """
+    Aggregates benchmark results: TTFT, inter-token latency (gaps between streamed chunks),
+    time per output token and per-request decode tok/s at p50 / p95 / p99, plus totals.
+    """
+    ok = [r for r in results if r["ok"]]
+    itl = np.concatenate([np.diff(r["chunk_times"]) for r in ok]) if ok else np.array([])
+    tpot = np.array([(r["latency"] - r["ttft"]) / (r["output_tokens"] - 1) for r in ok if r["output_tokens"] > 1])
+    output_tokens = sum(r["output_tokens"] for r in ok)
+
+    summary = {
+        "requests": len(results),
+        "completed": len(ok),
+        "error_rate": 1 - len(ok) / len(results) if results else 0.0,
+        "wall_s": wall_s,
+        "request_rate": len(ok) / wall_s if wall_s else 0.0,
+        "output_tokens": output_tokens,
+        "output_tok_s": output_tokens / wall_s if wall_s else 0.0,
+    }
+    summary.update(_percentiles([r["ttft"] for r in ok], "ttft"))
+    summary.update(_percentiles(itl, "itl"))
+    summary.update(_percentiles(tpot, "tpot"))
+    summary.update(_percentiles(1 / tpot[tpot > 0], "user_tok_s"))
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    summary["errors"] = errors
+    return summary
+
+
+def predict_benchmark(gpu, model_params, requests, quant, kv_quant, max_length, gpu_count=1, rate=None, concurrency=None,
+                      vram_util=0.9):
+    """
+    Calculator predictions for a benchmark run on gpu_count x gpu, in the units of summarize_results.
+    Closed loop uses the roofline at a batch of concurrency; open loop the queueing model at rate.
+    """
+    prompt_lens = np.array([p for p, _ in requests], dtype=np.float64)
+    output_lens = np.array([o for _, o in requests], dtype=np.float64)
+    users = concurrency or 1
+    details = calculate_performance(
+        gpu, model_params, quant, kv_quant, max_length, users, parallel_gpus=gpu_count, vram_util=vram_util,
+        mean_prompt_len=float(prompt_lens.mean()), mean_output_len=float(output_lens.mean()), batch_size=users
+    )
+    prediction = {
+        "gen_speed": details["gen_speed"],
+        "shared_gen": details["shared_gen"],
+        "full_length_gen_count": details["full_length_gen_count"],
+    }
+    if rate:
+        sweep = sweep_performance(
+            [gpu], model_params, quant, kv_quant, max_length, 1, parallel_gpus=gpu_count, vram_util=vram_util,
+            mean_prompt_len=float(prompt_lens.mean()), mean_output_len=float(output_lens.mean())
+        )
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            latency = predict_latency(sweep, model_params, rate, prompt_lens, output_lens)
+        prediction.update({
+            "ttft_p50": latency["ttft_p50"][0].item(),
+            "ttft_p99": latency["ttft_p99"][0].item(),
+            "itl_p50": latency["itl_p50"][0].item(),
+            "itl_p99": latency["itl_p99"][0].item(),
+            "output_tok_s": rate * float(output_lens.mean()) if latency["stable"][0] else details["decode_tok_s"],
+            "user_tok_s_p50": 1 / latency["itl_p50"][0].item(),
+            "stable": bool(latency["stable"][0]),
+        })
+    else:
+        prediction.update({
+            "ttft_p50": details["ttft_s"],
+            "itl_p50": 1 / details["decode_tok_s_per_user"],
+            "output_tok_s": details["decode_tok_s_per_user"] * min(users, len(requests)),
+            "user_tok_s_p50": details["decode_tok_s_per_user"],
+        })
+    return prediction
+
+
+def compare_to_prediction(summary, prediction):
+    """Rows of (metric, measured, predicted, measured / predicted) for every predicted metric that was measured."""
+    rows = []
+    for key in ("ttft_p50", "ttft_p99", "itl_p50", "itl_p99", "user_tok_s_p50", "output_tok_s"):
+        measured, predicted = summary.get(key), prediction.get(key)
+        if measured is None or predicted is None:
+            continue
+        rows.append((key, measured, predicted, measured / predicted if predicted else float('inf')))
+    return rows
+
+
+def fetch_kv_blocks(base_url, timeout=10):
+    """
+    Number of KV cache blocks vLLM allocated (cache_config_info on /metrics), or None.
+    """
+    try:
+        response = requests.get(base_url.rstrip("/") + "/metrics", timeout=timeout)
+        response.raise_for_status()
+    except requests.RequestException:
+        return None
+    match = re.search(r'cache_config_info\{[^}]*num_gpu_blocks="(\d+)"', response.text)
+    return int(match.group(1)) if match else None
+
+
+def calibration_measurement(report, model_params):
+    """
+    Turns a saved benchmark report (runpod-serve bench -o) into a measurement record for
+    calibration.fit_calibration. Decode speed comes from the median time per output token at the
+    closed-loop concurrency, prefill speed from the TTFT of single-request runs and the activation
+    overhead from the KV block count vLLM reported. Returns None if the report has no setup.
+    """
+    setup = report.get("setup")
+    summary = report["summary"]
+    card = GPU_CATALOG.find(setup["gpu"]) if setup and setup.get("gpu") else None
+    if not card:
+        return None
+
+    ok = [r for r in report["results"] if r["ok"]]
+    prompt_len = float(np.mean([r["prompt_len"] for r in ok])) if ok else 0.0
+    output_len = float(np.mean([r["output_tokens"] for r in ok])) if ok else 0.0
+    quant_bytes = quant_bytes_per_param(setup["quant"], model_params.get('weights'))
+    attention = attention_layout(model_params)
+    kv_read_gb = compute_layered_kv_cache_vram_gb(attention, int(prompt_len + output_len / 2), setup["kv_quant"], block_size=1)
+    total, active = model_params['total_params_b'], model_params['active_params_b']
+
+    measurement = {
+        "gpu": card["name"],
+        "count": setup["count"],
+        "architecture": model_params.get('architecture'),
+        "total_params_b": total,
+        "active_params_b": active,
+        "quant_bytes": quant_bytes,
+        "prompt_len": prompt_len,
+        "vram_gb": card["vramGb"],
+        "vram_util": setup["util"],
+        "model_vram_gb": compute_model_vram_gb(total, setup["quant"], model_params.get('weights')),
+        "kv_blocks": setup.get("kv_blocks"),
+        "kv_block_bytes": compute_kv_block_bytes(attention, setup["kv_quant"]),
+        "batch": None,
+        "step_s": None,
+        "prefill_s": None,
+    }
+    # Open-loop runs have no fixed batch, so only closed-loop runs calibrate decode / prefill
+    if not setup.get("rate") and summary.get("tpot_p50"):
+        batch = setup["concurrency"]
+        weight_gb = total * quant_bytes * (1 - (1 - active / total)**batch)
+        measurement.update({
+            "batch": batch,
+            "step_s": summary["tpot_p50"],
+            "decode_bytes_gb": weight_gb + batch * kv_read_gb * 1024**3 / 1e9,
+        })
+        if batch == 1 and summary["ttft_p50"] > summary["tpot_p50"]:
+            measurement["prefill_s"] = summary["ttft_p50"] - summary["tpot_p50"]
+            measurement["prefill_tflop"] = prompt_len * 2 * active * 1e9 / 1e12
+    return measurement
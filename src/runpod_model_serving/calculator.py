@@ -1,10 +1,61 @@
 import math
+import numpy as np
+from .calibration import arch_coefficients, gpu_coefficient_arrays, load_calibration
+from .utils.gpu_data import GpuCatalog
+from .workload import weighted_percentile
 
-def compute_model_vram_gb(total_params_b, quant):
+# bytes per stored value for weight / KV quantization modes
+QUANT_BYTES = {'fp16': 2, 'fp8': 1, 'int8': 1, 'int4': 0.5}
+
+# vLLM paged-attention block size (tokens per KV block)
+KV_BLOCK_SIZE = 16
+
+# Mamba / linear-attention states are kept in the model dtype, not the KV cache dtype
+STATE_BYTES = 2
+
+# Fraction of peak FLOPs / memory bandwidth reachable in practice (roofline model);
+# calibration profiles override them per GPU type
+COMPUTE_EFFICIENCY = 0.5
+BANDWIDTH_EFFICIENCY = 0.8
+
+# Share of ideal throughput a pipeline-parallel replica keeps after pipeline bubbles
+PIPELINE_EFFICIENCY = 0.9
+
+# Mean output length assumed when none is given; the rest of max_length is prompt
+DEFAULT_OUTPUT_LEN = 512
+
+# One-sided z-score of the 99th percentile, for normal approximations of summed KV occupancy
+Z_P99 = 2.326
+
+# Prefill chunk size per engine step (vLLM --max-num-batched-tokens with chunked prefill)
+DEFAULT_MAX_NUM_BATCHED_TOKENS = 2048
+
+# Cold start model: pulling the vLLM image, fetching the weights and loading them onto the GPUs
+IMAGE_PULL_S = 150  # vllm/vllm-openai, ~10 GB of layers incl. extraction
+HF_DOWNLOAD_GBS = 0.25  # sustained HuggingFace download into a pod
+NETWORK_VOLUME_READ_GBS = 0.5  # reading a pre-populated HF cache from a Runpod network volume
+DISK_READ_GBS = 2.0  # container disk to GPU, per GPU worker
+ENGINE_INIT_S = 60  # profiling, CUDA graph capture and compilation
+
+def quant_bytes_per_param(quant, weights=None):
+    """
+    Bytes per weight for a quantization mode. 'auto' serves the checkpoint as stored,
+    so its average bytes per parameter come from the safetensors totals.
+    """
+    if quant == 'auto' and weights and weights['total_params']:
+        return weights['total_bytes'] / weights['total_params']
+    return QUANT_BYTES.get(quant, 2)
+
+
+def compute_model_vram_gb(total_params_b, quant, weights=None):
     """
     model_weight_size = num_of_model_parameter * size_per_param
     Typically, size_per_param is determined by different model_weight_quantization method
+    With quant='auto' and exact safetensors totals (weights), the stored checkpoint bytes are used as is.
     """
+    if quant == 'auto' and weights:
+        return weights['total_bytes'] / 1e9
+
     # size_per_param = raw_value + index_stuff (3/AWQ-group)
     # Based on formulas.ts and llm_calc.md
     if quant == 'fp16':
@@ -44,87 +95,556 @@ def compute_kv_cache_vram_gb(layers, num_kv_heads, head_dim, max_length, quant):
     total_bytes = head_dim * num_kv_heads * layers * 2 * max_length * bytes_per_value
     return total_bytes / (1024**3)
 
-def calculate_performance(gpu, model_params, quant, kv_quant, max_length, user_count, parallel_gpus=1, vram_util=0.9, min_reserve_gb=2):
-    model_vram = compute_model_vram_gb(model_params['total_params_b'], quant)
-    kv_cache_vram_one = compute_kv_cache_vram_gb(
-        model_params['layers'], 
-        model_params['num_kv_heads'], 
-        model_params['head_dim'], 
-        max_length, 
-        kv_quant
+
+def attention_layout(model_params):
+    """
+    Per-layer cache groups of a model (see hf_loader). Param dicts without one
+    are treated as uniform full attention over all layers.
+    """
+    if model_params.get('attention'):
+        return model_params['attention']
+    return [{
+        "type": "full",
+        "count": model_params['layers'],
+        "token_elems": 2 * model_params['num_kv_heads'] * model_params['head_dim'],
+        "window": None,
+        "state_elems": 0,
+    }]
+
+
+def compute_layered_kv_cache_vram_gb(attention, max_length, quant, block_size=KV_BLOCK_SIZE):
+    """
+    KV cache of one request, summed per layer group (max_length may be a NumPy array).
+    Cached tokens are rounded up to whole paged blocks, sliding-window layers keep at most
+    `window` tokens and recurrent layers (Mamba / linear attention) hold a fixed state.
+    """
+    bytes_per_value = QUANT_BYTES.get(quant, 2)
+    total_bytes = 0
+    for group in attention:
+        tokens = np.minimum(max_length, group['window']) if group['window'] else max_length
+        tokens = np.ceil(np.divide(tokens, block_size)) * block_size
+        total_bytes += group['count'] * (group['token_elems'] * tokens * bytes_per_value + group['state_elems'] * STATE_BYTES)
+    return total_bytes / (1024**3)
+
+
+def compute_kv_block_bytes(attention, quant, block_size=KV_BLOCK_SIZE):
+    """
+    Bytes of one paged KV block (block_size tokens) across all token-caching layers.
+    """
+    return sum(g['count'] * g['token_elems'] for g in attention) * block_size * QUANT_BYTES.get(quant, 2)
+
+
+def compute_roofline(process_power_tflops, memory_bandwidth_gbs, total_params_b, active_params_b, quant_bytes, kv_read_gb, batch_size, prompt_len,
+                     compute_efficiency=COMPUTE_EFFICIENCY, bandwidth_efficiency=BANDWIDTH_EFFICIENCY):
+    """
+    Roofline estimate of batched decode and of prefill; works element-wise on NumPy arrays.
+    One decode step reads the weights once for the whole batch plus every request's KV cache
+    (kv_read_gb per request), and costs 2 * active_params FLOPs per sequence in the batch.
+    process_power_tflops / memory_bandwidth_gbs are the peak numbers of the whole (multi-GPU) setup.
+    """
+    compute = np.asarray(process_power_tflops, dtype=np.float64) * 1e12 * compute_efficiency
+    bandwidth = np.asarray(memory_bandwidth_gbs, dtype=np.float64) * 1e9 * bandwidth_efficiency
+    batch_size = np.asarray(batch_size, dtype=np.float64)
+    flops_per_token = 2 * active_params_b * 1e9
+    kv_bytes = np.asarray(kv_read_gb, dtype=np.float64) * (1024**3)
+    active_ratio = active_params_b / total_params_b
+
+    def weight_bytes(tokens):
+        # MoE: a batch of n tokens touches about 1 - (1 - active/total)^n of the expert weights
+        return total_params_b * 1e9 * quant_bytes * (1 - np.power(1 - active_ratio, tokens))
+
+    step_time = np.maximum(
+        (weight_bytes(batch_size) + batch_size * kv_bytes) / bandwidth,
+        batch_size * flops_per_token / compute
     )
-    
-    total_gpu_vram = gpu['vramGb'] * parallel_gpus
-    
-    # vLLM logic:
-    # 1. Managed Pool = Total VRAM * gpu_memory_utilization
+    prefill_time = np.maximum(prompt_len * flops_per_token / compute, weight_bytes(prompt_len) / bandwidth)
+
+    # Decode turns compute-bound once B * flops / compute >= (weights(B) + B * kv) / bandwidth.
+    # weights(B) saturates, so iterate B = weights(B) / (bandwidth * slope) to its fixed point.
+    slope = flops_per_token / compute - kv_bytes / bandwidth
+    with np.errstate(divide='ignore', invalid='ignore'):
+        critical_batch = np.ones_like(slope)
+        for _ in range(20):
+            critical_batch = np.maximum(1.0, weight_bytes(critical_batch) / (bandwidth * slope))
+        critical_batch = np.where(slope > 0, critical_batch, np.inf)
+
+    return {
+        "decode_batch": batch_size,
+        "decode_tok_s": batch_size / step_time,
+        "decode_tok_s_per_user": 1 / step_time,
+        "prefill_tok_s": prompt_len / prefill_time,
+        "ttft_s": prefill_time + step_time,
+        "critical_batch": critical_batch,
+        "compute_bound": batch_size >= critical_batch,
+    }
+
+
+def compute_workload_kv(attention, workload, quant):
+    """
+    KV cache statistics of one running request under a workload profile (see workload.make_workload).
+    A request's KV grows from its prompt to prompt + output while decoding, so its time-averaged
+    footprint uses prompt + output / 2, and requests are weighted by their residence time (output length).
+    With a shared-prefix ratio the common prefix is stored once (prefix caching) instead of per request.
+    Returns {"mean_gb", "std_gb", "peak_p99_gb", "shared_gb"}.
+    """
+    ratio = workload['shared_prefix_ratio']
+    prompt = workload['prompt_lens']
+    output = workload['output_lens']
+    counts = workload['counts']
+    unique_prompt = prompt * (1 - ratio)
+
+    avg_kv = compute_layered_kv_cache_vram_gb(attention, unique_prompt + output / 2, quant) * np.ones(len(prompt))
+    peak_kv = compute_layered_kv_cache_vram_gb(attention, unique_prompt + output, quant) * np.ones(len(prompt))
+    residence = counts * np.maximum(output, 1)
+    mean = float(np.average(avg_kv, weights=residence))
+    std = float(np.sqrt(np.average((avg_kv - mean)**2, weights=residence)))
+
+    shared = 0.0
+    if ratio > 0:
+        shared_tokens = ratio * np.average(prompt, weights=counts)
+        # Prefix blocks only; the fixed per-request state is already part of every request
+        shared = float(compute_layered_kv_cache_vram_gb(attention, shared_tokens, quant) - compute_layered_kv_cache_vram_gb(attention, 0, quant))
+
+    return {
+        "mean_gb": mean,
+        "std_gb": std,
+        "peak_p99_gb": weighted_percentile(peak_kv, counts, 99),
+        "shared_gb": shared,
+    }
+
+
+def _normal_sf(x):
+    # Survival function of the standard normal distribution, element-wise
+    # (frompyfunc hands back a plain float for scalar input)
+    return 0.5 * np.asarray(np.frompyfunc(math.erfc, 1, 1)(np.asarray(x, dtype=np.float64) / math.sqrt(2)), dtype=np.float64)
+
+
+def workload_concurrency(usable_kv_gb, kv_stats, user_count):
+    """
+    Sizes the KV pool against a workload instead of full-length contexts.
+    The summed KV of N running requests is approximated as normal with mean N * mean and
+    standard deviation sqrt(N) * std. Returns the effective concurrency (largest N whose p99
+    occupancy fits), the mean / p99 occupancy at user_count and the preemption risk
+    (probability that user_count running requests overflow the pool).
+    """
+    mean, std = kv_stats['mean_gb'], kv_stats['std_gb']
+    pool = np.maximum(np.asarray(usable_kv_gb, dtype=np.float64) - kv_stats['shared_gb'], 0)
+    user_count = np.asarray(user_count, dtype=np.float64)
+
+    # Solve N * mean + Z * sqrt(N) * std = pool for sqrt(N)
+    root_n = (-Z_P99 * std + np.sqrt((Z_P99 * std)**2 + 4 * mean * pool)) / (2 * mean)
+    occupancy_mean = user_count * mean + kv_stats['shared_gb']
+    occupancy_p99 = occupancy_mean + Z_P99 * np.sqrt(user_count) * std
+    if std > 0:
+        risk = _normal_sf((pool - user_count * mean) / (np.sqrt(user_count) * std))
+    else:
+        risk = (user_count * mean > pool).astype(np.float64)
+
+    return {
+        "workload_concurrency": np.floor(root_n**2),
+        "kv_occupancy_mean": occupancy_mean,
+        "kv_occupancy_p99": occupancy_p99,
+        "preemption_risk": risk,
+    }
+
+
+def length_stats(lengths):
+    """
+    Summary of a token length distribution: a single number (deterministic) or a list of samples.
+    Returns {"mean", "m2" (second moment), "p50", "p99"}.
+    """
+    samples = np.atleast_1d(np.asarray(lengths, dtype=np.float64))
+    return {
+        "mean": float(samples.mean()),
+        "m2": float(np.mean(samples**2)),
+        "p50": float(np.percentile(samples, 50)),
+        "p99": float(np.percentile(samples, 99)),
+    }
+
+
+# erlang_c checks every this many recursion steps whether the closed-form tail is exact to this relative error
+ERLANG_CHECK_EVERY = 16
+ERLANG_TAIL_TOLERANCE = 1e-12
+
+_lgamma = np.vectorize(math.lgamma, otypes=[np.float64])
+
+
+def erlang_c(servers, offered_load):
+    """
+    Probability that an arrival has to wait in an M/M/c queue (element-wise on arrays).
+    Uses the numerically stable Erlang B recursion.
+    """
+    servers = np.asarray(servers, dtype=np.float64)
+    offered_load = np.asarray(offered_load, dtype=np.float64)
+    erlang_b = np.ones(np.broadcast(servers, offered_load).shape)
+    for k in range(1, int(np.max(servers, initial=0)) + 1):
+        step = offered_load * erlang_b / (k + offered_load * erlang_b)
+        erlang_b = np.where(k <= servers, step, erlang_b)
+        # Small models have ~1e5 KV slots: once a * B << k everywhere, every further step is
+        # B *= a / k, so the rest of the product is a^(c - k) k! / c!, taken in log space
+        if k % ERLANG_CHECK_EVERY == 0 and np.all((servers <= k) | (offered_load * erlang_b < ERLANG_TAIL_TOLERANCE * k)):
+            last = np.floor(servers)
+            with np.errstate(divide='ignore', invalid='ignore', over='ignore', under='ignore'):
+                log_tail = (last - k) * np.log(offered_load) - (_lgamma(last + 1) - math.lgamma(k + 1))
+                erlang_b = np.where(servers > k, erlang_b * np.exp(log_tail), erlang_b)
+            break
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wait_prob = servers * erlang_b / (servers - offered_load * (1 - erlang_b))
+    return np.where(offered_load < servers, np.clip(wait_prob, 0, 1), 1.0)
+
+
+def _exponential_tail_quantile(mean_wait, wait_prob, q):
+    # Waiting time with P(W > t) = wait_prob * exp(-t * wait_prob / mean_wait)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = mean_wait / wait_prob * np.log(wait_prob / (1 - q))
+    return np.where(wait_prob > 1 - q, np.nan_to_num(t, nan=0.0), 0.0)
+
+
+def predict_latency(sweep, model_params, request_rate, prompt_lens, output_lens, chunk_tokens=DEFAULT_MAX_NUM_BATCHED_TOKENS):
+    """
+    Queueing model on top of a sweep_performance result for Poisson arrivals at request_rate (req/s).
+    Prefill is an M/G/1 queue (one prompt at a time, Pollaczek-Khinchine). Decode slots
+    (the KV concurrency) form an M/M/c queue. The steady decode batch is the fixed point of
+    Little's law B = rate * output_len * ITL(B), where ITL comes from the roofline model and is
+    stretched by the prefill work interleaved into the decode steps.
+    Returns a dict of arrays aligned with the sweep rows (latencies in seconds).
+    """
+    prompt = length_stats(prompt_lens)
+    output = length_stats(output_lens)
+    prefill_rate = sweep['prefill_tok_s']
+    slots = np.maximum(np.floor(sweep['full_length_gen_count']), 1)
+
+    def step_time(batch):
+        roofline = compute_roofline(
+            sweep['process_power'], sweep['memory_bandwidth'], model_params['total_params_b'],
+            model_params['active_params_b'], sweep['quant_bytes'], sweep['kv_read_gb'], batch, prompt['mean'],
+            sweep['compute_efficiency'], sweep['bandwidth_efficiency']
+        )
+        return 1 / roofline['decode_tok_s_per_user']
+
+    # Prefill: M/G/1 with service time prompt / prefill_rate
+    prefill_util = request_rate * prompt['mean'] / prefill_rate
+    with np.errstate(divide='ignore', invalid='ignore'):
+        prefill_wait = np.where(
+            prefill_util < 1, request_rate * prompt['m2'] / prefill_rate**2 / (2 * (1 - prefill_util)), np.inf
+        )
+
+    # Decode: fixed point of Little's law for the mean running batch, capped by the KV slots.
+    # A lone request still pays a full step, so ITL is evaluated at a batch of at least 1.
+    batch = np.ones_like(slots)
+    for _ in range(30):
+        itl = step_time(np.maximum(batch, 1)) / np.maximum(1 - prefill_util, 1e-9)
+        batch = np.clip(request_rate * output['mean'] * itl, 0, slots)
+    base_itl = step_time(np.maximum(batch, 1))
+    itl = base_itl / np.maximum(1 - prefill_util, 1e-9)
+
+    # Admission: M/M/c over the KV slots with service time output_len * ITL at full batch
+    full_batch_step = step_time(slots)
+    service_time = output['mean'] * full_batch_step / np.maximum(1 - prefill_util, 1e-9)
+    offered_load = request_rate * service_time
+    wait_prob = erlang_c(slots, offered_load)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        admission_wait = np.where(offered_load < slots, wait_prob * service_time / (slots - offered_load), np.inf)
+
+    stable = (prefill_util < 1) & (offered_load < slots)
+    # Share of the serving capacity in use: prefill time plus decode work relative to a full batch
+    utilization = prefill_util + request_rate * output['mean'] * full_batch_step / slots
+
+    def ttft(q, prompt_tokens):
+        prefill_q = _exponential_tail_quantile(prefill_wait, np.minimum(prefill_util, 1), q)
+        admission_q = _exponential_tail_quantile(admission_wait, wait_prob, q)
+        with np.errstate(over='ignore', invalid='ignore'):
+            return np.where(stable, prompt_tokens / prefill_rate + prefill_q + admission_q + base_itl, np.inf)
+
+    # ITL percentiles start from the stretched mean step; a step that also carries a prefill
+    # chunk is slower by that chunk's compute time, so the percentiles never undercut the mean
+    chunk_time = min(prompt['p99'], chunk_tokens) / prefill_rate
+    chunk_prob = np.minimum(1, request_rate * itl * math.ceil(prompt['mean'] / chunk_tokens))
+
+    with np.errstate(over='ignore', invalid='ignore'):
+        ttft_mean = np.where(stable, prompt['mean'] / prefill_rate + prefill_wait + admission_wait + base_itl, np.inf)
+
+    return {
+        "stable": stable,
+        "utilization": utilization,
+        "steady_batch": batch,
+        "ttft_mean": ttft_mean,
+        "ttft_p50": ttft(0.50, prompt['p50']),
+        "ttft_p99": ttft(0.99, prompt['p99']),
+        "itl_mean": np.where(stable, itl, np.inf),
+        "itl_p50": np.where(stable, itl + np.where(chunk_prob >= 0.5, chunk_time, 0), np.inf),
+        "itl_p99": np.where(stable, itl + np.where(chunk_prob >= 0.01, chunk_time, 0), np.inf),
+    }
+
+
+# pareto_front settles this many candidate rows at once (block_size^2 x k booleans per step)
+PARETO_BLOCK_SIZE = 64
+
+
+def pareto_front(objectives, block_size=PARETO_BLOCK_SIZE):
+    """
+    Indices of the non-dominated rows of an (n, k) array where every column is to be minimized
+    (negate columns that should be maximized). Returned in ascending order of the first column;
+    of identical rows only the first is kept.
+    In lexicographic order a row can only be dominated by (or equal to) an earlier one, so the
+    leading block of the remaining rows is settled among itself, and every row it adds to the
+    front then removes all remaining rows it dominates or equals.
+    """
+    objectives = np.asarray(objectives, dtype=np.float64)
+    remaining = np.lexsort(objectives.T[::-1])
+    # One contiguous array per column of the remaining rows: far faster to filter than (n, k) rows
+    columns = [np.ascontiguousarray(column) for column in objectives[remaining].T]
+    front = []
+    while len(remaining):
+        rows = np.column_stack([column[:block_size] for column in columns])
+        le = np.all(rows[:, None, :] <= rows[None, :, :], axis=2)
+        lt = np.any(rows[:, None, :] < rows[None, :, :], axis=2)
+        earlier = np.triu(np.ones((len(rows), len(rows)), dtype=bool), k=1)
+        # Dropped if strictly dominated by a block row, or equal to an earlier one
+        dropped = np.any(le & lt, axis=0) | np.any(le & ~lt & earlier, axis=0)
+        front.extend(remaining[:block_size][~dropped])
+        remaining = remaining[block_size:]
+        columns = [column[block_size:] for column in columns]
+        dominated = np.zeros(len(remaining), dtype=bool)
+        for point in rows[~dropped]:
+            # The first column is sorted, so only rows from the point's first value on can be dominated
+            start = np.searchsorted(columns[0], point[0])
+            by_point = np.ones(len(remaining) - start, dtype=bool)
+            for column, value in zip(columns[1:], point[1:]):
+                by_point &= column[start:] >= value
+            dominated[start:] |= by_point
+        remaining = remaining[~dominated]
+        columns = [column[~dominated] for column in columns]
+    return np.array(front, dtype=np.int64)
+
+
+def checkpoint_size_gb(model_params):
+    """
+    Size of the checkpoint as downloaded: the stored safetensors bytes when known, else fp16.
+    Online quantization (e.g. --quantization fp8) still downloads the full checkpoint.
+    """
+    weights = model_params.get('weights')
+    if weights and weights.get('total_bytes'):
+        return weights['total_bytes'] / 1e9
+    return model_params['total_params_b'] * 2
+
+
+def estimate_cold_start(checkpoint_gb, gpu_count=1, network_volume=False):
+    """
+    Seconds from pod creation until vLLM serves, split into image pull, weight download,
+    weight load and engine init. With a network volume holding the HF cache nothing is
+    downloaded, but the weights are read from the (slower) volume instead of the local disk.
+    Works elementwise on NumPy arrays.
+    """
+    if network_volume:
+        download_s = checkpoint_gb * 0.0
+        load_s = checkpoint_gb / NETWORK_VOLUME_READ_GBS
+    else:
+        download_s = checkpoint_gb / HF_DOWNLOAD_GBS
+        load_s = checkpoint_gb / (DISK_READ_GBS * gpu_count)
+    return {
+        "image_pull_s": IMAGE_PULL_S,
+        "weight_download_s": download_s,
+        "weight_load_s": load_s,
+        "engine_init_s": ENGINE_INIT_S,
+        "total_s": IMAGE_PULL_S + download_s + load_s + ENGINE_INIT_S,
+    }
+
+
+def _as_array(values, dtype=None):
+    return np.atleast_1d(np.asarray(values, dtype=dtype))
+
+
+def sweep_performance(gpus, model_params, quants, kv_quants, max_lengths, user_counts, parallel_gpus=(1,), vram_util=0.9, min_reserve_gb=2, gpu_indices=None,
+                      mean_prompt_len=None, mean_output_len=None, batch_size=None, workload=None, calibration=None):
+    """
+    Batched version of calculate_performance.
+    Evaluates the full grid gpus x parallel_gpus x quants x kv_quants x max_lengths x user_counts
+    in one go and returns a columnar result (dict of flat NumPy arrays, one entry per grid point).
+    gpus is a GpuCatalog or a list of GPU card dicts; gpu_indices restricts the sweep to a subset
+    of it (the returned gpu_index always refers to positions in gpus).
+    The roofline columns use mean_prompt_len / mean_output_len (default: DEFAULT_OUTPUT_LEN output,
+    rest of max_length prompt) and batch_size (default: user_count, capped by the KV concurrency).
+    With a workload profile (see workload.py) the mean lengths default to the workload's and the
+    workload_* / kv_occupancy_* / preemption_risk columns size the KV pool against that traffic.
+    calibration is a profile from calibration.py; by default the latest local profile is used,
+    and GPUs / architectures without fitted coefficients keep the built-in heuristics.
+    """
+    catalog = gpus if isinstance(gpus, GpuCatalog) else GpuCatalog(gpus)
+    calibration = load_calibration() if calibration is None else calibration
+    coeffs = gpu_coefficient_arrays(calibration, catalog.names)
+    arch = arch_coefficients(calibration, model_params.get('architecture'))
+    if gpu_indices is None:
+        gpu_indices = np.arange(len(catalog))
+    gpu_indices = _as_array(gpu_indices, dtype=np.int64)
+    quants = _as_array(quants, dtype=object)
+    kv_quants = _as_array(kv_quants, dtype=object)
+    counts = _as_array(parallel_gpus, dtype=np.int64)
+    lengths = _as_array(max_lengths, dtype=np.int64)
+    users = _as_array(user_counts, dtype=np.int64)
+
+    gpu_vram = catalog.vram_gb
+    gpu_pp = catalog.fp16_tflops
+    gpu_membw = catalog.bandwidth_gbs
+    gpu_price = catalog.price_hr
+
+    weights = model_params.get('weights')
+    quant_bytes = np.array([quant_bytes_per_param(q, weights) for q in quants], dtype=np.float64)
+    quant_vram = np.array([compute_model_vram_gb(model_params['total_params_b'], q, weights) for q in quants], dtype=np.float64)
+
+    gi, ci, qi, ki, li, ui = (a.ravel() for a in np.meshgrid(
+        gpu_indices, np.arange(len(counts)), np.arange(len(quants)),
+        np.arange(len(kv_quants)), np.arange(len(lengths)), np.arange(len(users)),
+        indexing='ij'
+    ))
+    count = counts[ci]
+    max_length = lengths[li]
+    user_count = users[ui]
+
+    # Per-model values only depend on the quantization axis
+    model_vram = quant_vram[qi]
+    # Per-request KV only depends on the (kv_quant, max_length) axes
+    attention = attention_layout(model_params)
+    kv_table = np.array([
+        [compute_layered_kv_cache_vram_gb(attention, length, kv_quant) for length in lengths]
+        for kv_quant in kv_quants
+    ], dtype=np.float64).reshape(len(kv_quants), len(lengths))
+    block_bytes = np.array([compute_kv_block_bytes(attention, kv_quant) for kv_quant in kv_quants], dtype=np.float64)
+    kv_cache_vram_one = kv_table[ki, li]
+    kv_block_bytes = block_bytes[ki]
+
+    if workload is not None:
+        mean_prompt_len = mean_prompt_len or float(np.average(workload['prompt_lens'], weights=workload['counts']))
+        mean_output_len = mean_output_len or float(np.average(workload['output_lens'], weights=workload['counts']))
+
+    # Mean lengths for the roofline model; decode reads the KV of a context halfway through the output
+    output_lens = np.full(len(lengths), mean_output_len) if mean_output_len else np.minimum(DEFAULT_OUTPUT_LEN, lengths // 2)
+    prompt_lens = np.full(len(lengths), mean_prompt_len) if mean_prompt_len else lengths - output_lens
+    kv_read_table = np.array([
+        [compute_layered_kv_cache_vram_gb(attention, int(p + o / 2), kv_quant, block_size=1) for p, o in zip(prompt_lens, output_lens)]
+        for kv_quant in kv_quants
+    ], dtype=np.float64).reshape(len(kv_quants), len(lengths))
+
+    total_gpu_vram = gpu_vram[gi] * count
     managed_pool = total_gpu_vram * vram_util
-    
-    # 2. Activation Overhead Estimation
-    # vLLM profiles this. For a rough estimate:
-    # It depends on hidden_size, max_num_seqs, etc.
-    # We'll use a heuristic: ~5-10% of model weights or min 1GB, max 4GB per GPU
-    activation_overhead = max(1.0, min(4.0, model_vram * 0.1)) * parallel_gpus
-    
-    # 3. Available for KV Cache
-    usable_kv_vram = max(0, managed_pool - model_vram - activation_overhead)
-    
-    # 4. Concurrency (how many full contexts fit)
-    vllm_max_concurrency = usable_kv_vram / kv_cache_vram_one if kv_cache_vram_one > 0 else 0
-    
-    # System Reserved (outside vLLM managed pool)
+    activation_overhead = np.clip(model_vram * arch['activation_fraction'], arch['activation_min_gb'], arch['activation_max_gb']) * count
+    usable_kv_vram = np.maximum(0, managed_pool - model_vram - activation_overhead)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # vLLM hands out whole blocks: the pool holds floor(usable / block) blocks and
+        # each request needs ceil(kv / block) of them (fixed recurrent state included)
+        kv_blocks = np.where(kv_block_bytes > 0, np.floor(usable_kv_vram * (1024**3) / kv_block_bytes), 0.0)
+        blocks_per_request = np.where(kv_block_bytes > 0, np.ceil(kv_cache_vram_one * (1024**3) / kv_block_bytes), 0.0)
+        concurrency = np.where(
+            blocks_per_request > 0,
+            kv_blocks / blocks_per_request,
+            np.where(kv_cache_vram_one > 0, usable_kv_vram / kv_cache_vram_one, 0.0)
+        )
     system_reserved = total_gpu_vram - managed_pool
-    
     total_vram_req = model_vram + kv_cache_vram_one + activation_overhead
-    
-    if total_vram_req > managed_pool:
-        return {
-            "error": f"Insufficient VRAM: Need {total_vram_req:.2f}GB (incl. overhead) but managed pool is {managed_pool:.2f}GB",
-            "success": False,
-            "total_vram_req": total_vram_req,
-            "usable_vram": managed_pool,
-            "model_vram": model_vram,
-            "kv_cache_vram": kv_cache_vram_one,
-            "activation_overhead": activation_overhead,
-            "reserved_vram": system_reserved
-        }
-        
-    # Scaling factors for multi-GPU
-    pp_scaling = math.pow(parallel_gpus, 0.6)
-    membw_scaling = math.pow(parallel_gpus, 0.8)
-    
-    process_power_fp16 = gpu['processPower'].get('fp16', 0) * pp_scaling
-    memory_bandwidth = gpu['memoryBandwidthGBs'] * membw_scaling
-    
-    active_params = model_params['active_params_b']
-    total_params = model_params['total_params_b']
-    
-    quant_bytes = {'fp16': 2, 'fp8': 1, 'int8': 1, 'int4': 0.5}.get(quant, 2)
-    
+
+    # Scaling factors for multi-GPU (default count^0.6 / count^0.8)
+    process_power_fp16 = gpu_pp[gi] * np.power(count, coeffs['compute_scaling_exp'][gi])
+    memory_bandwidth = gpu_membw[gi] * np.power(count, coeffs['bandwidth_scaling_exp'][gi])
+
     # prompt_speed = gpu_pp / full_parameters * 1000 / sqrt(2)
-    prompt_speed = (process_power_fp16 * 1000) / (total_params * math.sqrt(2))
-    
+    prompt_speed = (process_power_fp16 * 1000) / model_params['total_params_b'] * coeffs['prompt_speed_factor'][gi]
     # generate_speed = gpu_membw / active_parameters / quantization_ratio
-    gen_speed = memory_bandwidth / (active_params * quant_bytes)
-    
-    shared_prompt = prompt_speed / user_count
-    shared_gen = gen_speed / user_count
-    
-    max_tokens = max_length * vllm_max_concurrency
-    
+    gen_speed = memory_bandwidth / (model_params['active_params_b'] * quant_bytes[qi]) * coeffs['gen_speed_factor'][gi]
+
+    columns = {}
+    if workload is not None:
+        kv_stats = [compute_workload_kv(attention, workload, kv_quant) for kv_quant in kv_quants]
+        for k, stats in enumerate(kv_stats):
+            rows = ki == k
+            for key, values in workload_concurrency(usable_kv_vram[rows], stats, user_count[rows]).items():
+                columns.setdefault(key, np.zeros(len(gi)))[rows] = values
+
+    if batch_size is None:
+        capacity = columns.get('workload_concurrency', np.floor(concurrency))
+        batch = np.minimum(user_count, np.maximum(capacity, 1))
+    else:
+        batch = np.full(len(gi), batch_size)
+    roofline = compute_roofline(
+        process_power_fp16, memory_bandwidth, model_params['total_params_b'], model_params['active_params_b'],
+        quant_bytes[qi], kv_read_table[ki, li], batch, prompt_lens[li],
+        coeffs['compute_efficiency'][gi], coeffs['bandwidth_efficiency'][gi]
+    )
+
     return {
-        "success": True,
+        "gpu_index": gi,
+        "count": count,
+        "quant": quants[qi],
+        "kv_quant": kv_quants[ki],
+        "max_length": max_length,
+        "user_count": user_count,
+        "success": total_vram_req <= managed_pool,
         "total_vram_req": total_vram_req,
         "model_vram": model_vram,
         "kv_cache_vram": kv_cache_vram_one,
+        "kv_blocks": kv_blocks,
+        "kv_blocks_per_request": blocks_per_request,
         "activation_overhead": activation_overhead,
         "gen_speed": gen_speed,
         "prompt_speed": prompt_speed,
-        "shared_gen": shared_gen,
-        "shared_prompt": shared_prompt,
-        "max_tokens": max_tokens,
-        "full_length_gen_count": vllm_max_concurrency,
+        "shared_gen": gen_speed / user_count,
+        "shared_prompt": prompt_speed / user_count,
+        "max_tokens": max_length * concurrency,
+        "full_length_gen_count": concurrency,
         "usable_vram": managed_pool,
         "reserved_vram": system_reserved,
-        "error": None
+        "total_price": gpu_price[gi] * count,
+        # Inputs of the roofline model, kept so later stages can re-evaluate it at other batch sizes
+        "process_power": process_power_fp16,
+        "memory_bandwidth": memory_bandwidth,
+        "quant_bytes": quant_bytes[qi],
+        "kv_read_gb": kv_read_table[ki, li],
+        "prompt_len": prompt_lens[li],
+        "output_len": output_lens[li],
+        "compute_efficiency": coeffs['compute_efficiency'][gi],
+        "bandwidth_efficiency": coeffs['bandwidth_efficiency'][gi],
+        "compute_scaling_exp": coeffs['compute_scaling_exp'][gi],
+        "bandwidth_scaling_exp": coeffs['bandwidth_scaling_exp'][gi],
+        **roofline,
+        **columns,
     }
+
+
+def sweep_row(sweep, i):
+    """
+    Converts row i of a sweep_performance result into the dict returned by calculate_performance.
+    """
+    if not sweep['success'][i]:
+        return {
+            "error": f"Insufficient VRAM: Need {sweep['total_vram_req'][i]:.2f}GB (incl. overhead) but managed pool is {sweep['usable_vram'][i]:.2f}GB",
+            "success": False,
+            "total_vram_req": float(sweep['total_vram_req'][i]),
+            "usable_vram": float(sweep['usable_vram'][i]),
+            "model_vram": float(sweep['model_vram'][i]),
+            "kv_cache_vram": float(sweep['kv_cache_vram'][i]),
+            "activation_overhead": float(sweep['activation_overhead'][i]),
+            "reserved_vram": float(sweep['reserved_vram'][i])
+        }
+
+    row = {"success": True}
+    for key in ("total_vram_req", "model_vram", "kv_cache_vram", "kv_blocks", "kv_blocks_per_request", "activation_overhead", "gen_speed",
+                "prompt_speed", "shared_gen", "shared_prompt", "max_tokens", "full_length_gen_count",
+                "usable_vram", "reserved_vram", "decode_batch", "decode_tok_s", "decode_tok_s_per_user",
+                "prefill_tok_s", "ttft_s", "critical_batch"):
+        row[key] = float(sweep[key][i])
+    row["compute_bound"] = bool(sweep["compute_bound"][i])
+    for key in ("workload_concurrency", "kv_occupancy_mean", "kv_occupancy_p99", "preemption_risk"):
+        if key in sweep:
+            row[key] = float(sweep[key][i])
+    row["error"] = None
+    return row
+
+
+def calculate_performance(gpu, model_params, quant, kv_quant, max_length, user_count, parallel_gpus=1, vram_util=0.9, min_reserve_gb=2,
+                          mean_prompt_len=None, mean_output_len=None, batch_size=None, workload=None, calibration=None):
+    sweep = sweep_performance(
+        [gpu], model_params, quant, kv_quant, max_length, user_count,
+        parallel_gpus=parallel_gpus, vram_util=vram_util, min_reserve_gb=min_reserve_gb,
+        mean_prompt_len=mean_prompt_len, mean_output_len=mean_output_len, batch_size=batch_size, workload=workload,
+        calibration=calibration
+    )
+    return sweep_row(sweep, 0)
@@ -0,0 +1,181 @@
+import glob
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from .hf_loader import CACHE_DIR
+from .utils.gpu_data import GPU_CATALOG
+
+# Bump when the profile layout changes; profiles of other format versions are ignored
+CALIBRATION_FORMAT_VERSION = 1
+CALIBRATION_DIR = os.getenv("RUNPOD_SERVE_CALIBRATION", os.path.join(CACHE_DIR, "calibration"))
+
+# Calculator heuristics per GPU type; these defaults reproduce the uncalibrated model
+GPU_DEFAULTS = {
+    "compute_efficiency": 0.5,  # share of peak FLOPs reached (roofline)
+    "bandwidth_efficiency": 0.8,  # share of peak memory bandwidth reached (roofline)
+    "compute_scaling_exp": 0.6,  # multi-GPU FLOPs scale as count ** exp
+    "bandwidth_scaling_exp": 0.8,  # multi-GPU bandwidth scales as count ** exp
+    "prompt_speed_factor": 1 / math.sqrt(2),  # prompt_speed = FLOPs * 1000 / params * factor
+    "gen_speed_factor": 1.0,  # gen_speed = bandwidth / (active params * bytes) * factor
+}
+
+# Calculator heuristics per model architecture (config.json model_type)
+ARCH_DEFAULTS = {
+    "activation_fraction": 0.1,  # activation / CUDA graph overhead per GPU as share of the weights
+    "activation_min_gb": 1.0,
+    "activation_max_gb": 4.0,
+}
+
+# In-process memo of loaded profiles, keyed by directory
+_loaded = {}
+
+
+def _profile_dir(directory=None):
+    return os.path.join(directory or CALIBRATION_DIR, f"v{CALIBRATION_FORMAT_VERSION}")
+
+
+def empty_profile():
+    return {"format_version": CALIBRATION_FORMAT_VERSION, "revision": 0, "gpus": {}, "architectures": {}}
+
+
+def load_calibration(directory=None, refresh=False):
+    """
+    Latest calibration profile of the current format version, or an empty profile
+    (all defaults) when none was fitted yet.
+    """
+    directory = _profile_dir(directory)
+    if directory in _loaded and not refresh:
+        return _loaded[directory]
+    profile = empty_profile()
+    paths = sorted(glob.glob(os.path.join(directory, "profile-*.json")))
+    if paths:
+        try:
+            with open(paths[-1], 'r') as f:
+                profile = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Warning: ignoring unreadable calibration profile {paths[-1]}: {e}")
+    _loaded[directory] = profile
+    return profile
+
+
+def save_calibration(profile, directory=None):
+    """
+    Writes profile as the next revision (profile-NNNN.json); older revisions are kept,
+    so deleting the newest file rolls back. Returns the path written.
+    """
+    directory = _profile_dir(directory)
+    revision = load_calibration(os.path.dirname(directory), refresh=True)["revision"] + 1
+    profile = {**profile, "format_version": CALIBRATION_FORMAT_VERSION, "revision": revision, "created_at": time.time()}
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"profile-{revision:04d}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(profile, f, indent=2)
+    os.replace(tmp_path, path)
+    _loaded[directory] = profile
+    return path
+
+
+def gpu_coefficients(profile, gpu_name):
+    """GPU_DEFAULTS overridden by the fitted values for this GPU type."""
+    fitted = profile.get("gpus", {}).get(gpu_name, {})
+    return {key: fitted.get(key, default) for key, default in GPU_DEFAULTS.items()}
+
+
+def arch_coefficients(profile, architecture):
+    """ARCH_DEFAULTS overridden by the fitted values for this architecture."""
+    fitted = profile.get("architectures", {}).get(architecture, {}) if architecture else {}
+    return {key: fitted.get(key, default) for key, default in ARCH_DEFAULTS.items()}
+
+
+def gpu_coefficient_arrays(profile, names):
+    """Per-GPU coefficients as arrays aligned with a catalog's names, for the vectorized sweep."""
+    rows = [gpu_coefficients(profile, name) for name in names]
+    return {key: np.array([row[key] for row in rows], dtype=np.float64) for key in GPU_DEFAULTS}
+
+
+def _median(values):
+    return float(np.median(values)) if values else None
+
+
+def fit_calibration(measurements, base=None, catalog=None):
+    """
+    Fits GPU and architecture coefficients from measurement records (see bench.calibration_measurement).
+    Single-GPU runs give the efficiencies, multi-GPU runs the scaling exponents, and the
+    vLLM-reported KV block count the activation overhead. Medians keep single outliers from
+    dominating. Coefficients without usable measurements keep their base / default value.
+    Returns a new profile based on base (default: an empty profile).
+    """
+    catalog = GPU_CATALOG if catalog is None else catalog
+    profile = json.loads(json.dumps(base)) if base else empty_profile()
+    by_gpu, by_arch = {}, {}
+    for m in measurements:
+        by_gpu.setdefault(m["gpu"], []).append(m)
+        by_arch.setdefault(m.get("architecture"), []).append(m)
+
+    for name, samples in by_gpu.items():
+        card = catalog.find(name)
+        if not card:
+            print(f"Warning: skipping measurements for unknown GPU '{name}'")
+            continue
+        peak_bw = card["memoryBandwidthGBs"]
+        peak_flops = card["processPower"]["fp16"]
+        current = gpu_coefficients(profile, card["name"])
+        fitted = {}
+
+        # Achieved bandwidth / FLOPs of each run
+        decode = [(m["count"], m["decode_bytes_gb"] / m["step_s"], m) for m in samples if m.get("step_s")]
+        prefill = [(m["count"], m["prefill_tflop"] / m["prefill_s"], m) for m in samples if m.get("prefill_s")]
+
+        # Efficiencies above 1 are measurement artifacts (e.g. prefix cache hits), so clip them
+        fitted["bandwidth_efficiency"] = _median([min(bw / peak_bw, 1.0) for count, bw, _ in decode if count == 1])
+        fitted["compute_efficiency"] = _median([min(tf / peak_flops, 1.0) for count, tf, _ in prefill if count == 1])
+        bw_eff = fitted["bandwidth_efficiency"] or current["bandwidth_efficiency"]
+        tf_eff = fitted["compute_efficiency"] or current["compute_efficiency"]
+        fitted["bandwidth_scaling_exp"] = _median([
+            math.log(bw / (peak_bw * bw_eff)) / math.log(count) for count, bw, _ in decode if count > 1 and bw > 0
+        ])
+        fitted["compute_scaling_exp"] = _median([
+            math.log(tf / (peak_flops * tf_eff)) / math.log(count) for count, tf, _ in prefill if count > 1 and tf > 0
+        ])
+        bw_exp = fitted["bandwidth_scaling_exp"] or current["bandwidth_scaling_exp"]
+        tf_exp = fitted["compute_scaling_exp"] or current["compute_scaling_exp"]
+
+        # The simple throughput heuristics, fitted against the same runs
+        fitted["prompt_speed_factor"] = _median([
+            (m["prompt_len"] / m["prefill_s"]) * m["total_params_b"] / (peak_flops * count**tf_exp * 1000)
+            for count, _, m in prefill
+        ])
+        fitted["gen_speed_factor"] = _median([
+            (1 / m["step_s"]) * m["active_params_b"] * m["quant_bytes"] / (peak_bw * count**bw_exp)
+            for count, _, m in decode if m["batch"] == 1
+        ])
+
+        entry = profile["gpus"].setdefault(card["name"], {})
+        entry.update({key: value for key, value in fitted.items() if value is not None})
+        entry["samples"] = entry.get("samples", 0) + len(samples)
+
+    for arch, samples in by_arch.items():
+        # Whatever the managed pool holds besides weights and KV blocks is activation overhead
+        overhead = []
+        for m in samples:
+            if not m.get("kv_blocks"):
+                continue
+            kv_gb = m["kv_blocks"] * m["kv_block_bytes"] / 1024**3
+            per_gpu = (m["vram_gb"] * m["count"] * m["vram_util"] - m["model_vram_gb"] - kv_gb) / m["count"]
+            if per_gpu > 0:
+                overhead.append((per_gpu, per_gpu / m["model_vram_gb"]))
+        if not arch or not overhead:
+            continue
+        entry = profile["architectures"].setdefault(arch, {})
+        entry.update({
+            "activation_fraction": _median([fraction for _, fraction in overhead]),
+            "activation_min_gb": float(min(gb for gb, _ in overhead)),
+            "activation_max_gb": float(max(gb for gb, _ in overhead)),
+        })
+        entry["samples"] = entry.get("samples", 0) + len(overhead)
+    return profile
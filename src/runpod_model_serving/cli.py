@@ -1,31 +1,66 @@
+import os
 import sys
 import argparse
+import json
+import itertools
 import time
-import requests
 import signal
 import atexit
-from .hf_loader import get_model_params
+from .hf_loader import get_model_params, prefetch_model_params
 from .runpod_manager import RunpodManager
-from .calculator import calculate_performance
+from .calculator import calculate_performance, checkpoint_size_gb, estimate_cold_start, DEFAULT_OUTPUT_LEN
+from .workload import load_workload, make_workload, workload_summary
+from .calibration import ARCH_DEFAULTS, GPU_DEFAULTS, fit_calibration, load_calibration, save_calibration
+from .pod_state import forget_pods, orphaned_pods
+from .vllm_profile import build_vllm_profile, deployable_quants, merge_vllm_args, format_vllm_args
+from .gpu_market import live_catalog
+from . import telemetry
+from .utils.gpu_data import GPU_CATALOG
 
 # Global state for cleanup
-active_pod_id = None
+active_pods = []  # as deploy_fleet returned them, marked created / resumed / reused
 terminate_on_exit = False
+stop_on_exit = False
 manager = None
+# (jsonl path, textfile path) of the running main(); cleanup exports its own spans and counters again
+metrics_targets = (None, None)
 
 def cleanup():
     """
     Cleanup function registered with atexit.
-    Ensures the pod is terminated if requested.
-    """
-    global active_pod_id, terminate_on_exit, manager
-    if terminate_on_exit and active_pod_id and manager:
-        print(f"\n[CLEANUP] Terminating pod {active_pod_id}...")
-        success = manager.terminate_pod(active_pod_id)
-        if success:
-            print("[CLEANUP] Pod successfully terminated.")
-        else:
-            print("[CLEANUP] Failed to terminate pod. Please check your Runpod dashboard.")
+    Ensures the pods this run started are terminated (or stopped) if requested: created pods
+    are terminated, resumed ones stopped again. Reused pods were running before this run and
+    are left running as found.
+    """
+    global active_pods, terminate_on_exit, stop_on_exit, manager
+    if not (active_pods and manager and (stop_on_exit or terminate_on_exit)):
+        return
+    created = [pod['id'] for pod in active_pods if pod.get('created')]
+    resumed = [pod['id'] for pod in active_pods if pod.get('resumed')]
+    reused = [pod['id'] for pod in active_pods if pod.get('reused')]
+    to_terminate, to_stop = ([], created + resumed) if stop_on_exit else (created, resumed)
+    failed = []
+    if to_stop:
+        print(f"\n[CLEANUP] Stopping {len(to_stop)} pod(s): {', '.join(to_stop)}...")
+        with telemetry.span("cleanup", action="stop"):
+            results = manager.stop_pods(to_stop)
+        failed += [pod_id for pod_id, success in results.items() if not success]
+        if all(results.values()):
+            print("[CLEANUP] Pods stopped; their disks are kept for --reuse.")
+    if to_terminate:
+        print(f"\n[CLEANUP] Terminating {len(to_terminate)} pod(s): {', '.join(to_terminate)}...")
+        with telemetry.span("cleanup", action="terminate"):
+            results = manager.terminate_pods(to_terminate)
+        failed += [pod_id for pod_id, success in results.items() if not success]
+        if all(results.values()):
+            print("[CLEANUP] Pods successfully terminated.")
+    if reused:
+        forget_pods(reused)
+        print(f"[CLEANUP] Leaving reused pod(s) running as found: {', '.join(reused)}")
+    if failed:
+        print(f"[CLEANUP] Failed to clean up {', '.join(failed)}. Please check your Runpod dashboard.")
+    # main() exported before the atexit handlers ran; add the stop / terminate calls
+    telemetry.export(*metrics_targets)
 
 def signal_handler(sig, frame):
     """
@@ -36,144 +71,665 @@ def signal_handler(sig, frame):
     print(f"\n[SIGNAL] Received {sig_name}. Initiating shutdown...")
     sys.exit(0)
 
-# Register cleanup and signals at module level
-atexit.register(cleanup)
-signal.signal(signal.SIGINT, signal_handler)
-signal.signal(signal.SIGTERM, signal_handler)
-if hasattr(signal, 'SIGHUP'):
-    signal.signal(signal.SIGHUP, signal_handler)
+def install_handlers():
+    """
+    Registers cleanup and the signal handlers. Called from main() only, so importing
+    the CLI module (e.g. from tests or other tools) has no process-wide side effects.
+    """
+    atexit.register(cleanup)
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, signal_handler)
+
+def plan_main(argv):
+    """
+    `runpod-serve plan`: batch planning of many models / quantizations from a spec file.
+    """
+    # Pulls in multiprocessing, which the single-model path does not need
+    from .planner import load_plan_spec, plan_models, write_records
+
+    parser = argparse.ArgumentParser(prog="runpod-serve plan", description="Plan many models at once and report the Pareto frontier per model")
+    parser.add_argument("spec", type=str, help="YAML / JSON / JSONL list of models and constraints")
+    parser.add_argument("--output", "-o", type=str, help="Write records to this .csv / .json / .jsonl file")
+    parser.add_argument("--offline", action="store_true", help="Only read model info from the local cache (no network)")
+    parser.add_argument("--workers", type=int, help="Processes for the sweeps (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    try:
+        entries = load_plan_spec(args.spec)
+    except (OSError, ValueError) as e:
+        print(f"Failed to load plan spec: {e}")
+        sys.exit(1)
+
+    start_time = time.time()
+    print(f"Planning {len(entries)} models...")
+    records, failures = plan_models(entries, offline=args.offline, sweep_workers=args.workers)
+
+    for (model, quant), group in itertools.groupby(records, key=lambda r: (r['model'], r['quant'])):
+        group = list(group)
+        best = next((r for r in group if r['best_value']), group[0])
+        print(f"  - {model} [{quant}]: {len(group)} Pareto options, best value {best['replicas']}x({best['tp']}x{best['pp']}) "
+              f"{best['gpu']} ${best['price_hr']:.2f}/hr {best['throughput_tok_s']:.0f} tok/s")
+    for name, reason in failures.items():
+        print(f"  - {name}: FAILED ({reason})")
+
+    if args.output:
+        write_records(records, args.output)
+        print(f"Wrote {len(records)} records to {args.output}")
+    print(f"Done in {time.time() - start_time:.2f}s")
+    sys.exit(1 if failures else 0)
+
+def bench_main(argv):
+    """
+    `runpod-serve bench`: streaming load test of a deployed pod, compared with the calculator.
+    """
+    # asyncio / aiohttp are only needed by the subcommands that talk to servers
+    import asyncio
+    from .bench import (
+        PERCENTILES, compare_to_prediction, fetch_kv_blocks, predict_benchmark, run_benchmark, sample_requests,
+        summarize_results
+    )
+    from .readiness import pod_url
+
+    parser = argparse.ArgumentParser(prog="runpod-serve bench", description="Benchmark an OpenAI-compatible vLLM server and compare with the predictions")
+    parser.add_argument("target", type=str, help="Base URL of the server or a Runpod pod ID")
+    parser.add_argument("--model", type=str, required=True, help="Served model name (HuggingFace Model ID)")
+    parser.add_argument("--endpoint", type=str, default="completions", choices=["completions", "chat"])
+    parser.add_argument("--requests", type=int, default=100, help="Number of requests to send")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rate", type=float, help="Poisson arrival rate in req/s (open loop)")
+    load.add_argument("--concurrency", type=int, default=1, help="Requests kept in flight (closed loop)")
+    parser.add_argument("--prompt-len", type=int, default=1000, help="Prompt length in tokens for synthetic requests")
+    parser.add_argument("--output-len", type=int, default=200, help="Output length in tokens for synthetic requests")
+    parser.add_argument("--workload", type=str, help="JSONL trace / JSON histogram to draw request lengths from")
+    parser.add_argument("--prefix-ratio", type=float, default=0.0, help="Share of each prompt that is a common prefix")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-request timeout in seconds")
+    parser.add_argument("--gpu", type=str, help="GPU of the server, to compare against predictions (e.g. 'A40')")
+    parser.add_argument("--count", type=int, default=1, help="Number of GPUs of the server")
+    parser.add_argument("--quant", type=str, default="int4", choices=["fp16", "fp8", "int8", "int4", "auto"])
+    parser.add_argument("--kv-quant", type=str, default="fp8", choices=["fp16", "fp8", "int8", "int4"])
+    parser.add_argument("--max-length", type=int, default=8192)
+    parser.add_argument("--util", type=float, default=0.95, help="GPU memory utilization the server runs with")
+    parser.add_argument("--offline", action="store_true", help="Only read model info from the local cache (no network)")
+    parser.add_argument("--kv-blocks", type=int, help="KV blocks vLLM allocated (default: read from the server's /metrics)")
+    parser.add_argument("--output", "-o", type=str, help="Write the setup, summary, predictions and per-request results as JSON (input for 'calibrate')")
+    args = parser.parse_args(argv)
+
+    try:
+        workload = load_workload(args.workload, shared_prefix_ratio=args.prefix_ratio) if args.workload else \
+            make_workload(args.prompt_len, args.output_len, shared_prefix_ratio=args.prefix_ratio)
+    except (OSError, ValueError) as e:
+        print(f"Failed to load workload: {e}")
+        sys.exit(1)
+    requests_ = sample_requests(workload, args.requests)
+
+    base_url = args.target if "://" in args.target else pod_url(args.target)
+    mode = f"{args.rate} req/s" if args.rate else f"concurrency {args.concurrency}"
+    print(f"Benchmarking {base_url} with {len(requests_)} requests ({mode}, /{args.endpoint})...")
+    results, wall = asyncio.run(run_benchmark(
+        base_url, args.model, requests_, endpoint=args.endpoint, rate=args.rate,
+        concurrency=None if args.rate else args.concurrency, shared_prefix_ratio=args.prefix_ratio, timeout=args.timeout
+    ))
+    summary = summarize_results(results, wall)
+
+    print(f"\nResults ({summary['completed']}/{summary['requests']} ok, error rate {summary['error_rate']*100:.1f}%, {wall:.1f}s):")
+    print(f"  - Throughput:    {summary['output_tok_s']:.0f} output tok/s, {summary['request_rate']:.2f} req/s")
+    for name, label, scale, unit in (("ttft", "TTFT", 1000, "ms"), ("itl", "ITL", 1000, "ms"), ("tpot", "TPOT", 1000, "ms"), ("user_tok_s", "Per User Gen", 1, "tok/s")):
+        values = [summary[f"{name}_p{p}"] for p in PERCENTILES]
+        if values[0] is not None:
+            print(f"  - {label + ' p50/95/99:':<22} " + " / ".join(f"{v * scale:.1f}" for v in values) + f" {unit}")
+    for error, count in summary['errors'].items():
+        print(f"  - Error ({count}x): {error}")
 
-def main():
-    global active_pod_id, terminate_on_exit, manager
+    prediction = None
+    if args.gpu:
+        gpu = GPU_CATALOG.find(args.gpu) or next(iter(GPU_CATALOG.filter(args.gpu)), None)
+        params = get_model_params(args.model, offline=args.offline)
+        if not gpu or not params:
+            print(f"\nCannot compare with predictions: unknown GPU '{args.gpu}' or model info unavailable.")
+        else:
+            prediction = predict_benchmark(
+                gpu, params, requests_, args.quant, args.kv_quant, args.max_length, gpu_count=args.count,
+                rate=args.rate, concurrency=None if args.rate else args.concurrency, vram_util=args.util
+            )
+            print(f"\nMeasured vs predicted ({args.count}x {gpu['name']}):")
+            print(f"  {'metric':<16} {'measured':>10} {'predicted':>10} {'ratio':>7}")
+            for metric, measured, predicted, ratio in compare_to_prediction(summary, prediction):
+                scale = 1000 if metric.startswith(("ttft", "itl")) else 1
+                print(f"  {metric:<16} {measured * scale:>10.1f} {predicted * scale:>10.1f} {ratio:>7.2f}")
+            if not prediction.get('stable', True):
+                print(f"  (the queueing model predicts an unbounded queue at {args.rate} req/s on this setup)")
+            print(f"  (calculator gen_speed {prediction['gen_speed']:.0f} tok/s, shared_gen {prediction['shared_gen']:.1f} tok/s, "
+                  f"full-length concurrency {prediction['full_length_gen_count']:.1f})")
+
+    if args.output:
+        setup = {
+            "gpu": gpu['name'] if prediction else args.gpu, "count": args.count, "model": args.model, "quant": args.quant,
+            "kv_quant": args.kv_quant, "max_length": args.max_length, "util": args.util, "endpoint": args.endpoint,
+            "rate": args.rate, "concurrency": None if args.rate else args.concurrency,
+            "kv_blocks": args.kv_blocks or fetch_kv_blocks(base_url),
+        }
+        with open(args.output, 'w') as f:
+            json.dump({"setup": setup, "summary": summary, "prediction": prediction, "results": results}, f, indent=2)
+        print(f"Wrote benchmark results to {args.output}")
+    sys.exit(0 if summary['completed'] else 1)
+
+def autoscale_main(argv):
+    """
+    `runpod-serve autoscale`: keeps a fleet of replicas sized to the load their /metrics report.
+    """
+    import asyncio
+    from .autoscaler import SCALING_DEFAULTS, Autoscaler
+
+    parser = argparse.ArgumentParser(prog="runpod-serve autoscale", description="Scale vLLM replicas on Runpod by their live load")
+    parser.add_argument("pods", type=str, nargs="+", help="Pod IDs of the running replicas; new replicas clone the first one")
+    parser.add_argument("--model", type=str, required=True, help="Served model (HuggingFace Model ID)")
+    parser.add_argument("--gpu", type=str, required=True, help="GPU type of the replicas (e.g. 'A40')")
+    parser.add_argument("--count", type=int, help="GPUs per replica (default: as the first pod)")
+    parser.add_argument("--quant", type=str, default="int4", choices=["fp16", "fp8", "int8", "int4", "auto"])
+    parser.add_argument("--kv-quant", type=str, default="fp8", choices=["fp16", "fp8", "int8", "int4"])
+    parser.add_argument("--max-length", type=int, default=8192)
+    parser.add_argument("--util", type=float, default=0.95, help="GPU memory utilization the replicas run with")
+    parser.add_argument("--prompt-len", type=int, help="Mean prompt length, to estimate the per-replica capacity for real traffic")
+    parser.add_argument("--output-len", type=int, help="Mean output length, to estimate the per-replica capacity for real traffic")
+    parser.add_argument("--workload", type=str, help="JSONL trace / JSON histogram to estimate the per-replica capacity from")
+    parser.add_argument("--capacity", type=float, help="Concurrent requests one replica serves (default: calculator estimate)")
+    parser.add_argument("--min-replicas", type=int, default=SCALING_DEFAULTS["min_replicas"])
+    parser.add_argument("--max-replicas", type=int, default=SCALING_DEFAULTS["max_replicas"])
+    parser.add_argument("--target-utilization", type=float, default=SCALING_DEFAULTS["target_utilization"], help="Scale out above this share of the capacity")
+    parser.add_argument("--scale-down-utilization", type=float, default=SCALING_DEFAULTS["scale_down_utilization"], help="Scale in when one replica fewer stays below this share")
+    parser.add_argument("--up-cooldown", type=float, default=SCALING_DEFAULTS["up_cooldown_s"], help="Seconds after a scaling action before scaling out again")
+    parser.add_argument("--down-cooldown", type=float, default=SCALING_DEFAULTS["down_cooldown_s"], help="Seconds after a scaling action before scaling in")
+    parser.add_argument("--interval", type=float, default=15, help="Seconds between metric scrapes")
+    parser.add_argument("--vllm-args", type=str, help="vLLM arguments of new replicas (default: as the first pod)")
+    parser.add_argument("--template", type=str, help="Runpod Template ID for new replicas")
+    parser.add_argument("--network-volume", type=str, help="Network volume ID with the HuggingFace cache for new replicas")
+    parser.add_argument("--cloud", type=str, default="all", choices=["all", "secure", "community"])
+    parser.add_argument("--pod-name", type=str, help="Name of new replicas")
+    parser.add_argument("--api-key", type=str, help="Runpod API Key")
+    parser.add_argument("--offline", action="store_true", help="Only read model info from the local cache (no network)")
+    parser.add_argument("--metrics-textfile", type=str, default=os.getenv(telemetry.TEXTFILE_ENV), help="Rewrite a Prometheus textfile with the autoscaler counters after every step")
+    args = parser.parse_args(argv)
+
+    manager = RunpodManager(api_key=args.api_key)
+    spec = manager.replica_spec(args.pods[0])
+    if not spec:
+        print(f"Could not read the launch spec of pod {args.pods[0]}.")
+        sys.exit(1)
+    count = args.count or spec['gpu_count']
+
+    gpu = GPU_CATALOG.find(args.gpu) or next(iter(GPU_CATALOG.filter(args.gpu)), None)
+    params = get_model_params(args.model, offline=args.offline)
+    if not gpu or not params:
+        print(f"Unknown GPU '{args.gpu}' or model info unavailable.")
+        sys.exit(1)
+    try:
+        workload = load_workload(args.workload) if args.workload else \
+            make_workload(args.prompt_len, args.output_len) if args.prompt_len and args.output_len else None
+    except (OSError, ValueError) as e:
+        print(f"Failed to load workload: {e}")
+        sys.exit(1)
+    details = calculate_performance(
+        gpu, params, args.quant, args.kv_quant, args.max_length, 1, parallel_gpus=count, vram_util=args.util, workload=workload
+    )
+    # Same concurrency the launch profile admits (--max-num-seqs)
+    capacity = args.capacity or details.get('workload_concurrency', details['full_length_gen_count'])
+    if capacity <= 0:
+        print(f"The model does not fit on {count}x {gpu['name']}.")
+        sys.exit(1)
+
+    deploy_kwargs = {
+        "gpu_name": gpu['name'],
+        "model_id": args.model,
+        "pod_name": args.pod_name,
+        "template_id": args.template,
+        "gpu_count": count,
+        "max_model_len": args.max_length,
+        "gpu_util": args.util,
+        "model_size_gb": details['model_vram'],
+        "vllm_args": args.vllm_args or spec['vllm_args'],
+        "env": spec['env'],
+        "network_volume_id": args.network_volume,
+        "cloud_type": args.cloud.upper(),
+    }
+
+    def report_event(action, message):
+        print(f"[{time.strftime('%H:%M:%S')}] {action.upper():<7} {message}")
+
+    def report_step(status):
+        kv = f"{status['kv_cache_usage']*100:.0f}%" if status['kv_cache_usage'] is not None else "-"
+        print(f"[{time.strftime('%H:%M:%S')}] {status['serving']} serving + {status['starting']} starting | "
+              f"{status['running']:.0f} running, {status['waiting']:.0f} waiting, KV {kv}, {status['gen_tok_s']:.0f} tok/s | {status['reason']}")
+        if args.metrics_textfile:
+            telemetry.export(textfile_path=args.metrics_textfile)
+
+    scaler = Autoscaler(
+        manager, capacity, args.pods, deploy_kwargs=deploy_kwargs, on_event=report_event,
+        min_replicas=args.min_replicas, max_replicas=args.max_replicas, target_utilization=args.target_utilization,
+        scale_down_utilization=args.scale_down_utilization, up_cooldown_s=args.up_cooldown, down_cooldown_s=args.down_cooldown
+    )
+    print(f"Autoscaling {len(args.pods)} replica(s) of {count}x {gpu['name']} between {args.min_replicas} and {args.max_replicas} "
+          f"(capacity ~{capacity:.0f} concurrent requests per replica). Press Ctrl+C to stop; replicas keep running.")
+    try:
+        asyncio.run(scaler.run(interval=args.interval, on_step=report_step))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Replicas outlive the autoscaler, so they are no longer orphan candidates
+        forget_pods(scaler.created)
+        print(f"\nStopped autoscaling. Replicas: {', '.join(list(scaler.serving) + list(scaler.starting)) or 'none'}")
+
+def calibrate_main(argv):
+    """
+    `runpod-serve calibrate`: fit calculator coefficients from benchmark reports.
+    """
+    from .bench import calibration_measurement
+
+    parser = argparse.ArgumentParser(prog="runpod-serve calibrate", description="Fit per-GPU and per-architecture calculator coefficients from measurements")
+    parser.add_argument("inputs", type=str, nargs="+", help="Reports of 'runpod-serve bench -o' (.json) or measurement records (.jsonl)")
+    parser.add_argument("--offline", action="store_true", help="Only read model info from the local cache (no network)")
+    parser.add_argument("--reset", action="store_true", help="Fit from scratch instead of updating the current profile")
+    parser.add_argument("--dry-run", action="store_true", help="Show the fitted coefficients without saving them")
+    args = parser.parse_args(argv)
+
+    measurements = []
+    for path in args.inputs:
+        try:
+            with open(path, 'r') as f:
+                if path.endswith(".jsonl"):
+                    measurements.extend(json.loads(line) for line in f if line.strip())
+                    continue
+                report = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Skipping {path}: {e}")
+            continue
+        params = get_model_params(report.get("setup", {}).get("model", ""), offline=args.offline) if report.get("setup") else None
+        measurement = calibration_measurement(report, params) if params else None
+        if not measurement:
+            print(f"Skipping {path}: no GPU / model setup in the report (run bench with --gpu)")
+            continue
+        measurements.append(measurement)
+
+    if not measurements:
+        print("No usable measurements.")
+        sys.exit(1)
+
+    profile = fit_calibration(measurements, base=None if args.reset else load_calibration())
+    print(f"Fitted from {len(measurements)} measurements:")
+    for name, entry in profile["gpus"].items():
+        fitted = ", ".join(f"{key} {entry[key]:.3g} (default {GPU_DEFAULTS[key]:.3g})" for key in GPU_DEFAULTS if key in entry)
+        print(f"  - {name} [{entry.get('samples', 0)} samples]: {fitted}")
+    for name, entry in profile["architectures"].items():
+        fitted = ", ".join(f"{key} {entry[key]:.3g} (default {ARCH_DEFAULTS[key]:.3g})" for key in ARCH_DEFAULTS if key in entry)
+        print(f"  - {name} [{entry.get('samples', 0)} samples]: {fitted}")
+
+    if args.dry_run:
+        print("Dry run enabled. Profile not saved.")
+        return
+    path = save_calibration(profile)
+    print(f"Saved calibration profile to {path}")
+
+def find_setup(manager, args, params, workload, catalog):
+    """
+    Plans the setup for the CLI arguments on the given catalog (SLO, fleet or single pod mode).
+    Returns the chosen setup (per replica for fleets) or None.
+    """
+    if args.rate:
+        # Size for request rate and latency SLOs
+        output_len = args.output_len or min(DEFAULT_OUTPUT_LEN, args.max_length // 2)
+        prompt_len = args.prompt_len or args.max_length - output_len
+        best_setup = manager.find_best_gpu_for_slo(
+            params,
+            request_rate=args.rate,
+            prompt_lens=prompt_len,
+            output_lens=output_len,
+            ttft_p50=args.ttft_p50 / 1000 if args.ttft_p50 else None,
+            ttft_p99=args.ttft_p99 / 1000 if args.ttft_p99 else None,
+            itl_p50=args.itl_p50 / 1000 if args.itl_p50 else None,
+            itl_p99=args.itl_p99 / 1000 if args.itl_p99 else None,
+            quant=args.quant,
+            kv_quant=args.kv_quant,
+            max_length=args.max_length,
+            gpu_filter=args.gpu_filter,
+            catalog=catalog
+        )
+        if not best_setup:
+            print(f"No suitable GPU setup found that meets the latency SLO at {args.rate} req/s.")
+            return None
+    elif args.max_gpus:
+        # Search tensor / pipeline parallelism and data-parallel replicas
+        search = manager.find_parallel_setups(
+            params,
+            quant=args.quant,
+            kv_quant=args.kv_quant,
+            max_length=args.max_length,
+            user_count=args.users,
+            gpu_filter=args.gpu_filter,
+            catalog=catalog,
+            max_gpus=args.max_gpus,
+            mean_prompt_len=args.prompt_len,
+            mean_output_len=args.output_len,
+            workload=workload,
+            network_volume=bool(args.network_volume),
+            runtime_hours=args.runtime_hours
+        )
+        if not search:
+            print(f"No suitable GPU fleet of up to {args.max_gpus} GPUs found that can handle {args.users} concurrent users.")
+            return None
+
+        print(f"\nPareto frontier (cost vs throughput vs concurrency), {len(search['pareto'])} options:")
+        print(f"  {'GPU':<24} {'TPxPPxRep':>10} {'$/hr':>7} {'tok/s':>8} {'conc':>6} {'tok/s/$':>8} {'start':>6}")
+        for option in search['pareto'][:15]:
+            layout = f"{option['tp']}x{option['pp']}x{option['replicas']}"
+            print(f"  {option['gpu']['name']:<24} {layout:>10} {option['total_price']:>7.2f} {option['throughput_tok_s']:>8.0f} "
+                  f"{option['concurrency']:>6.0f} {option['tok_s_per_dollar']:>8.0f} {option['cold_start_s']/60:>5.1f}m")
+        if len(search['pareto']) > 15:
+            print(f"  ... {len(search['pareto']) - 15} more (up to ${search['pareto'][-1]['total_price']:.2f}/hr)")
+
+        best_setup = search['best_value'] if args.objective == "value" else search['cheapest']
+        print(f"\nSelected ({args.objective}): {best_setup['replicas']} replica(s) of {best_setup['tp']}x TP x {best_setup['pp']}x PP "
+              f"on {best_setup['gpu']['name']}, {best_setup['throughput_tok_s']:.0f} tok/s for ${best_setup['total_price']:.2f}/hr")
+        # The breakdown below is per replica
+        best_setup = {**best_setup, "count": best_setup['gpus_per_replica']}
+    else:
+        # Find best GPU based on requested user count (Strict Concurrency)
+        best_setup = manager.find_best_gpu(
+            params, 
+            quant=args.quant, 
+            kv_quant=args.kv_quant, 
+            max_length=args.max_length, 
+            user_count=args.users,
+            gpu_filter=args.gpu_filter,
+            catalog=catalog,
+            mean_prompt_len=args.prompt_len,
+            mean_output_len=args.output_len,
+            workload=workload,
+            network_volume=bool(args.network_volume),
+            runtime_hours=args.runtime_hours
+        )
+        if not best_setup:
+            print(f"No suitable GPU setup found that can handle {args.users} concurrent users.")
+            return None
+        
+    return best_setup
+
+def main(argv=None):
+    global metrics_targets
+    install_handlers()
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["plan"]:
+        return plan_main(argv[1:])
+    if argv[:1] == ["bench"]:
+        return bench_main(argv[1:])
+    if argv[:1] == ["calibrate"]:
+        return calibrate_main(argv[1:])
+    if argv[:1] == ["autoscale"]:
+        return autoscale_main(argv[1:])
     
-    parser = argparse.ArgumentParser(description="Runpod LLM Serving Tool")
-    parser.add_argument("--model", type=str, required=True, help="HuggingFace Model ID")
+    parser = argparse.ArgumentParser(description="Runpod LLM Serving Tool (subcommands: plan, bench, calibrate, autoscale)")
+    parser.add_argument("--model", type=str, help="HuggingFace Model ID")
+    parser.add_argument("--revision", type=str, help="HuggingFace model revision (branch, tag or commit)")
+    parser.add_argument("--offline", action="store_true", help="Only read model info from the local cache (no network)")
+    parser.add_argument("--reclaim", action="store_true", help="Terminate pods left behind by a crashed run and exit")
+    parser.add_argument("--prefetch", type=str, nargs="+", metavar="MODEL", help="Fetch model info for these models into the local cache and exit")
     parser.add_argument("--template", type=str, help="Runpod Template ID")
     parser.add_argument("--api-key", type=str, help="Runpod API Key")
-    parser.add_argument("--quant", type=str, default="int4", choices=["fp16", "fp8", "int8", "int4"])
+    parser.add_argument("--quant", type=str, default="int4", choices=["fp16", "fp8", "int8", "int4", "auto"], help="Weight quantization ('auto' = checkpoint as stored)")
     parser.add_argument("--kv-quant", type=str, default="fp8", choices=["fp16", "fp8", "int8", "int4"])
     parser.add_argument("--max-length", type=int, default=8192)
     parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--prompt-len", type=int, help="Mean prompt length in tokens for throughput estimates (default: max-length minus output)")
+    parser.add_argument("--output-len", type=int, help="Mean output length in tokens for throughput estimates (default: 512)")
+    parser.add_argument("--workload", type=str, help="JSONL trace / JSON histogram of prompt and output tokens to size the KV cache against")
+    parser.add_argument("--prefix-ratio", type=float, default=0.0, help="Share of each prompt that is a common prefix (with vLLM prefix caching)")
+    parser.add_argument("--max-gpus", type=int, help="Search TP x PP x replica layouts for a fleet of up to this many GPUs")
+    parser.add_argument("--objective", type=str, default="value", choices=["value", "cost"], help="With --max-gpus: pick best tok/s per $ or cheapest layout")
+    parser.add_argument("--rate", type=float, help="Request rate (req/s); plan for latency SLOs instead of concurrent users")
+    parser.add_argument("--ttft-p50", type=float, help="Target p50 time-to-first-token in ms (with --rate)")
+    parser.add_argument("--ttft-p99", type=float, help="Target p99 time-to-first-token in ms (with --rate)")
+    parser.add_argument("--itl-p50", type=float, help="Target p50 inter-token latency in ms (with --rate)")
+    parser.add_argument("--itl-p99", type=float, help="Target p99 inter-token latency in ms (with --rate)")
+    parser.add_argument("--network-volume", type=str, help="Runpod network volume ID holding the HuggingFace cache (mounted as HF_HOME)")
+    parser.add_argument("--runtime-hours", type=float, help="Expected runtime, to amortize the cold start into the price when ranking setups")
+    parser.add_argument("--cloud", type=str, default="all", choices=["all", "secure", "community"], help="Runpod cloud to price and deploy in")
+    parser.add_argument("--spot", action="store_true", help="Plan with spot (interruptible) prices")
+    parser.add_argument("--static-prices", action="store_true", help="Plan with the built-in price list instead of live Runpod prices and stock")
+    parser.add_argument("--deploy-attempts", type=int, default=3, help="GPU types to try, best first, when pod creation fails")
     parser.add_argument("--util", type=float, default=0.95, help="GPU Memory Utilization (vLLM default 0.9)")
     parser.add_argument("--dry-run", action="store_true", help="Calculate only, do not deploy")
     parser.add_argument("--pod-name", type=str, help="Custom name for the pod")
+    parser.add_argument("--wait-minutes", type=float, default=10, help="How long to wait for the model to become ready after deployment")
     parser.add_argument("--terminate-on-exit", action="store_true", help="Terminate the pod when the script exits")
+    parser.add_argument("--stop-on-exit", action="store_true", help="Stop (not terminate) the pod when the script exits, keeping the downloaded weights for --reuse")
+    parser.add_argument("--reuse", action="store_true", help="Reuse an idle (no running or queued requests) or stopped pod with the same model, GPU and vLLM args instead of creating one")
     parser.add_argument("--gpu-filter", type=str, help="Regex filter for GPU names (e.g. 'A40', '3090')")
-    parser.add_argument("--vllm-args", type=str, help="Extra arguments for vLLM (e.g. '--enable-auto-tool-choice')")
+    parser.add_argument("--vllm-args", type=str, help="Extra arguments for vLLM (e.g. '--enable-auto-tool-choice'); override the planned profile")
+    parser.add_argument("--no-prefix-caching", action="store_true", help="Do not enable vLLM prefix caching in the launch profile")
+    parser.add_argument("--print-vllm-args", action="store_true", help="Print the final vLLM argument string and exit without deploying")
+    parser.add_argument("--metrics-jsonl", type=str, default=os.getenv(telemetry.JSONL_ENV), help="Append timing spans and API counters of this run to a JSON lines file")
+    parser.add_argument("--metrics-textfile", type=str, default=os.getenv(telemetry.TEXTFILE_ENV), help="Write timing spans and API counters as a Prometheus textfile (.prom)")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
+    if not args.model and not args.prefetch and not args.reclaim:
+        parser.error("--model is required")
+    if args.deploy_attempts < 1:
+        parser.error("--deploy-attempts must be at least 1")
+
+    metrics_targets = (args.metrics_jsonl, args.metrics_textfile)
+    try:
+        with telemetry.span("cli"):
+            return serve(args)
+    finally:
+        telemetry.export(*metrics_targets)
+
+def serve(args):
+    """
+    Plans, deploys and watches the pods for the parsed main CLI arguments.
+    """
+    global active_pods, terminate_on_exit, stop_on_exit, manager
+
+    if args.prefetch:
+        print(f"Prefetching model info for {len(args.prefetch)} models...")
+        results = prefetch_model_params(args.prefetch, revision=args.revision)
+        for model_id, model_params in results.items():
+            print(f"  - {model_id}: {'cached' if model_params else 'FAILED'}")
+        sys.exit(0 if all(results.values()) else 1)
     
     # Update global state
     terminate_on_exit = args.terminate_on_exit
+    stop_on_exit = args.stop_on_exit
     manager = RunpodManager(api_key=args.api_key)
 
+    if args.reclaim:
+        results = manager.reclaim_orphans()
+        print(f"Reclaimed {sum(results.values())} of {len(results)} orphaned pods.")
+        sys.exit(0 if all(results.values()) else 1)
+
     print(f"Fetching model info for {args.model}...")
-    params = get_model_params(args.model)
+    params = get_model_params(args.model, revision=args.revision, offline=args.offline)
     if not params:
         print("Failed to fetch model info.")
         sys.exit(1)
         
     print(f"Model Params: {params['total_params_b']:.2f}B parameters, {params['layers']} layers")
+
+    args.quant, args.kv_quant, replaced = deployable_quants(args.quant, args.kv_quant, params)
+    for warning in replaced:
+        print(f"[WARN] {warning}")
+
+    workload = None
+    if args.workload:
+        try:
+            workload = load_workload(args.workload, shared_prefix_ratio=args.prefix_ratio)
+        except (OSError, ValueError) as e:
+            print(f"Failed to load workload: {e}")
+            sys.exit(1)
+        summary = workload_summary(workload)
+        print(f"Workload: prompt mean/p99 {summary['prompt_mean']:.0f}/{summary['prompt_p99']:.0f}, "
+              f"output mean/p99 {summary['output_mean']:.0f}/{summary['output_p99']:.0f} tokens")
     
-    # Find best GPU based on requested user count (Strict Concurrency)
-    best_setup = manager.find_best_gpu(
-        params, 
-        quant=args.quant, 
-        kv_quant=args.kv_quant, 
-        max_length=args.max_length, 
-        user_count=args.users,
-        gpu_filter=args.gpu_filter
-    )
-    
-    if not best_setup:
-        print(f"No suitable GPU setup found that can handle {args.users} concurrent users.")
-        sys.exit(1)
-        
-    gpu = best_setup['gpu']
-    count = best_setup['count']
-    res = best_setup['details']
+    catalog = GPU_CATALOG if args.static_prices else live_catalog(cloud=args.cloud, spot=args.spot, offline=args.offline, api_key=args.api_key)
+    for attempt in range(1, args.deploy_attempts + 1):
+        best_setup = find_setup(manager, args, params, workload, catalog)
+        if not best_setup:
+            sys.exit(1)
+
+        gpu = best_setup['gpu']
+        count = best_setup['count']
+        res = best_setup['details']
     
-    print(f"\n--- Best Setup found: {count}x {gpu['name']} (${best_setup['total_price']:.2f}/hr) ---")
+        replicas = best_setup.get('replicas', 1)
+        fleet = f"{replicas} replicas of " if replicas > 1 else ""
+        cold_start = estimate_cold_start(checkpoint_size_gb(params), count, network_volume=bool(args.network_volume))
+        print(f"\n--- Best Setup found: {fleet}{count}x {gpu['name']} (${best_setup['total_price']:.2f}/hr, ~{cold_start['total_s']/60:.1f} min cold start) ---")
     
-    print(f"VRAM Breakdown (per GPU pool):")
-    print(f"  - Model Weights: {res['model_vram']/count:.2f} GB")
-    print(f"  - Activation OH: {res['activation_overhead']/count:.2f} GB (estimated)")
-    print(f"  - KV Cache (1x): {res['kv_cache_vram']:.2f} GB")
-    print(f"  - System Reserv: {res['reserved_vram']/count:.2f} GB (outside vLLM)")
-    print(f"  - Total Managed: {res['usable_vram']/count:.2f} GB (utilization: {args.util})")
+        print(f"VRAM Breakdown (per GPU pool):")
+        print(f"  - Model Weights: {res['model_vram']/count:.2f} GB")
+        print(f"  - Activation OH: {res['activation_overhead']/count:.2f} GB (estimated)")
+        print(f"  - KV Cache (1x): {res['kv_cache_vram']:.2f} GB")
+        print(f"  - System Reserv: {res['reserved_vram']/count:.2f} GB (outside vLLM)")
+        print(f"  - Total Managed: {res['usable_vram']/count:.2f} GB (utilization: {args.util})")
     
-    print(f"\nvLLM Concurrency Estimates:")
-    print(f"  - Max Concurrency: {res['full_length_gen_count']:.2f}x (at {args.max_length} tokens)")
-    print(f"  - Total Capacity:  {res['max_tokens']:.0f} tokens")
+        print(f"\nvLLM Concurrency Estimates:")
+        print(f"  - Max Concurrency: {res['full_length_gen_count']:.2f}x (at {args.max_length} tokens)")
+        print(f"  - Total Capacity:  {res['max_tokens']:.0f} tokens")
+        print(f"  - KV Blocks:       {res['kv_blocks']:.0f} x 16 tokens ({res['kv_blocks_per_request']:.0f} per request)")
+        if 'workload_concurrency' in res:
+            print(f"  - Workload Concurrency: {res['workload_concurrency']:.0f} requests (p99 KV fits)")
+            print(f"  - KV Occupancy:    {res['kv_occupancy_mean']:.2f} GB mean / {res['kv_occupancy_p99']:.2f} GB p99 at {args.users} users")
+            print(f"  - Preemption Risk: {res['preemption_risk']*100:.2f}%")
     
-    print(f"\nPerformance Estimates (for {args.users} users):")
-    print(f"  - Prompt Speed:  {res['prompt_speed']:.0f} tok/s")
-    print(f"  - Gen Speed:     {res['gen_speed']:.0f} tok/s")
-    print(f"  - Per User Gen:  {res['shared_gen']:.1f} tok/s")
+        print(f"\nPerformance Estimates (for {args.users} users):")
+        print(f"  - Prompt Speed:  {res['prompt_speed']:.0f} tok/s")
+        print(f"  - Gen Speed:     {res['gen_speed']:.0f} tok/s")
+        print(f"  - Per User Gen:  {res['shared_gen']:.1f} tok/s")
+
+        print(f"\nRoofline Estimates (batch of {res['decode_batch']:.0f}):")
+        print(f"  - Aggregate Gen: {res['decode_tok_s']:.0f} tok/s")
+        print(f"  - Per User Gen:  {res['decode_tok_s_per_user']:.1f} tok/s")
+        print(f"  - Prefill:       {res['prefill_tok_s']:.0f} tok/s")
+        print(f"  - TTFT:          {res['ttft_s']*1000:.0f} ms")
+        if res['critical_batch'] == float('inf'):
+            print("  - Compute-bound: never (KV cache reads dominate)")
+        else:
+            print(f"  - Compute-bound: from batch {res['critical_batch']:.0f}" + (" (reached)" if res['compute_bound'] else ""))
     
-    if args.dry_run:
-        print("\nDry run enabled. Skipping deployment.")
-        return
+        print(f"\nCold Start Estimate ({'network volume' if args.network_volume else 'download from HuggingFace'}):")
+        print(f"  - Image Pull:    {cold_start['image_pull_s']:.0f} s")
+        print(f"  - Weights:       {cold_start['weight_download_s']:.0f} s download + {cold_start['weight_load_s']:.0f} s load ({checkpoint_size_gb(params):.1f} GB)")
+        print(f"  - Engine Init:   {cold_start['engine_init_s']:.0f} s")
+        print(f"  - Total:         {cold_start['total_s']/60:.1f} min (${best_setup['total_price'] * cold_start['total_s'] / 3600:.2f} billed while starting)")
 
-    print(f"\nDeploying to Runpod...")
-    pod = manager.deploy_pod(
-        gpu_name=gpu['name'], 
-        model_id=args.model,
-        template_id=args.template, 
-        gpu_count=count,
-        pod_name=args.pod_name,
-        max_model_len=args.max_length,
-        gpu_util=args.util,
-        model_size_gb=res['model_vram'],
-        extra_vllm_args=args.vllm_args
-    )
+        if best_setup.get('latency'):
+            lat = best_setup['latency']
+            print(f"\nLatency Predictions (at {args.rate} req/s, utilization {lat['utilization']*100:.0f}%):")
+            print(f"  - Mean Batch:    {lat['steady_batch']:.1f} running requests")
+            print(f"  - TTFT p50/p99:  {lat['ttft_p50']*1000:.0f} / {lat['ttft_p99']*1000:.0f} ms")
+            print(f"  - ITL p50/p99:   {lat['itl_p50']*1000:.1f} / {lat['itl_p99']*1000:.1f} ms")
+
+        profile = build_vllm_profile(
+            res,
+            params,
+            model_id=args.model,
+            quant=args.quant,
+            kv_quant=args.kv_quant,
+            max_length=args.max_length,
+            gpu_util=args.util,
+            gpu_count=count,
+            pipeline_parallel=best_setup.get('pp', 1),
+            prefix_caching=not args.no_prefix_caching
+        )
+        try:
+            profile, overrides = merge_vllm_args(profile, args.vllm_args)
+        except ValueError as e:
+            print(f"Invalid --vllm-args: {e}")
+            sys.exit(1)
+        vllm_args = format_vllm_args(profile)
+
+        if args.print_vllm_args:
+            print(f"\n{vllm_args}")
+            return
+
+        print(f"\nvLLM Launch Profile:")
+        for flag, value in profile:
+            print(f"  {flag}" + (f" {value}" if value is not None else ""))
+        for warning in overrides:
+            print(f"  [WARN] {warning}")
+
+        if args.dry_run:
+            print("\nDry run enabled. Skipping deployment.")
+            return
+
+        orphans = orphaned_pods()
+        if orphans:
+            print(f"\n[WARN] {len(orphans)} pod(s) from an earlier run are still running: {', '.join(orphans)}. Use --reclaim to terminate them.")
+
+        replicas = best_setup.get('replicas', 1)
+        print(f"\nDeploying {replicas} pod(s) to Runpod...")
+        pods = manager.deploy_fleet(
+            replicas,
+            gpu_name=gpu['name'], 
+            model_id=args.model,
+            template_id=args.template, 
+            gpu_count=count,
+            pod_name=args.pod_name,
+            max_model_len=args.max_length,
+            gpu_util=args.util,
+            model_size_gb=res['model_vram'],
+            pipeline_parallel=best_setup.get('pp', 1),
+            vllm_args=vllm_args,
+            network_volume_id=args.network_volume,
+            reuse=args.reuse,
+            cloud_type=args.cloud.upper()
+        )
+        if pods or attempt == args.deploy_attempts:
+            break
+        telemetry.count("deploy_retries")
+        # Most create failures mean no capacity for this GPU type right now, so replan without it
+        catalog = catalog.without([gpu['name']])
+        print(f"\nCould not create pods on {gpu['name']}; falling back to the next best setup "
+              f"(attempt {attempt + 1} of {args.deploy_attempts})...")
     
-    if pod:
-        active_pod_id = pod['id']
-        print(f"Pod created successfully! ID: {pod['id']}")
+    if pods:
+        active_pods = pods
+        pod_ids = [pod['id'] for pod in pods]
+        print(f"Pods ready to start! IDs: {', '.join(pod_ids)}")
         print("Waiting for connection details and model response...")
         
-        details = None
-        url = f"https://{pod['id']}-8000.proxy.runpod.net/"
-        
-        # Wait for pod to be ready and model to respond
-        max_wait_minutes = 10
-        start_time = time.time()
-        model_ready = False
-        
-        while (time.time() - start_time) < (max_wait_minutes * 60):
-            details = manager.get_connection_details(pod['id'])
-            if details and details.get('status') == 'RUNNING':
-                try:
-                    # Try to ping the vLLM health or models endpoint
-                    response = requests.get(f"{url}v1/models", timeout=5)
-                    if response.status_code == 200:
-                        model_ready = True
-                        break
-                except:
-                    pass
-            
-            print(f"  ... still waiting (elapsed: {int(time.time() - start_time)}s)", end='\r')
-            time.sleep(10)
-            
-        print("\n")
-        if details:
-            print(f"Connection Details:")
-            print(f"  - ID:     {details['id']}")
-            print(f"  - Status: {details['status']}")
-            print(f"  - URL:    {url}")
-            if model_ready:
-                print("  - Model:  READY (responding to ping)")
+        def report_phase(pod_id, phase, elapsed):
+            print(f"  [{elapsed:6.0f}s] {pod_id}: {phase}")
+
+        statuses = manager.wait_until_ready(pod_ids, timeout=args.wait_minutes * 60, on_phase=report_phase)
+
+        for pod_id, status in statuses.items():
+            details = manager.get_connection_details(pod_id)
+            print("")
+            if details:
+                print(f"Connection Details:")
+                print(f"  - ID:     {details['id']}")
+                print(f"  - Status: {details['status']}")
+                print(f"  - URL:    {status['url']}")
+                if status['ready']:
+                    print(f"  - Model:  READY after {status['elapsed']:.0f}s")
+                else:
+                    print(f"  - Model:  NOT READY ({status['phase']}{': ' + status['error'] if status['error'] else ''})")
             else:
-                print("  - Model:  NOT READY (timed out waiting for response)")
-        else:
-            print("Could not fetch connection details.")
+                print(f"Could not fetch connection details for {pod_id}.")
+
+        # Export now as well: with --terminate-on-exit the process may run for hours
+        telemetry.export(args.metrics_jsonl, args.metrics_textfile)
+
+        if not terminate_on_exit and not stop_on_exit:
+            # The pods are meant to outlive this process, so they are no longer orphan candidates
+            forget_pods(pod_ids)
             
         # Keep the script running if terminate-on-exit is set, so the user can actually use the pod
         # and then terminate it by stopping the script.
-        if terminate_on_exit:
-            print("\n[INFO] --terminate-on-exit is active. Keep this terminal open to keep the pod running.")
-            print("[INFO] Press Ctrl+C to stop the script and terminate the pod.")
+        if terminate_on_exit or stop_on_exit:
+            flag, action = ("--stop-on-exit", "stop") if stop_on_exit else ("--terminate-on-exit", "terminate")
+            print(f"\n[INFO] {flag} is active. Keep this terminal open to keep the pod running.")
+            print(f"[INFO] Press Ctrl+C to stop the script and {action} the pod.")
             try:
                 while True:
                     time.sleep(1)
@@ -181,7 +737,7 @@ def main():
                 # This will be caught by the signal handler anyway, but just in case
                 sys.exit(0)
     else:
-        print("Failed to create pod.")
+        print("Failed to create pods.")
 
 if __name__ == "__main__":
     main()
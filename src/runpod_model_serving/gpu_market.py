@@ -0,0 +1,150 @@
+import json
+import os
+import time
+
+from . import telemetry
+from .hf_loader import CACHE_DIR
+from .utils.gpu_data import GPU_CARDS, GPU_CATALOG, GpuCatalog
+from .utils.lazy import lazy_import
+
+runpod = lazy_import("runpod")
+
+# Prices and stock move quickly; planning within this window reuses the cached snapshot
+MARKET_TTL = 15 * 60  # seconds
+MARKET_CACHE_PATH = os.path.join(CACHE_DIR, "gpu_market.json")
+# JSON file with the same layout as the cache entry, used instead of the API (tests, air-gapped planning)
+MARKET_FIXTURE_ENV = "RUNPOD_SERVE_GPU_MARKET"
+
+# Stock levels Runpod reports; anything else (None, "") means the SKU cannot be rented right now
+AVAILABLE_STOCK = ("High", "Medium", "Low")
+
+# One round trip for every GPU type instead of one get_gpu() call per card
+QUERY_GPU_MARKET = """
+query GpuMarket {
+  gpuTypes {
+    id
+    displayName
+    maxGpuCount
+    secureCloud
+    communityCloud
+    securePrice
+    communityPrice
+    secureSpotPrice
+    communitySpotPrice
+    lowestPrice(input: {gpuCount: 1}) {
+      minimumBidPrice
+      uninterruptablePrice
+      stockStatus
+    }
+  }
+}
+"""
+
+
+def fetch_gpu_market(api_key=None):
+    """
+    Live price and stock per Runpod GPU type id:
+    {runpod_id: {"secure_price", "community_price", "secure_spot_price", "community_spot_price",
+    "secure", "community", "stock", "max_gpu_count"}}.
+    """
+    from runpod.api.graphql import run_graphql_query
+
+    telemetry.count("api_calls", api="gpu_market")
+    response = run_graphql_query(QUERY_GPU_MARKET, api_key=api_key or runpod.api_key)
+    market = {}
+    for gpu_type in response["data"]["gpuTypes"]:
+        lowest = gpu_type.get("lowestPrice") or {}
+        market[gpu_type["id"]] = {
+            "secure_price": gpu_type.get("securePrice"),
+            "community_price": gpu_type.get("communityPrice"),
+            "secure_spot_price": gpu_type.get("secureSpotPrice"),
+            "community_spot_price": gpu_type.get("communitySpotPrice"),
+            "secure": bool(gpu_type.get("secureCloud")),
+            "community": bool(gpu_type.get("communityCloud")),
+            "stock": lowest.get("stockStatus"),
+            "max_gpu_count": gpu_type.get("maxGpuCount"),
+        }
+    return market
+
+
+def _read_market(path):
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def get_gpu_market(offline=False, ttl=MARKET_TTL, refresh=False, cache_path=None, api_key=None):
+    """
+    Market snapshot {"fetched_at", "gpus": {...}} from the fixture, the on-disk cache or the API.
+    Stale or missing cache entries are refreshed unless offline or no API key is configured
+    (api_key or RUNPOD_API_KEY); returns None without any data.
+    """
+    fixture = os.getenv(MARKET_FIXTURE_ENV)
+    if fixture:
+        return _read_market(fixture)
+
+    cache_path = cache_path or MARKET_CACHE_PATH
+    entry = None if refresh else _read_market(cache_path)
+    if entry and (offline or time.time() - entry["fetched_at"] < ttl):
+        return entry
+    # Without a key the API cannot answer, and loading the SDK alone takes seconds
+    api_key = api_key or os.getenv("RUNPOD_API_KEY")
+    if offline or not api_key:
+        return entry
+
+    try:
+        entry = {"fetched_at": time.time(), "gpus": fetch_gpu_market(api_key)}
+    except Exception as e:
+        print(f"Warning: could not fetch live GPU prices ({e}); using {'cached' if entry else 'static'} prices.")
+        return entry
+
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"Warning: could not write GPU market cache: {e}")
+    return entry
+
+
+def _live_price(offer, cloud, spot):
+    # Cheapest price among the allowed clouds; spot prices are the interruptible ones
+    kinds = ("secure", "community") if cloud == "all" else (cloud,)
+    prices = [
+        offer.get(f"{kind}_spot_price" if spot else f"{kind}_price")
+        for kind in kinds if offer.get(kind)
+    ]
+    prices = [price for price in prices if price]
+    return min(prices) if prices else None
+
+
+def live_catalog(cloud="all", spot=False, offline=False, include_unavailable=False, cards=None, api_key=None):
+    """
+    GpuCatalog of the static specs in utils/gpu_data.py priced with live Runpod data for the
+    given cloud ("secure", "community" or "all") and on-demand or spot pricing.
+    Cards that are out of stock or not offered in that cloud are left out unless include_unavailable.
+    Falls back to the static catalog when no market data is available; cards missing from a
+    partial snapshot keep their static price.
+    """
+    market = get_gpu_market(offline=offline, api_key=api_key)
+    gpus = market.get("gpus") if market else None
+    if not gpus:
+        return GPU_CATALOG if cards is None else GpuCatalog(cards)
+
+    merged = []
+    for card in (GPU_CARDS if cards is None else cards):
+        offer = gpus.get(card.get('runpod_id'))
+        if offer is None:
+            # The API lists every GPU type, so a missing one means truncated data, not an unavailable card
+            merged.append({**card, "stock": None, "price_source": "static"})
+            continue
+        price = _live_price(offer, cloud, spot)
+        if price is not None and offer.get("stock") in AVAILABLE_STOCK:
+            merged.append({**card, "price_hr": price, "stock": offer["stock"], "price_source": "live"})
+        elif include_unavailable:
+            merged.append({**card, "stock": offer.get("stock"), "price_source": "static"})
+    return GpuCatalog(merged)
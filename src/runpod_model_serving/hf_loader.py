@@ -1,12 +1,218 @@
-from huggingface_hub import HfApi
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import hashlib
 import json
 import os
+import time
+from . import telemetry
+from .safetensors_reader import dtype_totals_from_counts, get_safetensors_totals, weight_bits
+from .utils.lazy import lazy_import
 
-def get_model_params(model_id):
-    api = HfApi()
+huggingface_hub = lazy_import("huggingface_hub")
+
+CACHE_DIR = os.getenv("RUNPOD_SERVE_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "runpod_model_serving"))
+DEFAULT_CACHE_TTL = 7 * 24 * 3600  # seconds
+# Bump whenever the resolved params dict gains or changes fields, to invalidate old cache entries
+PARAMS_SCHEMA_VERSION = 6
+
+# In-process memo of resolved params, keyed by the on-disk cache file (so per cache_dir)
+_memory_cache = {}
+
+
+def _cache_key(model_id, revision):
+    return hashlib.sha256(f"v{PARAMS_SCHEMA_VERSION}:{model_id}@{revision or 'main'}".encode()).hexdigest()
+
+
+def _cache_path(key, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, "model_params", f"{key}.json")
+
+
+def _read_cache(key, cache_dir=None):
+    path = _cache_path(key, cache_dir)
+    if path in _memory_cache:
+        return _memory_cache[path]
+    try:
+        with open(path, 'r') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    _memory_cache[path] = entry
+    return entry
+
+
+def _write_cache(key, model_id, revision, params, cache_dir=None):
+    entry = {"model_id": model_id, "revision": revision or "main", "fetched_at": time.time(), "params": copy.deepcopy(params)}
+    path = _cache_path(key, cache_dir)
+    _memory_cache[path] = entry
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp file first so concurrent readers never see a partial entry
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write model cache: {e}")
+
+
+@telemetry.timed("model_params")
+def get_model_params(model_id, revision=None, offline=False, cache_dir=None, ttl=DEFAULT_CACHE_TTL, refresh=False):
+    """
+    Returns the resolved model parameter dict, served from the local cache when possible.
+    Entries older than ttl seconds are re-fetched; in offline mode the cache is used
+    regardless of age and the network is never touched. Callers get their own copy.
+    Local snapshot directories are read directly, so edits to them show up at once.
+    """
+    if os.path.isdir(model_id):
+        with telemetry.span("model_fetch"):
+            return _fetch_model_params(model_id, revision)
+
+    key = _cache_key(model_id, revision)
+    if not refresh:
+        entry = _read_cache(key, cache_dir)
+        if entry and (offline or ttl is None or time.time() - entry["fetched_at"] < ttl):
+            telemetry.count("model_cache", result="hit")
+            return copy.deepcopy(entry["params"])
+    telemetry.count("model_cache", result="miss")
+
+    if offline:
+        print(f"Error loading model info: {model_id} is not in the local cache (offline mode)")
+        return None
+
+    with telemetry.span("model_fetch"):
+        params = _fetch_model_params(model_id, revision)
+    if params:
+        _write_cache(key, model_id, revision, params, cache_dir)
+    return params
+
+
+def prefetch_model_params(model_ids, revision=None, cache_dir=None, max_workers=8):
+    """
+    Resolves a list of models concurrently and stores them in the local cache,
+    so that later (e.g. offline) runs need no network. Returns {model_id: params or None}.
+    """
+    model_ids = list(model_ids)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(lambda m: get_model_params(m, revision=revision, cache_dir=cache_dir, refresh=True), model_ids)
+        return dict(zip(model_ids, results))
+
+
+def _weights_from_model_info(model_info):
+    safetensors = getattr(model_info, 'safetensors', None)
+    if not safetensors:
+        return None
+    # Older huggingface_hub versions return a plain dict here
+    counts = safetensors.get("parameters") if isinstance(safetensors, dict) else getattr(safetensors, 'parameters', None)
+    return dtype_totals_from_counts(counts) if counts else None
+
+
+def _mamba_state_elems(cfg):
+    # Conv + SSM state of one Mamba(2) layer, constant per request
+    d_state = cfg.get("ssm_state_size") or cfg.get("mamba_d_state") or cfg.get("state_size") or 16
+    d_conv = cfg.get("conv_kernel") or cfg.get("mamba_d_conv") or 4
+    if cfg.get("mamba_num_heads") and cfg.get("mamba_head_dim"):
+        d_inner = cfg["mamba_num_heads"] * cfg["mamba_head_dim"]
+    else:
+        d_inner = int((cfg.get("mamba_expand") or cfg.get("expand") or 2) * cfg.get("hidden_size", 4096))
+    n_groups = cfg.get("n_groups") or cfg.get("mamba_n_groups") or 0
+    return d_inner * d_state + (d_inner + 2 * n_groups * d_state) * (d_conv - 1)
+
+
+def _linear_attention_state_elems(cfg):
+    # Recurrent + conv state of one linear-attention (gated delta net) layer, constant per request
+    key_heads = cfg.get("linear_num_key_heads", 16)
+    key_dim = cfg.get("linear_key_head_dim", 128)
+    value_heads = cfg.get("linear_num_value_heads", 32)
+    value_dim = cfg.get("linear_value_head_dim", 128)
+    d_conv = cfg.get("linear_conv_kernel_dim", 4)
+    return value_heads * key_dim * value_dim + (2 * key_heads * key_dim + value_heads * value_dim) * (d_conv - 1)
+
+
+def _layer_kinds(cfg, layers):
+    """
+    Classifies every decoder layer as 'attention', 'sliding', 'linear', 'mamba' or 'none' (no cache).
+    """
+    layer_types = cfg.get("layer_types")
+    if isinstance(layer_types, list):
+        mapping = {"full_attention": "attention", "attention": "attention", "sliding_attention": "sliding",
+                   "local_attention": "sliding", "linear_attention": "linear", "mamba": "mamba"}
+        return [mapping.get(t, "attention") for t in layer_types]
+    if isinstance(cfg.get("layers_block_type"), list):
+        return ["mamba" if t == "mamba" else "attention" for t in cfg["layers_block_type"]]
+    if isinstance(cfg.get("hybrid_override_pattern"), str):
+        # Nemotron-H: '*' attention, 'M' mamba, '-'/'E' MLP/MoE blocks without any cache
+        mapping = {"*": "attention", "M": "mamba"}
+        return [mapping.get(c, "none") for c in cfg["hybrid_override_pattern"]]
+    if cfg.get("attn_layer_period"):
+        period, offset = cfg["attn_layer_period"], cfg.get("attn_layer_offset", 0)
+        return ["attention" if i % period == offset else "mamba" for i in range(layers)]
+
+    window = cfg.get("sliding_window")
+    if not window or cfg.get("use_sliding_window") is False:
+        return ["attention"] * layers
+    # Interleaved local/global attention: every n-th layer is global
+    pattern = cfg.get("sliding_window_pattern") or (2 if cfg.get("model_type") == "gemma2" else None)
+    if pattern:
+        return ["attention" if (i + 1) % pattern == 0 else "sliding" for i in range(layers)]
+    return ["sliding"] * layers
+
+
+def _attention_layout(cfg, layers, num_kv_heads, head_dim):
+    """
+    Per-layer cache description, aggregated into groups of identical layers:
+    [{"type", "count", "token_elems", "window", "state_elems"}, ...]
+    token_elems is the number of cached values per token per layer (K and V, or the MLA latent),
+    window caps the cached tokens for sliding layers, state_elems is a fixed per-request state.
+    """
+    if cfg.get("kv_lora_rank"):
+        # MLA caches one compressed latent plus the rope key per token
+        attention = ("mla", cfg["kv_lora_rank"] + (cfg.get("qk_rope_head_dim") or 64), None, 0)
+    else:
+        attention = ("full", 2 * num_kv_heads * head_dim, None, 0)
+    specs = {
+        "attention": attention,
+        "sliding": ("sliding", 2 * num_kv_heads * head_dim, cfg.get("sliding_window"), 0),
+        "mamba": ("mamba", 0, None, _mamba_state_elems(cfg)),
+        "linear": ("linear", 0, None, _linear_attention_state_elems(cfg)),
+    }
+
+    groups = {}
+    for kind in _layer_kinds(cfg, layers):
+        if kind == "none":
+            continue
+        layer_type, token_elems, window, state_elems = specs[kind]
+        if layer_type in groups:
+            groups[layer_type]["count"] += 1
+        else:
+            groups[layer_type] = {"type": layer_type, "count": 1, "token_elems": token_elems,
+                                  "window": window, "state_elems": state_elems}
+    return list(groups.values())
+
+
+# Routed expert count of MoE configs: Qwen-MoE, Mixtral, DeepSeek
+MOE_EXPERT_KEYS = ("num_experts", "num_local_experts", "n_routed_experts")
+
+
+def _active_params_b(text_config, total_params_b):
+    """Parameters used per token: for MoE the share of experts routed to (shared experts always run)."""
+    experts = next((text_config[key] for key in MOE_EXPERT_KEYS if text_config.get(key)), None)
+    if not experts:
+        return total_params_b
+    shared = text_config.get("n_shared_experts") or 0
+    return (text_config.get("num_experts_per_tok", 1) + shared) / (experts + shared) * total_params_b
+
+
+def _fetch_model_params(model_id, revision=None):
+    # A local snapshot directory is read directly, without any network access (or the HF SDK)
+    local_dir = os.path.isdir(model_id)
+    api = None if local_dir else huggingface_hub.HfApi()
     try:
         # Try to get config.json
-        config_path = api.hf_hub_download(repo_id=model_id, filename="config.json")
+        if local_dir:
+            config_path = os.path.join(model_id, "config.json")
+        else:
+            telemetry.count("api_calls", api="hf_config")
+            config_path = api.hf_hub_download(repo_id=model_id, filename="config.json", revision=revision)
         with open(config_path, 'r') as f:
             config = json.load(f)
             
@@ -30,16 +236,27 @@ def get_model_params(model_id):
             attn_heads = text_config.get("num_attention_heads") or 1
             head_dim = hidden_size // attn_heads
         
-        # Estimate total params
-        total_params_b = config.get("num_parameters", 0) / 1e9
-        if total_params_b == 0:
-            # Fallback: try to get from model info
+        # Exact per-dtype parameter/byte totals of the checkpoint, if we can get them
+        quantization_config = config.get("quantization_config") or text_config.get("quantization_config") or {}
+        weights = None
+        if local_dir:
+            weights = get_safetensors_totals(model_id, quantization_config=quantization_config)
+        else:
             try:
-                model_info = api.model_info(model_id)
-                if hasattr(model_info, 'safetensors') and model_info.safetensors:
-                    total_params_b = model_info.safetensors.get("total", 0) / 1e9
+                telemetry.count("api_calls", api="hf_model_info")
+                model_info = api.model_info(model_id, revision=revision)
+                weights = _weights_from_model_info(model_info)
             except:
                 pass
+            # The hub counts a packed int4 word as one parameter; only the headers name the packed tensors
+            if (not weights and not config.get("num_parameters")) or weight_bits(quantization_config):
+                # Fallback: read only the safetensors headers of each shard
+                weights = get_safetensors_totals(model_id, revision=revision, quantization_config=quantization_config) or weights
+
+        # Estimate total params
+        total_params_b = config.get("num_parameters", 0) / 1e9
+        if total_params_b == 0 and weights:
+            total_params_b = weights["total_params"] / 1e9
         
         # If still 0, guess from name
         if total_params_b == 0:
@@ -53,10 +270,14 @@ def get_model_params(model_id):
             
         return {
             "total_params_b": total_params_b,
-            "active_params_b": text_config.get("num_experts_per_tok", 1) / text_config.get("num_experts", 1) * total_params_b if "num_experts" in text_config else total_params_b,
+            "active_params_b": _active_params_b(text_config, total_params_b),
             "layers": layers or 32,
             "num_kv_heads": num_kv_heads or 32,
             "head_dim": head_dim or 128,
+            "attention": _attention_layout(text_config, layers or 32, num_kv_heads or 32, head_dim or 128),
+            "weights": weights,
+            "architecture": text_config.get("model_type") or config.get("model_type"),
+            "quant_method": quantization_config.get("quant_method"),
             "name": model_id
         }
     except Exception as e:
@@ -0,0 +1,199 @@
+import csv
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from .gpu_market import live_catalog
+from .hf_loader import get_model_params
+from .runpod_manager import RunpodManager
+from .utils.gpu_data import GPU_CATALOG
+from .vllm_profile import deployable_quants
+from .workload import load_workload
+
+# Defaults for every plan entry; each entry (or the spec's "defaults") may override them
+PLAN_DEFAULTS = {
+    "quant": ["int4"],
+    "kv_quant": "fp8",
+    "max_length": 8192,
+    "users": 1,
+    "max_gpus": 8,
+    "gpu_filter": None,
+    "revision": None,
+    "prompt_len": None,
+    "output_len": None,
+    "workload": None,
+    "prefix_ratio": 0.0,
+    "network_volume": False,
+    "runtime_hours": None,
+    "cloud": "all",
+    "spot": False,
+    "static_prices": False,
+}
+
+RECORD_FIELDS = [
+    "model", "quant", "kv_quant", "max_length", "users", "gpu", "tp", "pp", "replicas", "gpus",
+    "price_hr", "throughput_tok_s", "per_user_tok_s", "tok_s_per_dollar", "concurrency",
+    "itl_ms", "ttft_ms", "cold_start_s", "effective_price_hr", "model_vram_gb", "kv_cache_gb", "cheapest", "best_value",
+]
+
+
+def load_plan_spec(path):
+    """
+    Reads a batch plan: YAML (.yaml/.yml), a JSON document or JSONL (one entry per line).
+    Either a list of entries or {"defaults": {...}, "models": [...]}; an entry is a model id
+    string or a dict with "model" plus any PLAN_DEFAULTS keys ("quant" may be a list).
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+
+    if path.endswith((".yaml", ".yml")):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError("YAML plan files need PyYAML (pip install pyyaml)")
+        spec = yaml.safe_load(text)
+    elif text.lstrip().startswith(("[", "{")) and not path.endswith(".jsonl"):
+        spec = json.loads(text)
+    else:
+        spec = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    defaults = {}
+    if isinstance(spec, dict):
+        defaults = spec.get("defaults", {})
+        spec = spec.get("models", [])
+
+    entries = []
+    for item in spec:
+        entry = {**PLAN_DEFAULTS, **defaults, **({"model": item} if isinstance(item, str) else item)}
+        if not entry.get("model"):
+            raise ValueError(f"Plan entry without a model: {item}")
+        if isinstance(entry["quant"], str):
+            entry["quant"] = [entry["quant"]]
+        entries.append(entry)
+    return entries
+
+
+def _to_records(entry, quant, search):
+    records = []
+    for option in search["pareto"]:
+        details = option["details"]
+        records.append({
+            "model": entry["model"],
+            "quant": quant,
+            "kv_quant": entry["kv_quant"],
+            "max_length": entry["max_length"],
+            "users": entry["users"],
+            "gpu": option["gpu"]["name"],
+            "tp": option["tp"],
+            "pp": option["pp"],
+            "replicas": option["replicas"],
+            "gpus": option["count"],
+            "price_hr": round(option["total_price"], 4),
+            "throughput_tok_s": round(option["throughput_tok_s"], 1),
+            "per_user_tok_s": round(option["per_user_tok_s"], 2),
+            "tok_s_per_dollar": round(option["tok_s_per_dollar"], 1),
+            "concurrency": option["concurrency"],
+            "itl_ms": round(option["itl_s"] * 1000, 2),
+            "ttft_ms": round(option["ttft_s"] * 1000, 1),
+            "cold_start_s": round(option["cold_start_s"]),
+            "effective_price_hr": round(option["effective_price"], 4),
+            "model_vram_gb": round(details["model_vram"], 2),
+            "kv_cache_gb": round(details["kv_cache_vram"], 3),
+            "cheapest": option == search["cheapest"],
+            "best_value": option == search["best_value"],
+        })
+    return records
+
+
+def _plan_job(entry, quant, params, catalog):
+    # Runs in a worker process: one (model, quant) sweep -> Pareto records
+    workload = load_workload(entry["workload"], shared_prefix_ratio=entry["prefix_ratio"]) if entry["workload"] else None
+    search = RunpodManager().find_parallel_setups(
+        params,
+        quant=quant,
+        kv_quant=entry["kv_quant"],
+        max_length=entry["max_length"],
+        user_count=entry["users"],
+        gpu_filter=entry["gpu_filter"],
+        catalog=catalog,
+        max_gpus=entry["max_gpus"],
+        mean_prompt_len=entry["prompt_len"],
+        mean_output_len=entry["output_len"],
+        workload=workload,
+        objectives=("cost", "throughput", "concurrency", "latency"),
+        network_volume=entry["network_volume"],
+        runtime_hours=entry["runtime_hours"],
+    )
+    return _to_records(entry, quant, search) if search else []
+
+
+def plan_models(entries, offline=False, fetch_workers=16, sweep_workers=None):
+    """
+    Plans every (model, quant) of the entries. Model params are resolved concurrently in a
+    thread pool (network bound), the sweeps fan out over a process pool (CPU bound).
+    Quantizations vLLM cannot launch as sized (see vllm_profile.deployable_quants) are planned as
+    the format it would serve instead, with a warning; records carry the format actually planned.
+    Returns (records, failures): flat Pareto records per model and quant, and {model: reason}.
+    """
+    keys = list(dict.fromkeys((e["model"], e["revision"]) for e in entries))
+    with ThreadPoolExecutor(max_workers=fetch_workers) as pool:
+        resolved = dict(zip(keys, pool.map(lambda k: get_model_params(k[0], revision=k[1], offline=offline), keys)))
+
+    # One price snapshot per cloud / pricing combination, shared by all sweeps
+    catalogs = {}
+    for entry in entries:
+        key = (entry["cloud"], entry["spot"], entry["static_prices"])
+        if key not in catalogs:
+            catalogs[key] = GPU_CATALOG if entry["static_prices"] else live_catalog(cloud=entry["cloud"], spot=entry["spot"], offline=offline)
+
+    failures = {}
+    jobs = []
+    for entry in entries:
+        params = resolved[(entry["model"], entry["revision"])]
+        if not params:
+            failures[entry["model"]] = "could not resolve model params"
+            continue
+        catalog = catalogs[(entry["cloud"], entry["spot"], entry["static_prices"])]
+        # Formats vLLM cannot launch as sized are planned as it would serve them, once per entry
+        planned = set()
+        for quant in entry["quant"]:
+            served, kv_quant, replaced = deployable_quants(quant, entry["kv_quant"], params)
+            for warning in replaced:
+                print(f"[WARN] {entry['model']} ({quant}): {warning}")
+            if (served, kv_quant) in planned:
+                continue
+            planned.add((served, kv_quant))
+            jobs.append(({**entry, "kv_quant": kv_quant}, served, params, catalog))
+
+    records = []
+    with ProcessPoolExecutor(max_workers=sweep_workers or os.cpu_count()) as pool:
+        futures = [(entry, quant, pool.submit(_plan_job, entry, quant, params, catalog)) for entry, quant, params, catalog in jobs]
+        for entry, quant, future in futures:
+            try:
+                result = future.result()
+            except Exception as e:
+                failures[f"{entry['model']} ({quant})"] = str(e)
+                continue
+            if not result:
+                failures[f"{entry['model']} ({quant})"] = "no feasible setup"
+            records.extend(result)
+    return records, failures
+
+
+def write_records(records, path):
+    """
+    Writes plan records as CSV, JSON (list) or JSONL depending on the file extension.
+    Every record has the same flat columns, so the files load directly into pandas / Parquet.
+    """
+    if path.endswith(".csv"):
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=RECORD_FIELDS)
+            writer.writeheader()
+            writer.writerows(records)
+    elif path.endswith(".jsonl"):
+        with open(path, 'w') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    else:
+        with open(path, 'w') as f:
+            json.dump(records, f, indent=2)
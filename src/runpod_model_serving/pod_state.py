@@ -0,0 +1,128 @@
+import contextlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, only the in-process lock below
+    fcntl = None
+
+from .hf_loader import CACHE_DIR
+
+# Pods created by this tool that are still owned by a running CLI process
+STATE_PATH = os.path.join(CACHE_DIR, "pods.json")
+
+# Serializes read-modify-write cycles of the state file within one process; _locked adds
+# an flock on a sidecar file so that concurrent CLI processes do not lose each other's updates
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _locked(path=None):
+    path = path or STATE_PATH
+    with _lock:
+        if fcntl is None:
+            yield
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            lock_file = open(f"{path}.lock", 'a')
+        except OSError as e:
+            print(f"Warning: could not lock pod state: {e}")
+            yield
+            return
+        with lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def load_pods(path=None):
+    """Returns {pod_id: entry} from the state file; an unreadable file counts as empty."""
+    try:
+        with open(path or STATE_PATH, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_pods(pods, path=None):
+    path = path or STATE_PATH
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(pods, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write pod state: {e}")
+
+
+def record_pod(pod_id, path=None, **info):
+    """Registers a freshly created pod as owned by the current process."""
+    with _locked(path):
+        pods = load_pods(path)
+        pods[pod_id] = {**info, "owner_pid": os.getpid(), "created_at": time.time()}
+        _save_pods(pods, path)
+
+
+def forget_pods(pod_ids, path=None):
+    """Drops pods from the state file (terminated, or deliberately left running)."""
+    with _locked(path):
+        pods = load_pods(path)
+        for pod_id in pod_ids:
+            pods.pop(pod_id, None)
+        _save_pods(pods, path)
+
+
+def _process_alive(pid):
+    """
+    Whether a process with this pid exists. Anything but a positive int is no process: on POSIX
+    os.kill(-1, 0) would probe every process we may signal, and on Windows os.kill(pid, 0)
+    sends CTRL_C_EVENT instead of probing, so there the process is opened instead.
+    """
+    if not isinstance(pid, int) or isinstance(pid, bool) or pid <= 0:
+        return False
+    if os.name == "nt":
+        return _windows_process_alive(pid)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _windows_process_alive(pid):
+    import ctypes
+
+    PROCESS_QUERY_LIMITED_INFORMATION = 0x1000
+    STILL_ACTIVE = 259
+    ERROR_ACCESS_DENIED = 5
+    kernel32 = ctypes.windll.kernel32
+    handle = kernel32.OpenProcess(PROCESS_QUERY_LIMITED_INFORMATION, False, pid)
+    if not handle:
+        # The process exists but belongs to someone else
+        return kernel32.GetLastError() == ERROR_ACCESS_DENIED
+    try:
+        exit_code = ctypes.c_ulong()
+        if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+            return True
+        return exit_code.value == STILL_ACTIVE
+    finally:
+        kernel32.CloseHandle(handle)
+
+
+def orphaned_pods(path=None):
+    """
+    Pods whose owning CLI process is gone without terminating or releasing them.
+    Entries without a valid owner pid count as orphaned.
+    """
+    return {pod_id: entry for pod_id, entry in load_pods(path).items() if not _process_alive(entry.get("owner_pid"))}
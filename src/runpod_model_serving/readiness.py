@@ -0,0 +1,147 @@
+import asyncio
+import time
+
+from . import telemetry
+from .utils.lazy import lazy_import
+
+aiohttp = lazy_import("aiohttp")
+runpod = lazy_import("runpod")
+
+# Startup phases of a vLLM pod, in order
+SCHEDULED = "scheduled"
+IMAGE_PULLING = "image pulling"
+WEIGHTS_DOWNLOADING = "weights downloading"
+ENGINE_READY = "engine ready"
+# Terminal states besides ENGINE_READY
+FAILED = "failed"
+TIMED_OUT = "timed out"
+
+PHASES = [SCHEDULED, IMAGE_PULLING, WEIGHTS_DOWNLOADING, ENGINE_READY]
+
+# Poll interval grows by BACKOFF_FACTOR while the phase does not change and resets on every change
+MIN_POLL_INTERVAL = 1.0
+MAX_POLL_INTERVAL = 15.0
+BACKOFF_FACTOR = 1.5
+PROBE_TIMEOUT = 5.0
+# Consecutive Runpod API errors before a pod is given up
+MAX_API_ERRORS = 5
+
+
+def pod_url(pod_id, port=8000):
+    return f"https://{pod_id}-{port}.proxy.runpod.net/"
+
+
+def pod_phase(pod, health_ok, models_ok):
+    """
+    Startup phase from a runpod.get_pod() result and the vLLM /health and /v1/models probes.
+    The container only gets a runtime once the image is pulled; the API server answers
+    only after the weights are downloaded and the engine is initialized.
+    """
+    if not pod or pod.get('desiredStatus') in ("EXITED", "TERMINATED"):
+        return FAILED
+    if health_ok and models_ok:
+        return ENGINE_READY
+    if pod.get('runtime'):
+        return WEIGHTS_DOWNLOADING
+    if pod.get('machineId'):
+        return IMAGE_PULLING
+    return SCHEDULED
+
+
+async def _probe(session, url):
+    try:
+        async with session.get(url, timeout=aiohttp.ClientTimeout(total=PROBE_TIMEOUT)) as response:
+            if response.status != 200:
+                return None
+            return await response.json(content_type=None) if url.endswith("models") else True
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+        return None
+
+
+async def watch_pod(session, pod_id, url=None, timeout=600, get_pod=None, on_phase=None):
+    """
+    Polls one pod until its engine serves requests, it fails, or timeout seconds pass.
+    Runpod status, /health and /v1/models are queried concurrently on every poll.
+    on_phase(pod_id, phase, elapsed) is called on every phase change.
+    Returns {"id", "url", "phase", "ready", "elapsed", "phases": [(phase, elapsed), ...], "error"}.
+    """
+    url = url or pod_url(pod_id)
+    get_pod = get_pod or runpod.get_pod
+    start = time.monotonic()
+    result = {"id": pod_id, "url": url, "phase": None, "ready": False, "elapsed": 0.0, "phases": [], "error": None}
+    interval = MIN_POLL_INTERVAL
+    api_errors = 0
+    # run_in_executor rather than asyncio.to_thread, which needs Python 3.9
+    loop = asyncio.get_running_loop()
+
+    while True:
+        pod, health, models = await asyncio.gather(
+            loop.run_in_executor(None, get_pod, pod_id),
+            _probe(session, f"{url}health"),
+            _probe(session, f"{url}v1/models"),
+            return_exceptions=True,
+        )
+        elapsed = time.monotonic() - start
+        telemetry.count("api_calls", api="get_pod")
+        telemetry.count("readiness_polls")
+
+        if isinstance(pod, Exception):
+            telemetry.count("api_errors", api="get_pod")
+            api_errors += 1
+            result["error"] = f"Runpod API error: {pod}"
+            phase = FAILED if api_errors >= MAX_API_ERRORS else result["phase"]
+        else:
+            api_errors = 0
+            health_ok = health is True
+            models_ok = isinstance(models, dict) and bool(models.get("data"))
+            phase = pod_phase(pod, health_ok, models_ok)
+
+        if phase != result["phase"]:
+            result["phase"] = phase
+            result["phases"].append((phase, elapsed))
+            if on_phase:
+                on_phase(pod_id, phase, elapsed)
+            interval = MIN_POLL_INTERVAL
+        else:
+            interval = min(MAX_POLL_INTERVAL, interval * BACKOFF_FACTOR)
+
+        if phase in (ENGINE_READY, FAILED):
+            if phase == FAILED and not result["error"]:
+                result["error"] = "pod exited or was terminated"
+            break
+        if elapsed + interval > timeout:
+            result["phase"] = TIMED_OUT
+            if on_phase:
+                on_phase(pod_id, TIMED_OUT, elapsed)
+            break
+        await asyncio.sleep(interval)
+
+    result["ready"] = result["phase"] == ENGINE_READY
+    result["elapsed"] = time.monotonic() - start
+
+    # Time spent in each startup phase (scheduling delay, image pull, model load); the last one lasts until the watch ended
+    marks = result["phases"] + [(None, result["elapsed"])]
+    for (phase, entered), (_, left) in zip(marks, marks[1:]):
+        if phase in PHASES and phase != ENGINE_READY:
+            telemetry.record_span("pod_phase", left - entered, phase=phase)
+    telemetry.record_span("pod_startup", result["elapsed"], outcome=result["phase"])
+    return result
+
+
+async def watch_pods(pod_ids, urls=None, timeout=600, get_pod=None, on_phase=None, max_connections=100):
+    """
+    Watches many pods at once over one pooled HTTP session. Returns {pod_id: result} (see watch_pod).
+    """
+    urls = urls or {}
+    connector = aiohttp.TCPConnector(limit=max_connections)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*[
+            watch_pod(session, pod_id, urls.get(pod_id), timeout=timeout, get_pod=get_pod, on_phase=on_phase)
+            for pod_id in pod_ids
+        ])
+    return {result["id"]: result for result in results}
+
+
+def wait_until_ready(pod_ids, urls=None, timeout=600, get_pod=None, on_phase=None):
+    """Blocking wrapper around watch_pods for synchronous callers."""
+    return asyncio.run(watch_pods(pod_ids, urls=urls, timeout=timeout, get_pod=get_pod, on_phase=on_phase))
@@ -1,8 +1,44 @@
-import runpod
+import hashlib
+import json
+import math
 import os
-import re
-from .utils.gpu_data import GPU_CARDS
-from .calculator import calculate_performance
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from . import pod_state, telemetry
+from .utils.gpu_data import GPU_CATALOG
+from .utils.lazy import lazy_import
+from .calculator import (
+    PIPELINE_EFFICIENCY, checkpoint_size_gb, compute_model_vram_gb, estimate_cold_start, compute_roofline, length_stats, pareto_front, predict_latency,
+    sweep_performance, sweep_row
+)
+
+runpod = lazy_import("runpod")
+requests = lazy_import("requests")
+
+# Mount point of an attached network volume and the HF cache on it
+VOLUME_MOUNT_PATH = "/runpod-volume"
+VOLUME_HF_HOME = f"{VOLUME_MOUNT_PATH}/huggingface"
+
+# Pod env var that carries the launch spec fingerprint, used to find reusable pods
+FINGERPRINT_ENV = "RUNPOD_SERVE_FINGERPRINT"
+
+
+def spec_fingerprint(model_id, gpu_name, gpu_count=1, **launch):
+    """
+    Short hash of everything that determines what a pod serves: model, GPU type and count,
+    and the launch arguments (template, vLLM args, ...). Pods with equal fingerprints are interchangeable.
+    """
+    spec = {"model": model_id, "gpu": gpu_name, "count": gpu_count, **launch}
+    return hashlib.sha256(json.dumps(spec, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def _pod_env(pod):
+    # The API returns env either as ["KEY=value", ...] or as a mapping
+    env = pod.get('env') or []
+    if isinstance(env, dict):
+        return env
+    return dict(item.split("=", 1) for item in env if "=" in item)
+
 
 class RunpodManager:
     def __init__(self, api_key=None):
@@ -10,98 +46,388 @@ class RunpodManager:
         if self.api_key:
             runpod.api_key = self.api_key
             
-    def find_best_gpu(self, model_params, quant='int4', kv_quant='fp8', max_length=8192, user_count=1, gpu_filter=None):
+    @telemetry.timed("plan", mode="users")
+    def find_best_gpu(self, model_params, quant='int4', kv_quant='fp8', max_length=8192, user_count=1, gpu_filter=None, vram_util=0.9, catalog=None,
+                      mean_prompt_len=None, mean_output_len=None, workload=None, network_volume=False, runtime_hours=None):
+        """
+        Cheapest setup that serves user_count concurrent requests. Without a workload profile every
+        request is assumed to hold a full max_length context; with one (see workload.py) the KV pool
+        is sized so that user_count requests of that traffic fit at the 99th percentile.
+        With runtime_hours, setups are ranked by the hourly price including the cold start
+        amortized over that runtime (as in find_parallel_setups).
+        """
+        catalog = (GPU_CATALOG if catalog is None else catalog).filter(gpu_filter)
+        capacity_key = 'workload_concurrency' if workload is not None else 'full_length_gen_count'
+        model_vram = compute_model_vram_gb(model_params['total_params_b'], quant, model_params.get('weights'))
+        checkpoint_gb = checkpoint_size_gb(model_params)
+
         best_setup = None
-        min_total_price = float('inf')
-        
-        # Try different GPU counts (1 to 8)
+        min_effective_price = float('inf')
+
+        # Branch-and-bound over GPU counts (1 to 8): for each count only sweep the cards that
+        # are strictly cheaper than the incumbent and whose pooled VRAM can hold the weights.
         for gpu_count in range(1, 9):
-            for gpu in GPU_CARDS:
-                # Apply GPU filter if provided
-                if gpu_filter:
-                    if not re.search(gpu_filter, gpu['name'], re.IGNORECASE):
-                        continue
-
-                res = calculate_performance(
-                    gpu, model_params, quant, kv_quant, max_length, user_count, parallel_gpus=gpu_count
-                )
-                
-                if res['success'] and res['full_length_gen_count'] >= user_count:
-                    # Calculate total price per hour for this setup
-                    total_price = gpu.get('price_hr', 999.0) * gpu_count
-                    
-                    # We want the setup with the lowest total price
-                    if total_price < min_total_price:
-                        min_total_price = total_price
-                        best_setup = {
-                            "gpu": gpu,
-                            "count": gpu_count,
-                            "details": res,
-                            "total_price": total_price
-                        }
-                    # If price is same, prefer fewer GPUs
-                    elif abs(total_price - min_total_price) < 0.001:
-                        if best_setup and gpu_count < best_setup['count']:
-                            best_setup = {
-                                "gpu": gpu,
-                                "count": gpu_count,
-                                "details": res,
-                                "total_price": total_price
-                            }
-                            
+            # The cold start only depends on the GPU count, so it scales the bound on the card price;
+            # gpu_count * markup grows with the count, so once no card is cheap enough none will be
+            cold_start = estimate_cold_start(checkpoint_gb, gpu_count, network_volume)['total_s']
+            markup = 1 + cold_start / 3600 / runtime_hours if runtime_hours else 1.0
+            # If price is same, prefer fewer GPUs (counts are visited in ascending order)
+            cheaper = catalog.cheaper_than((min_effective_price - 0.001) / (gpu_count * markup))
+            if len(cheaper) == 0:
+                break
+            big_enough = catalog.with_min_vram(model_vram / (gpu_count * vram_util))
+            # Sorted intersection via a mask (np.intersect1d imports numpy.ma, ~20 ms at startup)
+            fits = np.zeros(len(catalog), dtype=bool)
+            fits[big_enough] = True
+            candidates = np.sort(cheaper[fits[cheaper]])
+            if len(candidates) == 0:
+                continue
+
+            sweep = sweep_performance(
+                catalog, model_params, quant, kv_quant, max_length, user_count,
+                parallel_gpus=gpu_count, vram_util=vram_util, gpu_indices=candidates,
+                mean_prompt_len=mean_prompt_len, mean_output_len=mean_output_len, workload=workload
+            )
+            feasible = np.flatnonzero(sweep['success'] & (sweep[capacity_key] >= user_count))
+            if len(feasible) == 0:
+                continue
+
+            # We want the setup with the lowest total price (ties go to the earlier card)
+            best = feasible[np.lexsort((sweep['gpu_index'][feasible], np.round(sweep['total_price'][feasible] * markup, 3)))[0]]
+            min_effective_price = float(sweep['total_price'][best] * markup)
+            best_setup = {
+                "gpu": catalog[sweep['gpu_index'][best]],
+                "count": gpu_count,
+                "details": sweep_row(sweep, best),
+                "total_price": float(sweep['total_price'][best]),
+                "cold_start_s": float(cold_start),
+                "effective_price": min_effective_price,
+            }
+
         return best_setup
 
-    def deploy_pod(self, gpu_name, model_id, template_id=None, gpu_count=1, pod_name="llm-serving-pod", max_model_len=8192, gpu_util=0.9, model_size_gb=20, extra_vllm_args=None):
+    @telemetry.timed("plan", mode="fleet")
+    def find_parallel_setups(self, model_params, quant='int4', kv_quant='fp8', max_length=8192, user_count=1, gpu_filter=None,
+                             max_gpus=64, tp_degrees=(1, 2, 4, 8), pp_degrees=(1, 2, 4), vram_util=0.9, catalog=None,
+                             mean_prompt_len=None, mean_output_len=None, workload=None,
+                             objectives=("cost", "throughput", "concurrency"), network_volume=False, runtime_hours=None):
+        """
+        Searches tensor-parallel degree x pipeline-parallel degree x data-parallel replica count.
+        Each replica is one pod with tp * pp (at most 8) GPUs of one type; replicas sit behind a
+        load balancer and split user_count evenly, and the whole fleet uses at most max_gpus GPUs.
+        Returns {"cheapest", "best_value" (highest tok/s per $), "pareto"} where "pareto" lists the
+        options not dominated in the given objectives, cheapest first. Objectives are any of
+        "cost", "throughput", "concurrency", "latency" (inter-token latency) and "cold_start".
+        With runtime_hours, cost is the hourly price including the cold start amortized over that runtime.
+        """
+        catalog = (GPU_CATALOG if catalog is None else catalog).filter(gpu_filter)
+        capacity_key = 'workload_concurrency' if workload is not None else 'full_length_gen_count'
+        layouts = [(tp, pp) for tp in tp_degrees for pp in pp_degrees if tp * pp <= 8]
+        if len(catalog) == 0 or not layouts:
+            return None
+
+        # Memory and concurrency only depend on the GPUs per replica
+        per_replica = sorted({tp * pp for tp, pp in layouts})
+        sweep = sweep_performance(
+            catalog, model_params, quant, kv_quant, max_length, user_count, parallel_gpus=per_replica,
+            vram_util=vram_util, mean_prompt_len=mean_prompt_len, mean_output_len=mean_output_len, workload=workload
+        )
+
+        options = {key: [] for key in ("row", "tp", "pp", "replicas")}
+        for tp, pp in layouts:
+            rows = np.flatnonzero(sweep['success'] & (sweep['count'] == tp * pp))
+            for replicas in range(1, max_gpus // (tp * pp) + 1):
+                # Every replica has to hold its share of the users
+                ok = rows[sweep[capacity_key][rows] >= math.ceil(user_count / replicas)]
+                options["row"].append(ok)
+                for key, value in (("tp", tp), ("pp", pp), ("replicas", replicas)):
+                    options[key].append(np.full(len(ok), value))
+        options = {key: np.concatenate(values) for key, values in options.items()}
+        row, tp, pp, replicas = options["row"], options["tp"], options["pp"], options["replicas"]
+        if len(row) == 0:
+            return None
+
+        # Decode throughput of one replica: TP scales compute / bandwidth like the single-pod model,
+        # PP keeps pp micro-batches in flight, each one passing through all stages once per step.
+        gpu = sweep['gpu_index'][row]
+        batch = np.maximum(np.minimum(np.ceil(user_count / replicas), np.floor(sweep[capacity_key][row])), 1)
+        roofline = compute_roofline(
+            catalog.fp16_tflops[gpu] * np.power(tp, sweep['compute_scaling_exp'][row]),
+            catalog.bandwidth_gbs[gpu] * np.power(tp, sweep['bandwidth_scaling_exp'][row]),
+            model_params['total_params_b'], model_params['active_params_b'], sweep['quant_bytes'][row],
+            sweep['kv_read_gb'][row], batch / pp, sweep['prompt_len'][row],
+            sweep['compute_efficiency'][row], sweep['bandwidth_efficiency'][row]
+        )
+        efficiency = np.where(pp > 1, PIPELINE_EFFICIENCY, 1.0)
+        per_user = roofline['decode_tok_s_per_user'] * efficiency
+        throughput = per_user * batch * replicas
+        concurrency = np.floor(sweep[capacity_key][row]) * replicas
+        total_price = catalog.price_hr[gpu] * tp * pp * replicas
+        # Replicas start in parallel; GPUs are billed while they start
+        cold_start = estimate_cold_start(checkpoint_size_gb(model_params), tp * pp, network_volume)['total_s']
+        cold_start = np.broadcast_to(cold_start, total_price.shape)
+        effective_price = total_price * (1 + cold_start / 3600 / runtime_hours) if runtime_hours else total_price
+        value = throughput / effective_price
+
+        def setup(i):
+            return {
+                "gpu": catalog[gpu[i]],
+                "count": int(tp[i] * pp[i] * replicas[i]),
+                "tp": int(tp[i]),
+                "pp": int(pp[i]),
+                "replicas": int(replicas[i]),
+                "gpus_per_replica": int(tp[i] * pp[i]),
+                "throughput_tok_s": float(throughput[i]),
+                "per_user_tok_s": float(per_user[i]),
+                "concurrency": float(concurrency[i]),
+                "tok_s_per_dollar": float(value[i]),
+                "itl_s": float(1 / per_user[i]),
+                "ttft_s": float(roofline['ttft_s'][i]),
+                "details": sweep_row(sweep, row[i]),
+                "total_price": float(total_price[i]),
+                "cold_start_s": float(cold_start[i]),
+                "effective_price": float(effective_price[i]),
+            }
+
+        # Ties: fewer GPUs, then fewer replicas, then less pipeline parallelism, then earlier card
+        cheapest = np.lexsort((gpu, pp, replicas, tp * pp * replicas, np.round(effective_price, 3)))[0]
+        best_value = np.lexsort((gpu, tp * pp * replicas, -value))[0]
+        columns = {"cost": effective_price, "throughput": -throughput, "concurrency": -concurrency, "latency": 1 / per_user,
+                   "cold_start": cold_start}
+        front = pareto_front(np.column_stack([columns[name] for name in objectives]))
+        return {
+            "cheapest": setup(cheapest),
+            "best_value": setup(best_value),
+            "pareto": [setup(i) for i in front],
+        }
+
+    @telemetry.timed("plan", mode="slo")
+    def find_best_gpu_for_slo(self, model_params, request_rate, prompt_lens, output_lens, ttft_p50=None, ttft_p99=None,
+                              itl_p50=None, itl_p99=None, quant='int4', kv_quant='fp8', max_length=8192, gpu_filter=None,
+                              vram_util=0.9, catalog=None):
+        """
+        Cheapest setup whose predicted latencies meet the SLO targets (seconds) for Poisson
+        traffic at request_rate req/s with the given prompt / output length distributions
+        (a number or a list of samples each). Targets left as None are not checked.
+        """
+        catalog = (GPU_CATALOG if catalog is None else catalog).filter(gpu_filter)
+        if len(catalog) == 0:
+            return None
+
+        prompt = length_stats(prompt_lens)
+        output = length_stats(output_lens)
+        sweep = sweep_performance(
+            catalog, model_params, quant, kv_quant, max_length, 1, parallel_gpus=range(1, 9), vram_util=vram_util,
+            mean_prompt_len=prompt['mean'], mean_output_len=output['mean']
+        )
+        latency = predict_latency(sweep, model_params, request_rate, prompt_lens, output_lens)
+
+        ok = sweep['success'] & latency['stable']
+        for key, target in (("ttft_p50", ttft_p50), ("ttft_p99", ttft_p99), ("itl_p50", itl_p50), ("itl_p99", itl_p99)):
+            if target is not None:
+                ok &= latency[key] <= target
+        feasible = np.flatnonzero(ok)
+        if len(feasible) == 0:
+            return None
+
+        # Cheapest first; if price is same, prefer fewer GPUs
+        order = np.lexsort((
+            sweep['gpu_index'][feasible],
+            sweep['count'][feasible],
+            np.round(sweep['total_price'][feasible], 3),
+        ))
+        best = feasible[order[0]]
+        return {
+            "gpu": catalog[sweep['gpu_index'][best]],
+            "count": int(sweep['count'][best]),
+            "details": sweep_row(sweep, best),
+            "latency": {key: values[best].item() for key, values in latency.items()},
+            "total_price": float(sweep['total_price'][best])
+        }
+
+    @telemetry.timed("deploy_pod", none_is_error=True)
+    def deploy_pod(self, gpu_name, model_id, template_id=None, gpu_count=1, pod_name="llm-serving-pod", max_model_len=8192, gpu_util=0.9, model_size_gb=20, extra_vllm_args=None, pipeline_parallel=1, vllm_args=None, env=None, network_volume_id=None, cloud_type="ALL"):
         """
         Deploys a pod using an existing template or the official vLLM image.
+        The gpu_count GPUs are split into pipeline_parallel stages of tensor parallelism.
+        vllm_args, when given, is the complete vLLM argument string (see vllm_profile) and replaces the defaults.
+        With network_volume_id the volume is mounted and used as HF cache (HF_HOME), so weights
+        already on it are not downloaded again and the container disk needs no room for them.
+        cloud_type is "ALL", "SECURE" or "COMMUNITY".
         """
         # Ensure pod_name is lowercase and not None
         pod_name = (pod_name or "llm-serving-pod").lower()
 
         # Find the GPU in GPU_CARDS to get the correct runpod_id
-        target_gpu_id = None
-        for card in GPU_CARDS:
-            if card['name'] == gpu_name:
-                target_gpu_id = card.get('runpod_id')
-                break
+        card = GPU_CATALOG.find(gpu_name)
+        target_gpu_id = card.get('runpod_id') if card else None
         
         if not target_gpu_id:
             print(f"Warning: GPU '{gpu_name}' not found in GPU_CARDS. Falling back to name.")
             target_gpu_id = gpu_name
+
+        if network_volume_id:
+            env = {**(env or {}), "HF_HOME": VOLUME_HF_HOME}
             
         try:
+            telemetry.count("api_calls", api="create_pod")
             if template_id:
                 pod = runpod.create_pod(
                     name=pod_name,
                     gpu_type_id=target_gpu_id,
                     template_id=template_id,
-                    gpu_count=gpu_count
+                    cloud_type=cloud_type,
+                    gpu_count=gpu_count,
+                    env=env,
+                    network_volume_id=network_volume_id,
+                    volume_mount_path=VOLUME_MOUNT_PATH
                 )
             else:
                 print(f"Deploying pod with {gpu_count}x {target_gpu_id} using vLLM image...")
                 # Calculate disk size: model size + 30GB buffer for OS/vLLM
-                disk_size = int(model_size_gb * 1.25 + 30)
+                disk_size = 30 if network_volume_id else int(model_size_gb * 1.25 + 30)
                 # Use official vLLM image
-                vllm_cmd = f"--model {model_id} --gpu-memory-utilization {gpu_util} --max-model-len {max_model_len} -tp {gpu_count}"
-                if extra_vllm_args:
-                    vllm_cmd += f" {extra_vllm_args}"
+                if vllm_args:
+                    vllm_cmd = vllm_args
+                else:
+                    vllm_cmd = f"--model {model_id} --gpu-memory-utilization {gpu_util} --max-model-len {max_model_len} -tp {gpu_count // pipeline_parallel}"
+                    if pipeline_parallel > 1:
+                        vllm_cmd += f" -pp {pipeline_parallel}"
+                    if extra_vllm_args:
+                        vllm_cmd += f" {extra_vllm_args}"
                 
                 pod = runpod.create_pod(
                     name=pod_name,
                     image_name="vllm/vllm-openai:latest",
                     gpu_type_id=target_gpu_id,
+                    cloud_type=cloud_type,
                     gpu_count=gpu_count,
                     docker_args=vllm_cmd,
                     ports="8000/http",
-                    container_disk_in_gb=disk_size
+                    container_disk_in_gb=disk_size,
+                    env=env,
+                    network_volume_id=network_volume_id,
+                    volume_mount_path=VOLUME_MOUNT_PATH
                 )
             return pod
         except Exception as e:
+            telemetry.count("api_errors", api="create_pod")
             print(f"Error creating pod: {e}")
             return None
 
+    def pod_is_idle(self, pod_id):
+        """
+        Whether the vLLM engine of a running pod has no running or queued requests (per its /metrics).
+        A pod that does not answer counts as busy: it may still be starting for someone else.
+        """
+        from .autoscaler import parse_vllm_metrics
+        from .readiness import PROBE_TIMEOUT, pod_url
+
+        try:
+            response = requests.get(f"{pod_url(pod_id).rstrip('/')}/metrics", timeout=PROBE_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException:
+            return False
+        metrics = parse_vllm_metrics(response.text)
+        return metrics["running"] is not None and metrics["running"] + (metrics["waiting"] or 0) == 0
+
+    def find_reusable_pods(self, fingerprint, state_path=None, max_workers=16):
+        """
+        Existing pods launched with the same spec fingerprint that no running CLI owns:
+        running pods whose engine is idle first, then stopped pods that can be resumed.
+        Running pods that serve requests or do not answer are left alone.
+        """
+        try:
+            telemetry.count("api_calls", api="get_pods")
+            pods = runpod.get_pods()
+        except Exception as e:
+            print(f"Error listing pods: {e}")
+            return []
+
+        owned = set(pod_state.load_pods(state_path)) - set(pod_state.orphaned_pods(state_path))
+        matches = [
+            pod for pod in pods
+            if _pod_env(pod).get(FINGERPRINT_ENV) == fingerprint and pod['id'] not in owned
+            and pod.get('desiredStatus') in ("RUNNING", "EXITED")
+        ]
+        running = [pod for pod in matches if pod['desiredStatus'] == "RUNNING"]
+        if running:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(running))) as pool:
+                idle = dict(zip([pod['id'] for pod in running], pool.map(self.pod_is_idle, [pod['id'] for pod in running])))
+            matches = [pod for pod in matches if idle.get(pod['id'], True)]
+        return sorted(matches, key=lambda pod: pod['desiredStatus'] != "RUNNING")
+
+    def acquire_pod(self, pod, gpu_count=1):
+        """
+        Takes over a reusable pod: idle running pods are used as they are (marked "reused"),
+        stopped ones are resumed (marked "resumed").
+        Returns the pod, or None if it could not be resumed (e.g. its machine has no free GPUs).
+        """
+        if pod.get('desiredStatus') == "RUNNING":
+            print(f"Reusing idle running pod {pod['id']}...")
+            return {**pod, "reused": True}
+        try:
+            print(f"Resuming stopped pod {pod['id']}...")
+            telemetry.count("api_calls", api="resume_pod")
+            runpod.resume_pod(pod['id'], gpu_count)
+            return {**pod, "desiredStatus": "RUNNING", "resumed": True}
+        except Exception as e:
+            print(f"Error resuming pod {pod['id']}: {e}")
+            return None
+
+    @telemetry.timed("deploy_fleet", none_is_error=True)
+    def deploy_fleet(self, replicas, gpu_name, model_id, pod_name="llm-serving-pod", max_workers=8, state_path=None, reuse=False, **deploy_kwargs):
+        """
+        Creates replicas identical pods in parallel (deploy_pod kwargs apply to each).
+        With reuse, idle or stopped pods of the same spec fingerprint are taken over first
+        and only the rest is created. Every pod is recorded in the pod state file right away;
+        if any replica fails, created pods are terminated and resumed ones stopped again.
+        Returns the list of pods or None; created pods are marked "created", taken over ones
+        as acquire_pod marks them.
+        """
+        pod_name = (pod_name or "llm-serving-pod").lower()
+        gpu_count = deploy_kwargs.get('gpu_count', 1)
+        launch = {k: v for k, v in deploy_kwargs.items() if k not in ("gpu_count", "model_size_gb", "env", "cloud_type")}
+        fingerprint = spec_fingerprint(model_id, gpu_name, gpu_count, **launch)
+        env = {**(deploy_kwargs.pop('env', None) or {}), FINGERPRINT_ENV: fingerprint}
+
+        acquired = []
+        if reuse:
+            for pod in self.find_reusable_pods(fingerprint, state_path):
+                if len(acquired) == replicas:
+                    break
+                pod = self.acquire_pod(pod, gpu_count)
+                if pod:
+                    pod_state.record_pod(pod['id'], path=state_path, name=pod.get('name'), gpu=gpu_name, model=model_id)
+                    acquired.append(pod)
+
+        names = [pod_name] if replicas == 1 else [f"{pod_name}-{i + 1}" for i in range(replicas)]
+        names = names[len(acquired):]
+
+        def create(name):
+            pod = self.deploy_pod(gpu_name, model_id, pod_name=name, env=env, **deploy_kwargs)
+            if pod:
+                pod_state.record_pod(pod['id'], path=state_path, name=name, gpu=gpu_name, model=model_id)
+                return {**pod, "created": True}
+            return None
+
+        pods = []
+        if names:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(names))) as pool:
+                pods = list(pool.map(create, names))
+
+        created = [pod for pod in pods if pod]
+        if len(acquired) + len(created) < replicas:
+            print(f"Only {len(acquired) + len(created)} of {replicas} pods are available; rolling back.")
+            self.terminate_pods([pod['id'] for pod in created], state_path=state_path)
+            self.stop_pods([pod['id'] for pod in acquired if pod.get('resumed')], state_path=state_path)
+            pod_state.forget_pods([pod['id'] for pod in acquired], path=state_path)
+            return None
+        return acquired + created
+
     def get_connection_details(self, pod_id):
         try:
+            telemetry.count("api_calls", api="get_pod")
             pod = runpod.get_pod(pod_id)
             if not pod:
                 return None
@@ -114,17 +440,85 @@ class RunpodManager:
             }
 
             if pod.get('runtime'):
-                details["status"] = pod['runtime'].get('status')
+                details["status"] = pod['runtime'].get('status') or "RUNNING"
+            elif pod.get('desiredStatus'):
+                details["status"] = pod['desiredStatus'] if pod['desiredStatus'] != "RUNNING" else "STARTING"
             
             return details
         except Exception as e:
             print(f"Error getting pod details: {e}")
             return None
 
+    def replica_spec(self, pod_id):
+        """
+        deploy_fleet kwargs that clone an existing pod (GPU count, vLLM args, env), or None.
+        """
+        try:
+            telemetry.count("api_calls", api="get_pod")
+            pod = runpod.get_pod(pod_id)
+        except Exception as e:
+            print(f"Error getting pod details: {e}")
+            return None
+        if not pod:
+            return None
+        env = {key: value for key, value in _pod_env(pod).items() if key != FINGERPRINT_ENV}
+        return {"gpu_count": pod.get('gpuCount') or 1, "vllm_args": pod.get('dockerArgs') or None, "env": env or None}
+
+    def wait_until_ready(self, pod_ids, timeout=600, on_phase=None):
+        """
+        Waits until the vLLM engine of every pod answers (see readiness.watch_pods).
+        Returns {pod_id: {"phase", "ready", "elapsed", "url", "phases", "error"}}.
+        """
+        from . import readiness
+
+        return readiness.wait_until_ready(pod_ids, timeout=timeout, on_phase=on_phase)
+
     def terminate_pod(self, pod_id):
         try:
+            telemetry.count("api_calls", api="terminate_pod")
             runpod.terminate_pod(pod_id)
             return True
         except Exception as e:
             print(f"Error terminating pod: {e}")
             return False
+
+    def terminate_pods(self, pod_ids, max_workers=16, state_path=None):
+        """
+        Terminates pods in parallel and removes the terminated ones from the pod state file.
+        Returns {pod_id: success}.
+        """
+        if not pod_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pod_ids))) as pool:
+            results = dict(zip(pod_ids, pool.map(self.terminate_pod, pod_ids)))
+        pod_state.forget_pods([pod_id for pod_id, success in results.items() if success], path=state_path)
+        return results
+
+    def stop_pod(self, pod_id):
+        try:
+            telemetry.count("api_calls", api="stop_pod")
+            runpod.stop_pod(pod_id)
+            return True
+        except Exception as e:
+            print(f"Error stopping pod: {e}")
+            return False
+
+    def stop_pods(self, pod_ids, max_workers=16, state_path=None):
+        """
+        Stops pods in parallel, keeping their container disk (and downloaded weights) for reuse.
+        Stopped pods are released from the pod state file. Returns {pod_id: success}.
+        """
+        if not pod_ids:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(pod_ids))) as pool:
+            results = dict(zip(pod_ids, pool.map(self.stop_pod, pod_ids)))
+        pod_state.forget_pods([pod_id for pod_id, success in results.items() if success], path=state_path)
+        return results
+
+    def reclaim_orphans(self, state_path=None):
+        """
+        Terminates pods left behind by a CLI process that died without cleaning up.
+        Returns {pod_id: success}.
+        """
+        orphans = pod_state.orphaned_pods(state_path)
+        return self.terminate_pods(list(orphans), state_path=state_path)
@@ -0,0 +1,160 @@
+import json
+import mmap
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+
+from .utils.lazy import lazy_import
+
+huggingface_hub = lazy_import("huggingface_hub")
+requests = lazy_import("requests")
+
+INDEX_FILENAME = "model.safetensors.index.json"
+SINGLE_FILENAME = "model.safetensors"
+
+# Bytes per element for every dtype the safetensors format defines
+DTYPE_BYTES = {
+    "F64": 8, "I64": 8, "U64": 8,
+    "F32": 4, "I32": 4, "U32": 4,
+    "F16": 2, "BF16": 2, "I16": 2, "U16": 2,
+    "F8_E4M3": 1, "F8_E5M2": 1, "F8_E8M0": 1, "I8": 1, "U8": 1, "BOOL": 1,
+    "F6_E2M3": 0.75, "F6_E3M2": 0.75, "F4": 0.5,
+}
+
+# Integer tensors that pack several low-bit weights per element (GPTQ / AWQ, compressed-tensors pack-quantized)
+PACKED_WEIGHT_SUFFIXES = (".qweight", ".weight_packed")
+
+# First ranged read per remote shard; most headers fit, bigger ones take a second read
+_INITIAL_RANGE_BYTES = 64 * 1024
+
+
+def _parse_header(raw):
+    header = json.loads(raw)
+    header.pop("__metadata__", None)
+    return header
+
+
+def read_safetensors_header(path):
+    """
+    Reads the JSON header of a local safetensors file via mmap, without touching the tensor data.
+    """
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            (header_len,) = struct.unpack('<Q', mm[:8])
+            return _parse_header(mm[8:8 + header_len])
+
+
+def fetch_safetensors_header(model_id, filename, revision=None, session=None):
+    """
+    Reads the JSON header of a safetensors file on the HuggingFace hub through HTTP range requests.
+    """
+    from huggingface_hub.utils import build_hf_headers
+
+    http = session or requests
+    url = huggingface_hub.hf_hub_url(model_id, filename, revision=revision)
+    headers = build_hf_headers()
+
+    response = http.get(url, headers={**headers, "Range": f"bytes=0-{_INITIAL_RANGE_BYTES - 1}"}, timeout=30)
+    response.raise_for_status()
+    data = response.content
+    (header_len,) = struct.unpack('<Q', data[:8])
+
+    if len(data) < 8 + header_len:
+        response = http.get(url, headers={**headers, "Range": f"bytes={len(data)}-{8 + header_len - 1}"}, timeout=30)
+        response.raise_for_status()
+        data += response.content
+    return _parse_header(data[8:8 + header_len])
+
+
+def weight_bits(quantization_config):
+    """Bits per weight of a packed integer quantization (GPTQ, AWQ, compressed-tensors), or None."""
+    if not quantization_config:
+        return None
+    bits = quantization_config.get("bits") or quantization_config.get("w_bit")
+    if not bits:
+        groups = (quantization_config.get("config_groups") or {}).values()
+        bits = next((group["weights"]["num_bits"] for group in groups if (group.get("weights") or {}).get("num_bits")), None)
+    return bits
+
+
+def summarize_headers(headers, quantization_config=None):
+    """
+    Sums parameter and byte counts per dtype over a list of parsed safetensors headers.
+    With the checkpoint's quantization_config, packed integer weights (e.g. eight int4 values
+    per I32 element of a GPTQ qweight) count as the parameters they hold.
+    Returns {"total_params": int, "total_bytes": int, "dtypes": {dtype: {"params": int, "bytes": int}}}.
+    """
+    bits = weight_bits(quantization_config)
+    dtypes = {}
+    for header in headers:
+        for name, tensor in header.items():
+            numel = 1
+            for dim in tensor["shape"]:
+                numel *= dim
+            element_bits = DTYPE_BYTES.get(tensor["dtype"], 0) * 8
+            if bits and bits < element_bits and tensor["dtype"].startswith(("I", "U")) and name.endswith(PACKED_WEIGHT_SUFFIXES):
+                numel *= int(element_bits // bits)
+            start, end = tensor["data_offsets"]
+            totals = dtypes.setdefault(tensor["dtype"], {"params": 0, "bytes": 0})
+            totals["params"] += numel
+            totals["bytes"] += end - start
+    return {
+        "total_params": sum(t["params"] for t in dtypes.values()),
+        "total_bytes": sum(t["bytes"] for t in dtypes.values()),
+        "dtypes": dtypes,
+    }
+
+
+def dtype_totals_from_counts(param_counts):
+    """
+    Builds the same summary from per-dtype parameter counts (e.g. HfApi.model_info().safetensors.parameters).
+    """
+    dtypes = {
+        dtype: {"params": int(count), "bytes": int(count * DTYPE_BYTES.get(dtype, 2))}
+        for dtype, count in param_counts.items()
+    }
+    return {
+        "total_params": sum(t["params"] for t in dtypes.values()),
+        "total_bytes": sum(t["bytes"] for t in dtypes.values()),
+        "dtypes": dtypes,
+    }
+
+
+def _shards_from_index(index):
+    # weight_map maps every tensor name to its shard; keep first-seen order
+    return list(dict.fromkeys(index["weight_map"].values()))
+
+
+def get_safetensors_totals(model_id, revision=None, max_workers=8, quantization_config=None):
+    """
+    Exact parameter/byte totals of a checkpoint from its safetensors headers only.
+    model_id may be a local snapshot directory or a HuggingFace repo id; quantization_config
+    (from config.json) unpacks packed integer weights, see summarize_headers.
+    Returns None when the checkpoint has no safetensors files.
+    """
+    if os.path.isdir(model_id):
+        index_path = os.path.join(model_id, INDEX_FILENAME)
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as f:
+                shards = _shards_from_index(json.load(f))
+        else:
+            shards = sorted(name for name in os.listdir(model_id) if name.endswith(".safetensors"))
+        if not shards:
+            return None
+        return summarize_headers([read_safetensors_header(os.path.join(model_id, shard)) for shard in shards], quantization_config)
+
+    api = huggingface_hub.HfApi()
+    try:
+        index_path = api.hf_hub_download(repo_id=model_id, filename=INDEX_FILENAME, revision=revision)
+        with open(index_path, 'r') as f:
+            shards = _shards_from_index(json.load(f))
+    except Exception:
+        shards = [SINGLE_FILENAME]
+
+    try:
+        with requests.Session() as session, ThreadPoolExecutor(max_workers=max_workers) as pool:
+            headers = list(pool.map(lambda shard: fetch_safetensors_header(model_id, shard, revision, session), shards))
+    except Exception as e:
+        print(f"Error reading safetensors headers: {e}")
+        return None
+    return summarize_headers(headers, quantization_config)
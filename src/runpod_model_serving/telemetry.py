@@ -0,0 +1,165 @@
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Default export targets, so every deploy of a fleet of scripts can be trended without extra flags
+JSONL_ENV = "RUNPOD_SERVE_METRICS_JSONL"
+TEXTFILE_ENV = "RUNPOD_SERVE_METRICS_TEXTFILE"
+METRIC_PREFIX = "runpod_serve"
+
+# Identifies all records of one CLI process in the JSON lines export
+RUN_ID = uuid.uuid4().hex
+
+# Spans not yet written to JSON lines, and per-process aggregates for the Prometheus textfile
+_lock = threading.Lock()
+_pending = []
+_spans = {}
+_counters = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def record_span(name, seconds, start=None, **labels):
+    """Records a finished span of the given duration (e.g. a readiness phase measured elsewhere)."""
+    key = _key(name, labels)
+    with _lock:
+        _pending.append({"type": "span", "name": name, "labels": dict(key[1]),
+                         "start": start if start is not None else time.time() - seconds, "duration_s": seconds})
+        total, count, _ = _spans.get(key, (0.0, 0, 0.0))
+        _spans[key] = (total + seconds, count + 1, seconds)
+
+
+@contextmanager
+def span(name, **labels):
+    """
+    Times the enclosed block as a span; failed blocks get status="error".
+    The yielded dict holds the status, so a block that handles its own failure can set it too.
+    """
+    start, t0 = time.time(), time.perf_counter()
+    state = {"status": "ok"}
+    try:
+        yield state
+    except BaseException as e:
+        # sys.exit(0) is a normal way out of the CLI
+        if not (isinstance(e, SystemExit) and not e.code):
+            state["status"] = "error"
+        raise
+    finally:
+        record_span(name, time.perf_counter() - t0, start=start, status=state["status"], **labels)
+
+
+def timed(name, none_is_error=False, **labels):
+    """Decorator form of span(); with none_is_error a None result (a failure the function caught) is an error too."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **labels) as state:
+                result = func(*args, **kwargs)
+                if none_is_error and result is None:
+                    state["status"] = "error"
+                return result
+        return wrapper
+    return decorator
+
+
+def count(name, value=1, **labels):
+    """Increments a counter (API calls, retries, cache hits, ...)."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def snapshot():
+    """Current aggregates: {"spans": [{name, labels, sum_s, count, last_s}], "counters": [{name, labels, value}]}."""
+    with _lock:
+        return {
+            "spans": [{"name": name, "labels": dict(labels), "sum_s": total, "count": n, "last_s": last}
+                      for (name, labels), (total, n, last) in _spans.items()],
+            "counters": [{"name": name, "labels": dict(labels), "value": value}
+                         for (name, labels), value in _counters.items()],
+        }
+
+
+def reset():
+    with _lock:
+        _pending.clear()
+        _spans.clear()
+        _counters.clear()
+
+
+def write_jsonl(path):
+    """
+    Appends the spans recorded since the last call plus the current counter totals
+    (cumulative per run, so the last counter record of a run_id is its total).
+    """
+    with _lock:
+        spans = list(_pending)
+        _pending.clear()
+    counters = snapshot()["counters"]
+    now = time.time()
+    lines = [{"run_id": RUN_ID, **record} for record in spans]
+    lines += [{"run_id": RUN_ID, "type": "counter", "time": now, **record} for record in counters]
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'a') as f:
+        for line in lines:
+            f.write(json.dumps(line) + "\n")
+
+
+def _metric_name(name):
+    return f"{METRIC_PREFIX}_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _label_str(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def prometheus_text():
+    """Aggregates in the Prometheus text exposition format (node_exporter textfile collector)."""
+    data = snapshot()
+    lines = []
+    if data["spans"]:
+        metric = f"{METRIC_PREFIX}_span_seconds"
+        lines += [f"# HELP {metric} Duration of instrumented phases.", f"# TYPE {metric} summary"]
+        for s in data["spans"]:
+            labels = _label_str({"span": s["name"], **s["labels"]})
+            lines += [f"{metric}_sum{labels} {s['sum_s']:.6f}", f"{metric}_count{labels} {s['count']}"]
+        metric = f"{METRIC_PREFIX}_span_last_seconds"
+        lines += [f"# HELP {metric} Duration of the most recent run of each phase.", f"# TYPE {metric} gauge"]
+        for s in data["spans"]:
+            lines.append(f"{metric}{_label_str({'span': s['name'], **s['labels']})} {s['last_s']:.6f}")
+    for name in sorted({c["name"] for c in data["counters"]}):
+        metric = f"{_metric_name(name)}_total"
+        lines += [f"# TYPE {metric} counter"]
+        lines += [f"{metric}{_label_str(c['labels'])} {c['value']}" for c in data["counters"] if c["name"] == name]
+    metric = f"{METRIC_PREFIX}_last_export_timestamp_seconds"
+    lines += [f"# TYPE {metric} gauge", f"{metric} {time.time():.3f}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path):
+    """Writes prometheus_text() atomically, as the textfile collector expects."""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+
+def export(jsonl_path=None, textfile_path=None):
+    """Writes whichever exports are configured; failures only warn."""
+    try:
+        if jsonl_path:
+            write_jsonl(jsonl_path)
+        if textfile_path:
+            write_textfile(textfile_path)
+    except OSError as e:
+        print(f"Warning: could not write metrics: {e}")
@@ -1,3 +1,6 @@
+import re
+import numpy as np
+
 GPU_CARDS = [
     # Featured GPUs
     {"name": "NVIDIA RTX 5090", "runpod_id": "NVIDIA GeForce RTX 5090", "vramGb": 32, "memoryBandwidthGBs": 1790.0, "processPower": {"fp16": 104.8}, "kvQuantType": "fp8", "price_hr": 0.76},
@@ -34,3 +37,80 @@ GPU_CARDS = [
     {"name": "AMD RX7900XTX 24G", "runpod_id": "AMD RX7900XTX 24G", "vramGb": 24, "memoryBandwidthGBs": 960.0, "processPower": {"fp16": 61.4}, "kvQuantType": "fp8", "price_hr": 0.40},
     {"name": "AMD R780M 8G*", "runpod_id": "AMD R780M 8G*", "vramGb": 8, "memoryBandwidthGBs": 89.6, "processPower": {"fp16": 16.6}, "kvQuantType": "fp8", "price_hr": 0.10},
 ]
+
+
+class GpuCatalog:
+    """
+    Compact, indexed view over a list of GPU cards.
+    Specs are held as parallel NumPy arrays (in the original card order) plus
+    sort orders by price, VRAM and memory bandwidth for fast range lookups.
+    """
+    __slots__ = (
+        "cards", "names", "vram_gb", "bandwidth_gbs", "fp16_tflops", "price_hr",
+        "by_price", "by_vram", "by_bandwidth", "_name_index", "_filtered",
+    )
+
+    def __init__(self, cards):
+        self.cards = list(cards)
+        self.names = [card['name'] for card in self.cards]
+        self.vram_gb = np.array([card['vramGb'] for card in self.cards], dtype=np.float64)
+        self.bandwidth_gbs = np.array([card['memoryBandwidthGBs'] for card in self.cards], dtype=np.float64)
+        self.fp16_tflops = np.array([card['processPower'].get('fp16', 0) for card in self.cards], dtype=np.float64)
+        self.price_hr = np.array([card.get('price_hr', 999.0) for card in self.cards], dtype=np.float64)
+
+        # Stable sorts keep the original card order for ties
+        self.by_price = np.argsort(self.price_hr, kind='stable')
+        self.by_vram = np.argsort(self.vram_gb, kind='stable')
+        self.by_bandwidth = np.argsort(self.bandwidth_gbs, kind='stable')
+
+        self._name_index = {name: i for i, name in enumerate(self.names)}
+        self._filtered = {}
+
+    def __len__(self):
+        return len(self.cards)
+
+    def __iter__(self):
+        return iter(self.cards)
+
+    def __getitem__(self, i):
+        return self.cards[i]
+
+    def find(self, name):
+        """Returns the card with the given display name, or None."""
+        i = self._name_index.get(name)
+        return None if i is None else self.cards[i]
+
+    def filter(self, pattern):
+        """
+        Returns a sub-catalog of the cards whose name matches the regex (case-insensitive).
+        The regex is compiled once and the result is cached per pattern.
+        """
+        if not pattern:
+            return self
+        if pattern not in self._filtered:
+            regex = re.compile(pattern, re.IGNORECASE)
+            self._filtered[pattern] = GpuCatalog([card for card in self.cards if regex.search(card['name'])])
+        return self._filtered[pattern]
+
+    def without(self, names):
+        """Returns a sub-catalog without the named cards (e.g. after a failed pod create)."""
+        names = set(names)
+        return GpuCatalog([card for card in self.cards if card['name'] not in names])
+
+    def cheaper_than(self, max_price_hr):
+        """Indices of cards with price_hr strictly below max_price_hr (cheapest first)."""
+        n = np.searchsorted(self.price_hr[self.by_price], max_price_hr, side='left')
+        return self.by_price[:n]
+
+    def with_min_vram(self, min_vram_gb):
+        """Indices of cards with at least min_vram_gb of VRAM (smallest first)."""
+        start = np.searchsorted(self.vram_gb[self.by_vram], min_vram_gb, side='left')
+        return self.by_vram[start:]
+
+    def with_min_bandwidth(self, min_bandwidth_gbs):
+        """Indices of cards with at least min_bandwidth_gbs of memory bandwidth (slowest first)."""
+        start = np.searchsorted(self.bandwidth_gbs[self.by_bandwidth], min_bandwidth_gbs, side='left')
+        return self.by_bandwidth[start:]
+
+
+GPU_CATALOG = GpuCatalog(GPU_CARDS)
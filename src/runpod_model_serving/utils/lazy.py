@@ -0,0 +1,21 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Returns the module, but only executes it on first attribute access.
+    The Runpod SDK alone takes seconds to import, so SDK modules are bound this way and
+    planning-only code (calculator, planner, --dry-run) never pays for them.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
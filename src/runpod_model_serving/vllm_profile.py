@@ -0,0 +1,137 @@
+import math
+import shlex
+from .calculator import DEFAULT_MAX_NUM_BATCHED_TOKENS
+
+# vLLM --kv-cache-dtype per planned KV quantization; vLLM has no int8 KV cache, fp8 has the same size.
+# There is no 4-bit KV cache at all, so int4 KV cannot be deployed as planned
+KV_CACHE_DTYPES = {'fp16': 'auto', 'fp8': 'fp8', 'int8': 'fp8'}
+
+# vLLM --quantization for online quantization of an unquantized (fp16 / bf16) checkpoint.
+# There is no online int8: bitsandbytes loads the weights as 4-bit, so int8 needs an int8 checkpoint
+ONLINE_QUANTIZATION = {'fp8': 'fp8', 'int4': 'bitsandbytes'}
+
+# Short flags vLLM accepts, normalized to their long form for merging
+FLAG_ALIASES = {'-tp': '--tensor-parallel-size', '-pp': '--pipeline-parallel-size', '-q': '--quantization'}
+
+# Share of the running requests whose KV cache should fit into CPU swap when they get preempted
+SWAP_PREEMPTION_SHARE = 0.1
+MAX_SWAP_SPACE_GB = 32
+
+
+def deployable_quants(quant, kv_quant, model_params):
+    """
+    The closest (quant, kv_quant) vLLM can serve as sized, plus a warning per replaced format:
+    int8 weights of an unquantized checkpoint become int4, an int4 KV cache becomes fp8.
+    """
+    warnings = []
+    if quant == 'int8' and not model_params.get('quant_method'):
+        # vLLM's only online int-quantization (bitsandbytes) loads the weights as 4-bit
+        warnings.append("vLLM cannot quantize this unquantized checkpoint to int8 online; planning with int4 instead.")
+        quant = 'int4'
+    if kv_quant not in KV_CACHE_DTYPES:
+        # Launched as fp8 it would take twice the KV memory it was sized with, and vLLM would preempt
+        warnings.append(f"vLLM has no {kv_quant} KV cache; planning with an fp8 KV cache instead.")
+        kv_quant = 'fp8'
+    return quant, kv_quant, warnings
+
+
+def build_vllm_profile(details, model_params, model_id, quant, kv_quant, max_length, gpu_util, gpu_count=1,
+                       pipeline_parallel=1, prefix_caching=True):
+    """
+    vLLM launch profile matching a calculate_performance result (details), as a list of
+    (flag, value) pairs; value is None for boolean flags.
+    Raises ValueError for formats vLLM cannot serve as planned (see deployable_quants).
+    """
+    if quant == 'int8' and not model_params.get('quant_method'):
+        raise ValueError("vLLM cannot quantize to int8 online; plan with int4 or use an int8 checkpoint")
+    if kv_quant not in KV_CACHE_DTYPES:
+        raise ValueError(f"vLLM has no {kv_quant} KV cache; plan with fp8")
+    profile = [
+        ("--model", model_id),
+        ("--gpu-memory-utilization", gpu_util),
+        ("--max-model-len", max_length),
+        ("--tensor-parallel-size", gpu_count // pipeline_parallel),
+    ]
+    if pipeline_parallel > 1:
+        profile.append(("--pipeline-parallel-size", pipeline_parallel))
+
+    # Pre-quantized checkpoints carry their method; otherwise quantize online to the planned format
+    if model_params.get('quant_method'):
+        profile.append(("--quantization", model_params['quant_method']))
+    elif quant in ONLINE_QUANTIZATION:
+        profile.append(("--quantization", ONLINE_QUANTIZATION[quant]))
+    profile.append(("--kv-cache-dtype", KV_CACHE_DTYPES[kv_quant]))
+
+    # Admit as many sequences as the KV cache was sized for, so vLLM does not preempt
+    capacity = details.get('workload_concurrency', details['full_length_gen_count'])
+    max_num_seqs = max(1, int(capacity))
+    profile.append(("--max-num-seqs", max_num_seqs))
+    profile.append(("--enable-chunked-prefill", None))
+    profile.append(("--max-num-batched-tokens", max(DEFAULT_MAX_NUM_BATCHED_TOKENS, max_num_seqs)))
+    if prefix_caching:
+        profile.append(("--enable-prefix-caching", None))
+
+    # CPU swap (GiB per GPU) for the KV of the requests that may get preempted
+    preempted = math.ceil(max_num_seqs * SWAP_PREEMPTION_SHARE)
+    swap_gb = math.ceil(details['kv_cache_vram'] * preempted / gpu_count)
+    profile.append(("--swap-space", min(MAX_SWAP_SPACE_GB, max(1, swap_gb))))
+    return profile
+
+
+def parse_vllm_args(args):
+    """
+    Parses an extra vLLM argument string into (flag, value) pairs.
+    Accepts '--flag value', '--flag=value' and boolean '--flag'; raises ValueError on stray values.
+    """
+    tokens = shlex.split(args or "")
+    parsed = []
+    i = 0
+    while i < len(tokens):
+        token = tokens[i]
+        if not token.startswith("-"):
+            raise ValueError(f"Unexpected value '{token}' without a preceding flag in vLLM args")
+        if "=" in token:
+            flag, value = token.split("=", 1)
+        elif i + 1 < len(tokens) and not tokens[i + 1].startswith("--") and not tokens[i + 1] in FLAG_ALIASES:
+            flag, value = token, tokens[i + 1]
+            i += 1
+        else:
+            flag, value = token, None
+        parsed.append((FLAG_ALIASES.get(flag, flag), value))
+        i += 1
+    return parsed
+
+
+def merge_vllm_args(profile, extra_args):
+    """
+    Merges extra user arguments into a profile; user values win, and '--no-<flag>' replaces a planned boolean '--<flag>'.
+    Returns (merged pairs, warnings) where warnings name every planned value that was overridden.
+    Raises ValueError for malformed extra args or flags given twice.
+    """
+    extra = parse_vllm_args(extra_args)
+    flags = [flag for flag, _ in extra]
+    duplicates = sorted({flag for flag in flags if flags.count(flag) > 1})
+    if duplicates:
+        raise ValueError(f"vLLM args given more than once: {', '.join(duplicates)}")
+
+    overrides = dict(extra)
+    warnings = []
+    merged = []
+    for flag, value in profile:
+        negated = f"--no-{flag[2:]}"
+        if value is None and negated in overrides:
+            warnings.append(f"{negated} disables the planned {flag}")
+            merged.append((negated, overrides.pop(negated)))
+        elif flag in overrides:
+            if str(overrides[flag]) != str(value):
+                warnings.append(f"{flag} {overrides[flag] if overrides[flag] is not None else ''} overrides the planned value {value if value is not None else '(on)'}")
+            merged.append((flag, overrides.pop(flag)))
+        else:
+            merged.append((flag, value))
+    merged.extend((flag, value) for flag, value in extra if flag in overrides)
+    return merged, warnings
+
+
+def format_vllm_args(pairs):
+    """Renders (flag, value) pairs as a shell-safe vLLM argument string."""
+    return " ".join(flag if value is None else f"{flag} {shlex.quote(str(value))}" for flag, value in pairs)
@@ -0,0 +1,76 @@
+import json
+import numpy as np
+
+# Accepted field names for prompt / output token counts in trace records
+PROMPT_KEYS = ("prompt_tokens", "input_tokens", "prompt_len")
+OUTPUT_KEYS = ("output_tokens", "completion_tokens", "output_len")
+
+
+def make_workload(prompt_lens, output_lens, counts=None, shared_prefix_ratio=0.0):
+    """
+    Workload profile: paired prompt / output token lengths, optionally weighted by counts
+    (a length histogram), plus the share of each prompt that is a common prefix
+    (only relevant when vLLM prefix caching is on).
+    """
+    prompt_lens = np.atleast_1d(np.asarray(prompt_lens, dtype=np.float64))
+    output_lens = np.atleast_1d(np.asarray(output_lens, dtype=np.float64))
+    counts = np.ones(len(prompt_lens)) if counts is None else np.atleast_1d(np.asarray(counts, dtype=np.float64))
+    if not (len(prompt_lens) == len(output_lens) == len(counts)) or len(prompt_lens) == 0:
+        raise ValueError("prompt_lens, output_lens and counts must be non-empty and of equal length")
+    if not 0 <= shared_prefix_ratio < 1:
+        raise ValueError("shared_prefix_ratio must be in [0, 1)")
+    return {
+        "prompt_lens": prompt_lens,
+        "output_lens": output_lens,
+        "counts": counts,
+        "shared_prefix_ratio": float(shared_prefix_ratio),
+    }
+
+
+def _pick(record, keys):
+    for key in keys:
+        if key in record:
+            return record[key]
+    raise ValueError(f"Record has none of the fields {keys}: {record}")
+
+
+def load_workload(path, shared_prefix_ratio=0.0):
+    """
+    Loads a workload from a JSONL trace (one request per line) or a JSON list.
+    Each record needs prompt and output token counts and may carry a "count"
+    to describe a histogram bin instead of a single request.
+    """
+    with open(path, 'r') as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith("["):
+        records = json.loads(stripped)
+    else:
+        records = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    return make_workload(
+        [_pick(r, PROMPT_KEYS) for r in records],
+        [_pick(r, OUTPUT_KEYS) for r in records],
+        [r.get("count", 1) for r in records],
+        shared_prefix_ratio=shared_prefix_ratio,
+    )
+
+
+def weighted_percentile(values, weights, q):
+    """q-th percentile (0-100) of values under the given weights."""
+    order = np.argsort(values)
+    cumulative = np.cumsum(weights[order])
+    idx = np.searchsorted(cumulative, q / 100 * cumulative[-1], side='left')
+    return float(values[order][min(idx, len(values) - 1)])
+
+
+def workload_summary(workload):
+    """Request-weighted mean / p50 / p99 of the prompt and output lengths."""
+    counts = workload["counts"]
+    summary = {}
+    for name in ("prompt", "output"):
+        lens = workload[f"{name}_lens"]
+        summary[f"{name}_mean"] = float(np.average(lens, weights=counts))
+        summary[f"{name}_p50"] = weighted_percentile(lens, counts, 50)
+        summary[f"{name}_p99"] = weighted_percentile(lens, counts, 99)
+    return summary
@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from runpod_model_serving import calibration, gpu_market, hf_loader, pod_state, telemetry
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "models")
+# Local snapshots: a real config.json plus a header-only model.safetensors with the parameter totals
+FIXTURE_MODELS = sorted(name for name in os.listdir(FIXTURES_DIR) if os.path.isdir(os.path.join(FIXTURES_DIR, name)))
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    """Keeps the user's caches, pod state, API key, calibration profiles and telemetry out of every test."""
+    monkeypatch.setattr(hf_loader, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(gpu_market, "MARKET_CACHE_PATH", str(tmp_path / "cache" / "gpu_market.json"))
+    monkeypatch.delenv(gpu_market.MARKET_FIXTURE_ENV, raising=False)
+    monkeypatch.delenv("RUNPOD_API_KEY", raising=False)
+    monkeypatch.setattr(hf_loader, "_memory_cache", {})
+    monkeypatch.setattr(pod_state, "STATE_PATH", str(tmp_path / "cache" / "pods.json"))
+    monkeypatch.setattr(calibration, "CALIBRATION_DIR", str(tmp_path / "calibration"))
+    telemetry.reset()
+
+
+@pytest.fixture(params=FIXTURE_MODELS)
+def fixture_model(request):
+    return request.param
+
+
+@pytest.fixture
+def model_params(fixture_model):
+    return hf_loader.get_model_params(os.path.join(FIXTURES_DIR, fixture_model), offline=True)
@@ -0,0 +1,130 @@
+import asyncio
+
+import pytest
+
+from runpod_model_serving import autoscaler
+from runpod_model_serving.autoscaler import Autoscaler, parse_vllm_metrics
+
+
+def metrics(running, waiting=0, kv_cache_usage=0.5, generation_tokens=0):
+    return {"running": running, "waiting": waiting, "kv_cache_usage": kv_cache_usage, "generation_tokens": generation_tokens, "prompt_tokens": 0}
+
+
+class FakeManager:
+    def __init__(self):
+        self.created = 0
+        self.terminated = []
+
+    def deploy_fleet(self, replicas, **deploy_kwargs):
+        pods = [{"id": f"new-{self.created + i + 1}"} for i in range(replicas)]
+        self.created += replicas
+        return pods
+
+    def terminate_pods(self, pod_ids):
+        self.terminated.extend(pod_ids)
+        return {pod_id: True for pod_id in pod_ids}
+
+
+class Fleet:
+    """An Autoscaler on a FakeManager whose replicas report the metrics in self.load (None = no answer)."""
+
+    def __init__(self, monkeypatch, pod_ids=("a",), **policy):
+        self.now = 0.0
+        self.load = {}
+        self.events = []
+
+        async def scrape(session, url):
+            return self.load.get(url)
+
+        monkeypatch.setattr(autoscaler, "scrape_replica", scrape)
+        self.manager = FakeManager()
+        self.scaler = Autoscaler(
+            self.manager, capacity=10, pod_ids=list(pod_ids), url_for=lambda pod_id: pod_id, clock=lambda: self.now,
+            on_event=lambda action, message: self.events.append(action), **policy
+        )
+
+    def step(self, seconds=15):
+        status = asyncio.run(self.scaler.step(None))
+        self.now += seconds
+        return status
+
+
+def test_parse_vllm_metrics():
+    text = (
+        "# HELP vllm:num_requests_running Number of requests running\n"
+        'vllm:num_requests_running{engine="0"} 3.0\nvllm:num_requests_running{engine="1"} 2.0\n'
+        'vllm:gpu_cache_usage_perc{engine="0"} 0.5\nvllm:gpu_cache_usage_perc{engine="1"} 0.7\n'
+    )
+    assert parse_vllm_metrics(text) == {"running": 5.0, "waiting": None, "kv_cache_usage": 0.7, "generation_tokens": None, "prompt_tokens": None}
+
+
+def test_unknown_policy_option():
+    with pytest.raises(ValueError):
+        Autoscaler(FakeManager(), 10, ["a"], up_cooldown=5)
+
+
+def test_decide_waits_for_stabilization_and_cooldown():
+    scaler = Autoscaler(FakeManager(), 10, ["a"], up_stabilization=2, up_cooldown_s=60, max_step=2)
+    busy = {"a": metrics(running=20)}
+    assert scaler.decide(busy, 0) == (1, "scale out pending (1/2)")
+    target, reason = scaler.decide(busy, 15)
+    # 20 in flight at 7.5 per replica, but at most max_step more at once
+    assert target == 3 and reason.startswith("20 in-flight requests")
+
+    scaler.last_action = 15
+    assert scaler.decide(busy, 30) == (1, "scale out cooling down")
+    # A lull resets the votes
+    scaler.decide({"a": metrics(running=5)}, 45)
+    assert scaler.up_votes == 0
+
+
+def test_decide_scales_out_on_a_saturated_kv_cache():
+    scaler = Autoscaler(FakeManager(), 10, ["a"], up_stabilization=1)
+    target, reason = scaler.decide({"a": metrics(running=4, waiting=2, kv_cache_usage=0.95)}, 0)
+    assert target == 2 and reason.endswith("(KV cache saturated)")
+
+
+def test_decide_scales_in_below_the_lower_threshold():
+    scaler = Autoscaler(FakeManager(), 10, ["a", "b"], down_stabilization=2, down_cooldown_s=0)
+    quiet = {"a": metrics(running=1), "b": metrics(running=2)}
+    assert scaler.decide(quiet, 0) == (2, "scale in pending (1/2)")
+    assert scaler.decide(quiet, 15) == (1, "3 in-flight requests fit on 1 replicas")
+    assert scaler.decide({}, 30) == (2, "no metrics")
+
+
+def test_step_scales_out_then_in(monkeypatch):
+    fleet = Fleet(monkeypatch, up_stabilization=2, up_cooldown_s=0, down_stabilization=2, down_cooldown_s=0)
+    fleet.load["a"] = metrics(running=12, generation_tokens=0)
+    assert fleet.step()["target"] == 1
+    status = fleet.step()
+    assert (status["target"], status["starting"]) == (2, 1)
+
+    # The new replica is serving once it answers; throughput comes from the token counter
+    fleet.load["a"] = metrics(running=12, generation_tokens=3000)
+    fleet.load["new-1"] = metrics(running=0)
+    status = fleet.step()
+    assert (status["serving"], status["starting"]) == (2, 0)
+    assert status["gen_tok_s"] == pytest.approx(3000 / 15)
+
+    fleet.load["a"] = metrics(running=1)
+    fleet.step()
+    status = fleet.step()
+    assert status["serving"] == 1
+    # The least busy replica goes
+    assert fleet.manager.terminated == ["new-1"]
+    assert fleet.events == ["up", "ready", "down"]
+
+
+def test_step_replaces_dead_and_stuck_replicas(monkeypatch):
+    fleet = Fleet(monkeypatch, pod_ids=["a", "b"], min_replicas=2, max_missed_scrapes=2, startup_timeout_s=20)
+    fleet.load["a"] = metrics(running=1)
+    fleet.step()
+    fleet.step()
+    # b stopped answering: terminated, and the minimum fleet is restored with a new replica
+    assert fleet.manager.terminated == ["b"]
+    assert fleet.scaler.serving.keys() == {"a"} and fleet.scaler.starting.keys() == {"new-1"}
+    # new-1 never answers within the startup timeout, so it is replaced as well
+    fleet.step()
+    fleet.step()
+    assert fleet.manager.terminated == ["b", "new-1"]
+    assert fleet.scaler.starting.keys() == {"new-2"}
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+from aiohttp import web
+
+from runpod_model_serving.bench import run_benchmark, sample_requests, summarize_results, synthetic_prompt
+from runpod_model_serving.workload import make_workload
+
+ITL = 0.002
+
+
+class StubServer:
+    """OpenAI-compatible streaming server that emits one chunk per requested token, like vLLM with ignore_eos."""
+
+    def __init__(self):
+        self.bodies = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def handle(self, request):
+        body = await request.json()
+        self.bodies.append(body)
+        if body["model"] == "missing":
+            return web.Response(status=404, text="model not found")
+        chat = request.path.endswith("/chat/completions")
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        if chat:
+            await response.write(b'data: {"choices":[{"delta":{"role":"assistant","content":""}}]}\n\n')
+        for _ in range(body["max_tokens"]):
+            await asyncio.sleep(ITL)
+            chunk = {"choices": [{"delta": {"content": "x"}}]} if chat else {"choices": [{"text": "x"}]}
+            await response.write(b"data: " + json.dumps(chunk).encode() + b"\n\n")
+        usage = {"choices": [], "usage": {"prompt_tokens": 1, "completion_tokens": body["max_tokens"]}}
+        await response.write(b"data: " + json.dumps(usage).encode() + b"\n\ndata: [DONE]\n\n")
+        self.in_flight -= 1
+        return response
+
+
+def bench(requests, model="org/model", **kwargs):
+    """Runs run_benchmark against a fresh StubServer; returns (results, wall, server)."""
+    server = StubServer()
+
+    async def run():
+        app = web.Application()
+        app.router.add_post("/v1/completions", server.handle)
+        app.router.add_post("/v1/chat/completions", server.handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        try:
+            return await run_benchmark(f"http://127.0.0.1:{runner.addresses[0][1]}/", model, requests, **kwargs)
+        finally:
+            await runner.cleanup()
+
+    results, wall = asyncio.run(run())
+    return results, wall, server
+
+
+def test_closed_loop_completions():
+    results, wall, server = bench([(100, 5), (200, 10), (50, 3), (80, 8)], concurrency=2)
+    assert [r["output_tokens"] for r in results] == [5, 10, 3, 8]
+    assert all(r["ok"] and len(r["chunk_times"]) == r["requested_output_len"] for r in results)
+    assert all(r["ttft"] <= r["latency"] for r in results)
+    assert server.max_in_flight == 2
+    body = server.bodies[0]
+    assert (body["stream"], body["ignore_eos"], body["max_tokens"]) == (True, True, 5)
+    assert body["prompt"] == synthetic_prompt(100, 0)
+
+    summary = summarize_results(results, wall)
+    assert (summary["completed"], summary["error_rate"], summary["output_tokens"]) == (4, 0.0, 26)
+    assert summary["itl_p50"] >= ITL
+    assert summary["ttft_p50"] <= summary["ttft_p99"]
+
+
+def test_chat_skips_the_role_only_delta():
+    results, _, server = bench([(10, 4)], endpoint="chat")
+    assert results[0]["ok"] and len(results[0]["chunk_times"]) == 4
+    assert server.bodies[0]["messages"][0]["role"] == "user"
+
+
+def test_open_loop_replays_the_workload():
+    workload = make_workload([100, 400], [4, 8], counts=[3, 1])
+    requests = sample_requests(workload, 8, seed=1)
+    results, wall, _ = bench(requests, rate=50.0, shared_prefix_ratio=0.5)
+    assert [(r["prompt_len"], r["requested_output_len"]) for r in results] == requests
+    assert summarize_results(results, wall)["completed"] == 8
+
+
+def test_http_errors_are_counted():
+    results, wall, _ = bench([(10, 2), (10, 2)], model="missing")
+    summary = summarize_results(results, wall)
+    assert summary["completed"] == 0 and summary["error_rate"] == 1.0
+    assert summary["errors"] == {"HTTP 404: model not found": 2}
+    assert summary["ttft_p50"] is None
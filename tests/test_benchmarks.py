@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+import sys
+
+BENCHMARKS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "benchmarks")
+
+
+def run_planner_benchmark(*args):
+    return subprocess.run(
+        [sys.executable, os.path.join(BENCHMARKS_DIR, "planner.py"), "--sizes", "10", "--repeat", "1", *args],
+        capture_output=True, text=True, timeout=300
+    )
+
+
+def test_planner_benchmark_reports_and_compares(tmp_path):
+    output = tmp_path / "results.json"
+    result = run_planner_benchmark("-o", str(output))
+    assert result.returncode == 0, result.stderr
+    results = json.loads(output.read_text())["results"]
+    assert {r["scenario"] for r in results} == {
+        "calculate_performance", "sweep_performance", "find_best_gpu", "find_parallel_setups", "find_best_gpu_for_slo", "plan_models"
+    }
+    assert all(r["throughput"] > 0 and r["peak_kib"] > 0 for r in results)
+
+    # A baseline ten times faster than this run is a regression
+    baseline = tmp_path / "baseline.json"
+    for r in results:
+        r["throughput"] *= 10
+    baseline.write_text(json.dumps({"results": results}))
+    result = run_planner_benchmark("--scenarios", "find_best_gpu", "--baseline", str(baseline))
+    assert result.returncode == 1
+    assert "REGRESSION find_best_gpu @ 10 SKUs" in result.stdout
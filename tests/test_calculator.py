@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from runpod_model_serving.calculator import erlang_c, pareto_front, predict_latency, sweep_performance
+from runpod_model_serving.utils.gpu_data import GPU_CATALOG
+
+
+@pytest.mark.parametrize("request_rate", [0.1, 0.5, 2.0, 8.0])
+def test_itl_percentiles_are_ordered(request_rate):
+    params = {"total_params_b": 8.03, "active_params_b": 8.03, "layers": 32, "num_kv_heads": 8, "head_dim": 128}
+    sweep = sweep_performance(GPU_CATALOG, params, "int4", "fp8", 8192, 1, parallel_gpus=[1, 2])
+    latency = predict_latency(sweep, params, request_rate, [500, 1000, 4000], [100, 200, 800])
+    stable = latency["stable"]
+    assert stable.any()
+    assert np.all(latency["itl_p50"][stable] <= latency["itl_p99"][stable])
+    assert np.all(latency["itl_mean"][stable] <= latency["itl_p99"][stable])
+    assert np.all(latency["ttft_p50"][stable] <= latency["ttft_p99"][stable])
+
+
+def test_erlang_c_tail_matches_the_full_recursion():
+    def full_recursion(servers, offered_load):
+        erlang_b = np.ones(len(servers))
+        for k in range(1, int(servers.max()) + 1):
+            erlang_b = np.where(k <= servers, offered_load * erlang_b / (k + offered_load * erlang_b), erlang_b)
+        wait_prob = servers * erlang_b / (servers - offered_load * (1 - erlang_b))
+        return np.where(offered_load < servers, np.clip(wait_prob, 0, 1), 1.0)
+
+    rng = np.random.default_rng(0)
+    servers = np.concatenate([np.floor(rng.uniform(1, 2000, 200)), [1.0, 2.5, 40000.0]])
+    offered_load = servers * rng.choice([0.05, 0.5, 0.9, 1.1], len(servers))
+    offered_load[-1] = 3.0
+    expected = full_recursion(servers, offered_load)
+    assert erlang_c(servers, offered_load) == pytest.approx(expected, rel=1e-9, abs=1e-300)
+
+
+@pytest.mark.parametrize("block_size", [1, 5, 64])
+def test_pareto_front_matches_pairwise_dominance(block_size):
+    # Few distinct values, so ties and duplicate rows are common
+    objectives = np.random.default_rng(0).integers(0, 5, size=(400, 3)).astype(float)
+    dominated = [
+        any(np.all(other <= row) and (np.any(other < row) or j < i) for j, other in enumerate(objectives) if j != i)
+        for i, row in enumerate(objectives)
+    ]
+    front = pareto_front(objectives, block_size=block_size)
+    assert sorted(front) == [i for i, d in enumerate(dominated) if not d]
+    assert list(front) == sorted(front, key=lambda i: (*objectives[i], i))
@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving import calibration, hf_loader
+from runpod_model_serving.calculator import sweep_performance
+from runpod_model_serving.calibration import GPU_DEFAULTS, fit_calibration, load_calibration, save_calibration
+from runpod_model_serving.utils.gpu_data import GPU_CATALOG
+
+GPU = "NVIDIA A40"
+TRUE = {"bandwidth_efficiency": 0.7, "compute_efficiency": 0.4, "bandwidth_scaling_exp": 0.9, "compute_scaling_exp": 0.7,
+        "gen_speed_factor": 0.85, "prompt_speed_factor": 0.5}
+MODEL = {"total_params_b": 8.0, "active_params_b": 8.0, "quant_bytes": 0.5, "prompt_len": 1000.0}
+
+
+def measurement(count, bw_eff=TRUE["bandwidth_efficiency"], **extra):
+    """A record as bench.calibration_measurement builds it, timed as a GPU with the TRUE coefficients would run."""
+    card = GPU_CATALOG.find(GPU)
+    # Chosen so that the speed heuristics come out at their TRUE factors
+    decode_gb = bw_eff * MODEL["active_params_b"] * MODEL["quant_bytes"] / TRUE["gen_speed_factor"]
+    prefill_tflop = MODEL["prompt_len"] * MODEL["total_params_b"] * TRUE["compute_efficiency"] / (1000 * TRUE["prompt_speed_factor"])
+    return {
+        "gpu": GPU, "count": count, "architecture": "llama", **MODEL, "batch": 1,
+        "decode_bytes_gb": decode_gb,
+        "step_s": decode_gb / (card["memoryBandwidthGBs"] * bw_eff * count**TRUE["bandwidth_scaling_exp"]),
+        "prefill_tflop": prefill_tflop,
+        "prefill_s": prefill_tflop / (card["processPower"]["fp16"] * TRUE["compute_efficiency"] * count**TRUE["compute_scaling_exp"]),
+        "vram_gb": 48, "vram_util": 0.9, "model_vram_gb": 4.0, "kv_block_bytes": 2**20, "kv_blocks": None,
+        **extra,
+    }
+
+
+def with_overhead(count, per_gpu_gb):
+    # The KV block count vLLM would report with per_gpu_gb of activations on every GPU
+    kv_gb = 48 * count * 0.9 - 4.0 - per_gpu_gb * count
+    return measurement(count, kv_blocks=kv_gb * 1024)
+
+
+def test_fit_recovers_known_coefficients():
+    # The third single-GPU run is an outlier (e.g. a noisy neighbour); the median ignores it
+    runs = [measurement(1), measurement(1), measurement(1, bw_eff=0.2), measurement(2), measurement(4)]
+    runs += [with_overhead(1, 1.5), with_overhead(2, 0.5), with_overhead(1, 1.0)]
+    profile = fit_calibration(runs)
+
+    fitted = profile["gpus"][GPU]
+    for key, value in TRUE.items():
+        assert fitted[key] == pytest.approx(value), key
+    assert fitted["samples"] == len(runs)
+    assert profile["architectures"]["llama"] == pytest.approx(
+        {"activation_fraction": 1.0 / 4.0, "activation_min_gb": 0.5, "activation_max_gb": 1.5, "samples": 3}
+    )
+
+
+def test_fit_keeps_base_values_without_measurements(capsys):
+    base = {**calibration.empty_profile(), "gpus": {GPU: {"compute_scaling_exp": 0.65, "samples": 3}}}
+    # Single-GPU decode only: no prefill, no scaling runs, no block count
+    profile = fit_calibration([measurement(1, prefill_s=None), {**measurement(1), "gpu": "Imaginary GPU"}], base=base)
+    assert "unknown GPU 'Imaginary GPU'" in capsys.readouterr().out
+    fitted = profile["gpus"][GPU]
+    assert fitted["bandwidth_efficiency"] == pytest.approx(TRUE["bandwidth_efficiency"])
+    assert fitted["compute_scaling_exp"] == 0.65 and "compute_efficiency" not in fitted
+    assert fitted["samples"] == 4 and profile["architectures"] == {}
+    # The base profile itself is left untouched
+    assert base["gpus"][GPU] == {"compute_scaling_exp": 0.65, "samples": 3}
+
+
+def test_save_load_and_roll_back(tmp_path):
+    directory = str(tmp_path / "profiles")
+    assert load_calibration(directory) == calibration.empty_profile()
+
+    first = save_calibration(fit_calibration([measurement(1)]), directory)
+    second = save_calibration({**load_calibration(directory), "gpus": {}}, directory)
+    assert [os.path.basename(path) for path in (first, second)] == ["profile-0001.json", "profile-0002.json"]
+    assert load_calibration(directory)["revision"] == 2 and load_calibration(directory)["gpus"] == {}
+
+    # Deleting the newest revision rolls back to the one before
+    os.remove(second)
+    restored = load_calibration(directory, refresh=True)
+    assert restored["revision"] == 1
+    assert restored["gpus"][GPU]["bandwidth_efficiency"] == pytest.approx(TRUE["bandwidth_efficiency"])
+    # Profiles of another format version are not picked up
+    os.makedirs(os.path.join(directory, "v0"))
+    with open(os.path.join(directory, "v0", "profile-0009.json"), 'w') as f:
+        f.write("{}")
+    assert load_calibration(directory, refresh=True)["revision"] == 1
+
+
+def test_sweep_uses_the_saved_profile():
+    params = hf_loader.get_model_params(os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct"), offline=True)
+    gpus = [GPU_CATALOG.find(GPU), GPU_CATALOG.find("NVIDIA RTX 4090")]
+
+    def sweep():
+        return sweep_performance(gpus, params, "int4", "fp8", 8192, 16, parallel_gpus=[1, 2])
+
+    default = sweep()
+    save_calibration(fit_calibration([measurement(1), measurement(2), with_overhead(1, 2.0)]))
+    calibrated = sweep()
+
+    a40 = default["gpu_index"] == 0
+    single = a40 & (default["count"] == 1)
+    assert calibrated["gen_speed"][single] == pytest.approx(default["gen_speed"][single] * TRUE["gen_speed_factor"] / GPU_DEFAULTS["gen_speed_factor"])
+    # Two GPUs also follow the fitted bandwidth scaling
+    assert (calibrated["gen_speed"][a40] != default["gen_speed"][a40]).all()
+    # The architecture's fitted activation overhead applies to every GPU, the uncalibrated 4090 keeps its speeds
+    assert (calibrated["activation_overhead"] != default["activation_overhead"]).all()
+    assert (calibrated["gen_speed"][~a40] == default["gen_speed"][~a40]).all()
+    # An explicitly empty profile still gives the built-in heuristics
+    assert (sweep_performance(gpus, params, "int4", "fp8", 8192, 16, parallel_gpus=[1, 2], calibration=calibration.empty_profile())["gen_speed"]
+            == default["gen_speed"]).all()
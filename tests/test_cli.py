@@ -0,0 +1,56 @@
+import json
+import types
+
+import pytest
+
+from runpod_model_serving import cli, pod_state, runpod_manager, telemetry
+from runpod_model_serving.cli import main
+
+
+def test_deploy_attempts_must_be_positive(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        main(["--model", "org/model", "--deploy-attempts", "0"])
+    assert exit_info.value.code == 2
+    assert "--deploy-attempts must be at least 1" in capsys.readouterr().err
+
+
+def test_cleanup_exports_its_own_telemetry(tmp_path, monkeypatch):
+    jsonl, textfile = tmp_path / "metrics.jsonl", tmp_path / "metrics.prom"
+    terminated = []
+    monkeypatch.setattr(runpod_manager, "runpod", types.SimpleNamespace(terminate_pod=terminated.append))
+    monkeypatch.setattr(cli, "manager", runpod_manager.RunpodManager())
+    monkeypatch.setattr(cli, "active_pods", [{"id": "pod-1", "created": True}, {"id": "pod-2", "created": True}])
+    monkeypatch.setattr(cli, "terminate_on_exit", True)
+    monkeypatch.setattr(cli, "metrics_targets", (str(jsonl), str(textfile)))
+
+    # As at exit: main() has already exported, then the atexit handler terminates the pods
+    telemetry.export(str(jsonl), str(textfile))
+    cli.cleanup()
+    assert sorted(terminated) == ["pod-1", "pod-2"]
+
+    records = [json.loads(line) for line in jsonl.read_text().splitlines()]
+    assert any(r["type"] == "span" and r["name"] == "cleanup" and r["labels"] == {"status": "ok", "action": "terminate"} for r in records)
+    counters = [r for r in records if r["type"] == "counter" and r["name"] == "api_calls" and r["labels"] == {"api": "terminate_pod"}]
+    assert counters[-1]["value"] == 2
+    assert 'api="terminate_pod"' in textfile.read_text()
+
+
+@pytest.mark.parametrize("flag, terminated, stopped", [
+    ("terminate_on_exit", ["new"], ["resumed"]),
+    ("stop_on_exit", [], ["new", "resumed"]),
+])
+def test_cleanup_leaves_reused_pods_as_found(monkeypatch, flag, terminated, stopped):
+    calls = {"terminate": [], "stop": []}
+    api = types.SimpleNamespace(terminate_pod=calls["terminate"].append, stop_pod=calls["stop"].append)
+    monkeypatch.setattr(runpod_manager, "runpod", api)
+    monkeypatch.setattr(cli, "manager", runpod_manager.RunpodManager())
+    monkeypatch.setattr(cli, "active_pods", [
+        {"id": "new", "created": True}, {"id": "resumed", "resumed": True}, {"id": "idle", "reused": True},
+    ])
+    monkeypatch.setattr(cli, flag, True)
+    pod_state.record_pod("idle")
+
+    cli.cleanup()
+    # The idle pod was running before this run: never terminated or stopped, only released
+    assert calls == {"terminate": terminated, "stop": stopped}
+    assert pod_state.load_pods() == {}
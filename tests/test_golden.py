@@ -0,0 +1,140 @@
+"""
+Golden-output regression tests: model params, calculator rows and the find_* searches for every
+fixture model, compared with tests/golden/<model>.json. After an intended change of the results,
+regenerate the files with
+
+    RUNPOD_SERVE_UPDATE_GOLDEN=1 python -m pytest tests/test_golden.py
+
+and review the diff.
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving.calculator import calculate_performance
+from runpod_model_serving.hf_loader import get_model_params
+from runpod_model_serving.runpod_manager import RunpodManager
+from runpod_model_serving.utils.gpu_data import GPU_CATALOG
+from runpod_model_serving.workload import make_workload
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+UPDATE = os.getenv("RUNPOD_SERVE_UPDATE_GOLDEN") == "1"
+
+# (gpu, quant, kv_quant, max_length, users, gpu_count)
+PERFORMANCE_CASES = [
+    ("NVIDIA A40", "int4", "fp8", 8192, 8, 1),
+    ("NVIDIA RTX 4090", "fp16", "fp16", 4096, 1, 1),
+    ("NVIDIA H100 SXM", "fp8", "fp8", 32768, 32, 2),
+    ("NVIDIA A100 SXM", "fp16", "fp8", 16384, 16, 4),
+]
+# A length histogram with a long tail and a shared system prompt
+WORKLOAD = make_workload([500, 2000, 7000], [150, 400, 800], counts=[70, 25, 5], shared_prefix_ratio=0.3)
+
+
+def _builtin(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value)}")
+
+
+def _approx(value):
+    if isinstance(value, dict):
+        return {key: _approx(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_approx(item) for item in value]
+    if isinstance(value, float):
+        return pytest.approx(value, rel=1e-9, abs=1e-12)
+    return value
+
+
+def check_golden(model, section, actual):
+    path = os.path.join(GOLDEN_DIR, f"{model}.json")
+    actual = json.loads(json.dumps(actual, default=_builtin))
+    try:
+        with open(path, 'r') as f:
+            golden = json.load(f)
+    except FileNotFoundError:
+        golden = {}
+
+    if UPDATE:
+        golden[section] = actual
+        os.makedirs(GOLDEN_DIR, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(golden, f, indent=2, sort_keys=True)
+            f.write("\n")
+        return
+    assert section in golden, f"No golden '{section}' for {model}; run with RUNPOD_SERVE_UPDATE_GOLDEN=1"
+    assert actual == _approx(golden[section])
+
+
+def _setup(setup):
+    return None if setup is None else {**setup, "gpu": setup["gpu"]["name"]}
+
+
+def test_model_params(fixture_model, model_params):
+    assert model_params is not None
+    check_golden(fixture_model, "model_params", {key: value for key, value in model_params.items() if key != "name"})
+
+
+def test_nested_text_config_is_used():
+    # Qwen3-Omni keeps the language model under thinker_config.text_config
+    params = get_model_params(os.path.join(FIXTURES_DIR, "qwen3-omni-30b-a3b-instruct"), offline=True)
+    assert (params["layers"], params["num_kv_heads"], params["head_dim"]) == (48, 4, 128)
+    assert params["architecture"] == "qwen3_omni_moe_text"
+    assert params["active_params_b"] == pytest.approx(params["total_params_b"] * 8 / 128)
+
+
+@pytest.mark.parametrize("config, active_share", [
+    # Mixtral names its routed experts num_local_experts, DeepSeek n_routed_experts (plus always-on shared experts)
+    ({"num_local_experts": 8, "num_experts_per_tok": 2}, 2 / 8),
+    ({"n_routed_experts": 256, "n_shared_experts": 1, "num_experts_per_tok": 8}, 9 / 257),
+    ({"num_experts": 128, "num_experts_per_tok": 8}, 8 / 128),
+    ({}, 1.0),
+])
+def test_moe_active_params(tmp_path, config, active_share):
+    (tmp_path / "config.json").write_text(json.dumps({"num_hidden_layers": 4, "num_parameters": 10e9, **config}))
+    params = get_model_params(str(tmp_path), offline=True)
+    assert params["active_params_b"] == pytest.approx(10 * active_share)
+
+
+def test_calculate_performance(fixture_model, model_params):
+    rows = []
+    for gpu, quant, kv_quant, max_length, users, count in PERFORMANCE_CASES:
+        row = calculate_performance(GPU_CATALOG.find(gpu), model_params, quant, kv_quant, max_length, users, parallel_gpus=count)
+        rows.append({"case": [gpu, quant, kv_quant, max_length, users, count], **row})
+    check_golden(fixture_model, "calculate_performance", rows)
+
+
+def test_find_best_gpu(fixture_model, model_params):
+    manager = RunpodManager()
+    results = {
+        "users_1": _setup(manager.find_best_gpu(model_params, user_count=1)),
+        "users_16_fp8": _setup(manager.find_best_gpu(model_params, quant="fp8", user_count=16, max_length=16384)),
+        "workload": _setup(manager.find_best_gpu(model_params, user_count=32, mean_prompt_len=2000, mean_output_len=300)),
+        "workload_profile": _setup(manager.find_best_gpu(model_params, user_count=32, workload=WORKLOAD)),
+    }
+    check_golden(fixture_model, "find_best_gpu", results)
+
+
+def test_find_parallel_setups(fixture_model, model_params):
+    search = RunpodManager().find_parallel_setups(model_params, user_count=64, max_gpus=16)
+    result = None
+    if search:
+        result = {
+            "cheapest": _setup(search["cheapest"]),
+            "best_value": _setup(search["best_value"]),
+            "pareto": [[s["gpu"]["name"], s["tp"], s["pp"], s["replicas"], s["total_price"]] for s in search["pareto"]],
+        }
+    check_golden(fixture_model, "find_parallel_setups", result)
+
+
+def test_find_best_gpu_for_slo(fixture_model, model_params):
+    result = RunpodManager().find_best_gpu_for_slo(
+        model_params, request_rate=2.0, prompt_lens=[500, 1000, 4000], output_lens=[100, 200, 800], ttft_p99=2.0, itl_p99=0.1
+    )
+    check_golden(fixture_model, "find_best_gpu_for_slo", _setup(result))
@@ -0,0 +1,114 @@
+import json
+import os
+import time
+
+import pytest
+
+from runpod_model_serving import gpu_market
+from runpod_model_serving.utils.gpu_data import GPU_CATALOG
+
+MARKET_FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "gpu_market.json")
+
+
+@pytest.fixture
+def market():
+    with open(MARKET_FIXTURE, 'r') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def fetches(monkeypatch, market):
+    """Replaces the API call; records the keys it was called with."""
+    calls = []
+
+    def fetch(api_key=None):
+        calls.append(api_key)
+        return market["gpus"]
+
+    monkeypatch.setattr(gpu_market, "fetch_gpu_market", fetch)
+    return calls
+
+
+def write_cache(entry):
+    os.makedirs(os.path.dirname(gpu_market.MARKET_CACHE_PATH), exist_ok=True)
+    with open(gpu_market.MARKET_CACHE_PATH, 'w') as f:
+        json.dump(entry, f)
+
+
+def test_live_catalog_prices_and_stock(monkeypatch):
+    monkeypatch.setenv(gpu_market.MARKET_FIXTURE_ENV, MARKET_FIXTURE)
+    catalog = gpu_market.live_catalog()
+    # A40 has no stock and is left out; the cards the market lists are priced live
+    live = [card["name"] for card in catalog if card["price_source"] == "live"]
+    assert live == ["NVIDIA RTX 4090", "NVIDIA L40S", "NVIDIA H100 SXM"]
+    assert "NVIDIA A40" not in catalog.names
+    assert catalog.find("NVIDIA RTX 4090")["price_hr"] == 0.34
+    assert catalog.find("NVIDIA L40S")["stock"] == "Low"
+    # Cards missing from the snapshot keep their static price instead of disappearing
+    assert len(catalog) == len(GPU_CATALOG) - 1
+    assert catalog.find("NVIDIA A100 SXM")["price_hr"] == GPU_CATALOG.find("NVIDIA A100 SXM")["price_hr"]
+
+
+def test_empty_or_partial_cache_keeps_the_static_catalog(market):
+    write_cache({"fetched_at": time.time(), "gpus": {}})
+    assert gpu_market.live_catalog() is GPU_CATALOG
+
+    # A truncated snapshot with a single GPU type only reprices that one
+    write_cache({"fetched_at": time.time(), "gpus": {"NVIDIA GeForce RTX 4090": market["gpus"]["NVIDIA GeForce RTX 4090"]}})
+    catalog = gpu_market.live_catalog()
+    assert catalog.names == GPU_CATALOG.names
+    assert catalog.find("NVIDIA RTX 4090")["price_source"] == "live"
+    assert catalog.find("NVIDIA H100 SXM")["price_hr"] == GPU_CATALOG.find("NVIDIA H100 SXM")["price_hr"]
+
+
+def test_live_catalog_cloud_and_spot(monkeypatch):
+    monkeypatch.setenv(gpu_market.MARKET_FIXTURE_ENV, MARKET_FIXTURE)
+    community = gpu_market.live_catalog(cloud="community")
+    assert "NVIDIA L40S" not in community.names
+    assert community.find("NVIDIA H100 SXM")["price_hr"] == 2.39
+    assert gpu_market.live_catalog(cloud="secure").find("NVIDIA H100 SXM")["price_hr"] == 2.69
+    assert gpu_market.live_catalog(spot=True).find("NVIDIA RTX 4090")["price_hr"] == 0.25
+
+    everything = gpu_market.live_catalog(include_unavailable=True)
+    assert len(everything) == len(GPU_CATALOG)
+    assert everything.find("NVIDIA A40")["price_source"] == "static"
+
+
+def test_no_api_key_skips_the_fetch(fetches):
+    # No cache: the built-in prices, without touching the SDK
+    assert gpu_market.get_gpu_market() is None
+    assert gpu_market.live_catalog() is GPU_CATALOG
+    # A stale cache is still better than the static list
+    write_cache({"fetched_at": 0, "gpus": {}})
+    assert gpu_market.get_gpu_market()["fetched_at"] == 0
+    assert fetches == []
+
+
+def test_stale_cache_is_refreshed_with_a_key(monkeypatch, fetches, market):
+    write_cache({"fetched_at": 0, "gpus": {}})
+    entry = gpu_market.get_gpu_market(api_key="key")
+    assert fetches == ["key"]
+    assert entry["gpus"] == market["gpus"]
+    with open(gpu_market.MARKET_CACHE_PATH, 'r') as f:
+        assert json.load(f)["gpus"] == market["gpus"]
+
+    # Fresh now: served from the cache, also for the environment key
+    monkeypatch.setenv("RUNPOD_API_KEY", "env-key")
+    assert gpu_market.get_gpu_market()["gpus"] == market["gpus"]
+    assert fetches == ["key"]
+
+
+def test_offline_never_fetches(fetches):
+    write_cache({"fetched_at": 0, "gpus": {}})
+    assert gpu_market.get_gpu_market(offline=True, api_key="key")["fetched_at"] == 0
+    assert fetches == []
+
+
+def test_fetch_failure_falls_back_to_cache(monkeypatch, capsys):
+    def fail(api_key=None):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(gpu_market, "fetch_gpu_market", fail)
+    write_cache({"fetched_at": time.time() - 3600, "gpus": {"X": {}}})
+    assert gpu_market.get_gpu_market(api_key="key")["gpus"] == {"X": {}}
+    assert "using cached prices" in capsys.readouterr().out
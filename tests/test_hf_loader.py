@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import time
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving import hf_loader
+from runpod_model_serving.calculator import calculate_performance, compute_kv_block_bytes, compute_layered_kv_cache_vram_gb
+from runpod_model_serving.hf_loader import get_model_params
+from runpod_model_serving.utils.gpu_data import GPU_CATALOG
+
+
+def seed_cache(cache_dir, model_id, params):
+    path = hf_loader._cache_path(hf_loader._cache_key(model_id, None), str(cache_dir))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({"model_id": model_id, "revision": "main", "fetched_at": time.time(), "params": params}, f)
+
+
+def test_callers_get_their_own_copy():
+    model = os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct")
+    first = get_model_params(model, offline=True)
+    first["weights"]["total_params"] = 0
+    first["attention"].clear()
+    again = get_model_params(model, offline=True)
+    assert again["weights"]["total_params"] > 0 and again["attention"]
+
+    again["weights"]["dtypes"].clear()
+    assert get_model_params(model, offline=True)["weights"]["dtypes"]
+
+
+def test_memory_cache_is_per_cache_dir(tmp_path):
+    seed_cache(tmp_path / "a", "org/model", {"total_params_b": 1.0})
+    assert get_model_params("org/model", offline=True, cache_dir=str(tmp_path / "a")) == {"total_params_b": 1.0}
+    assert get_model_params("org/model", offline=True, cache_dir=str(tmp_path / "b")) is None
+
+
+def test_local_snapshot_edits_show_up_within_the_ttl(tmp_path):
+    model = str(tmp_path / "snapshot")
+    shutil.copytree(os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct"), model)
+    assert get_model_params(model)["num_kv_heads"] == 8
+
+    with open(os.path.join(model, "config.json")) as f:
+        config = json.load(f)
+    with open(os.path.join(model, "config.json"), 'w') as f:
+        json.dump({**config, "num_key_value_heads": 4}, f)
+    assert get_model_params(model)["num_kv_heads"] == 4
+    assert get_model_params(model, offline=True)["num_kv_heads"] == 4
+    # Nothing is written to the on-disk cache for a local directory
+    assert not os.path.exists(hf_loader._cache_path(hf_loader._cache_key(model, None), hf_loader.CACHE_DIR))
+
+
+CONFIGS_DIR = os.path.join(os.path.dirname(FIXTURES_DIR), "configs")
+
+# config fixture: (expected cache groups as (type, layers, token_elems, window, state_elems),
+#                  fp8 KV bytes of one 8192-token request, bytes of one 16-token block, blocks per request)
+LAYOUT_CASES = {
+    # MLA: the 512-wide latent plus the 64-wide rope key, regardless of the 128 KV heads
+    "deepseek-v3": ([("mla", 61, 576, None, 0)], 61 * 576 * 8192, 61 * 576 * 16, 512),
+    # Gemma 2 alternates local and global layers
+    "gemma-2-9b": ([("sliding", 21, 4096, 4096, 0), ("full", 21, 4096, None, 0)], 21 * 4096 * (4096 + 8192), 42 * 4096 * 16, 384),
+    # Gemma 3 (nested text_config): five local layers per global one
+    "gemma-3-27b": ([("sliding", 52, 4096, 1024, 0), ("full", 10, 4096, None, 0)], 4096 * (52 * 1024 + 10 * 8192), 62 * 4096 * 16, 137),
+    # Jamba: one attention layer per 8, the rest Mamba with an fp16 conv + SSM state
+    "jamba-v0.1": ([("mamba", 28, 0, None, 155648), ("full", 4, 2048, None, 0)], 4 * 2048 * 8192 + 28 * 155648 * 2, 4 * 2048 * 16, 579),
+    # Nemotron-H: MLP blocks ('-') hold no cache
+    "nemotron-h-8b": ([("mamba", 24, 0, None, 1079296), ("full", 4, 2048, None, 0)], 4 * 2048 * 8192 + 24 * 1079296 * 2, 4 * 2048 * 16, 908),
+    # Qwen3-Next: gated delta net layers with a fixed state, every fourth layer full attention
+    "qwen3-next-80b-a3b": ([("linear", 36, 0, None, 548864), ("full", 12, 1024, None, 0)], 12 * 1024 * 8192 + 36 * 548864 * 2, 12 * 1024 * 16, 713),
+}
+
+
+@pytest.mark.parametrize("name", sorted(LAYOUT_CASES))
+def test_attention_layout_of_hybrid_and_compressed_caches(tmp_path, name):
+    groups, kv_bytes, block_bytes, blocks = LAYOUT_CASES[name]
+    shutil.copy(os.path.join(CONFIGS_DIR, f"{name}.json"), tmp_path / "config.json")
+    attention = get_model_params(str(tmp_path), offline=True)["attention"]
+
+    assert [(g["type"], g["count"], g["token_elems"], g["window"], g["state_elems"]) for g in attention] == groups
+    assert compute_layered_kv_cache_vram_gb(attention, 8192, "fp8") * 1024**3 == pytest.approx(kv_bytes)
+    assert compute_kv_block_bytes(attention, "fp8") == block_bytes
+
+    # Blocks one request takes from the pool, fixed recurrent state included
+    params = {"total_params_b": 8.0, "active_params_b": 8.0, "attention": attention}
+    row = calculate_performance(GPU_CATALOG.find("NVIDIA H100 SXM"), params, "fp8", "fp8", 8192, 1)
+    assert row["kv_blocks_per_request"] == blocks
+
+
+def test_layer_kinds_follow_the_config_pattern():
+    with open(os.path.join(CONFIGS_DIR, "gemma-3-27b.json")) as f:
+        kinds = hf_loader._layer_kinds(json.load(f)["text_config"], 62)
+    assert [i for i, kind in enumerate(kinds) if kind == "attention"] == list(range(5, 62, 6))
+    with open(os.path.join(CONFIGS_DIR, "jamba-v0.1.json")) as f:
+        kinds = hf_loader._layer_kinds(json.load(f), 32)
+    assert [i for i, kind in enumerate(kinds) if kind == "attention"] == [4, 12, 20, 28]
+    # Without a window every layer is full attention, and use_sliding_window=False turns it off
+    assert hf_loader._layer_kinds({}, 4) == ["attention"] * 4
+    assert hf_loader._layer_kinds({"sliding_window": 4096, "use_sliding_window": False}, 2) == ["attention"] * 2
@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving.cli import main
+from runpod_model_serving.planner import PLAN_DEFAULTS, RECORD_FIELDS, load_plan_spec, plan_models, write_records
+
+LLAMA = os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct")
+GPTQ = os.path.join(FIXTURES_DIR, "qwen2.5-7b-instruct-gptq-int4")
+
+
+def entry(model, **overrides):
+    return {**PLAN_DEFAULTS, "model": model, "static_prices": True, "max_gpus": 2, **overrides}
+
+
+def test_load_plan_spec_formats_and_defaults(tmp_path):
+    yaml_spec = tmp_path / "plan.yaml"
+    yaml_spec.write_text("defaults:\n  users: 8\n  quant: fp8\nmodels:\n  - org/a\n  - model: org/b\n    quant: [int4, fp16]\n    users: 2\n")
+    a, b = load_plan_spec(str(yaml_spec))
+    # Spec defaults override PLAN_DEFAULTS, entry keys override both; a single quant becomes a list
+    assert (a["model"], a["quant"], a["users"], a["max_length"]) == ("org/a", ["fp8"], 8, PLAN_DEFAULTS["max_length"])
+    assert (b["quant"], b["users"]) == (["int4", "fp16"], 2)
+
+    json_spec = tmp_path / "plan.json"
+    json_spec.write_text(json.dumps(["org/a", {"model": "org/b", "max_gpus": 4}]))
+    assert [(e["model"], e["max_gpus"]) for e in load_plan_spec(str(json_spec))] == [("org/a", 8), ("org/b", 4)]
+
+    # JSONL: one entry per line, even when each line is itself a JSON object
+    jsonl_spec = tmp_path / "plan.jsonl"
+    jsonl_spec.write_text('{"model": "org/a"}\n\n{"model": "org/b", "kv_quant": "fp16"}\n')
+    assert [e["kv_quant"] for e in load_plan_spec(str(jsonl_spec))] == ["fp8", "fp16"]
+
+    json_spec.write_text(json.dumps([{"users": 4}]))
+    with pytest.raises(ValueError):
+        load_plan_spec(str(json_spec))
+
+
+def test_plan_models_reports_failures_per_model(capsys):
+    records, failures = plan_models([
+        entry(LLAMA, quant=["int4", "fp16"]),
+        entry("org/not-cached"),
+        entry(GPTQ, gpu_filter="^no such gpu$"),
+    ], offline=True, sweep_workers=2)
+
+    assert failures == {"org/not-cached": "could not resolve model params", f"{GPTQ} (int4)": "no feasible setup"}
+    assert {(r["model"], r["quant"]) for r in records} == {(LLAMA, "int4"), (LLAMA, "fp16")}
+    for quant in ("int4", "fp16"):
+        group = [r for r in records if r["quant"] == quant]
+        assert sum(r["cheapest"] for r in group) == 1 and sum(r["best_value"] for r in group) == 1
+    assert all(set(r) == set(RECORD_FIELDS) for r in records)
+
+
+def test_plan_models_replans_formats_vllm_cannot_launch(capsys):
+    records, failures = plan_models([
+        entry(LLAMA, quant=["int8", "int4"], kv_quant="int4"),
+        entry(GPTQ, quant=["int8"]),
+    ], offline=True, sweep_workers=2)
+    out = capsys.readouterr().out
+
+    assert not failures
+    # int8 of the unquantized checkpoint becomes int4, which the entry plans anyway: one sweep, fp8 KV
+    assert {(r["quant"], r["kv_quant"]) for r in records if r["model"] == LLAMA} == {("int4", "fp8")}
+    assert f"[WARN] {LLAMA} (int8): vLLM cannot quantize this unquantized checkpoint to int8 online" in out
+    assert f"[WARN] {LLAMA} (int4): vLLM has no int4 KV cache" in out
+    # A pre-quantized checkpoint keeps its method, so int8 stays as requested
+    assert {r["quant"] for r in records if r["model"] == GPTQ} == {"int8"}
+
+
+def test_write_records_formats(tmp_path):
+    records = [{field: 1 for field in RECORD_FIELDS}, {**{field: 2 for field in RECORD_FIELDS}, "gpu": "NVIDIA A40"}]
+
+    write_records(records, str(tmp_path / "plan.csv"))
+    with open(tmp_path / "plan.csv", newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0]) == RECORD_FIELDS and rows[1]["gpu"] == "NVIDIA A40"
+
+    write_records(records, str(tmp_path / "plan.jsonl"))
+    assert [json.loads(line) for line in (tmp_path / "plan.jsonl").read_text().splitlines()] == records
+    write_records(records, str(tmp_path / "plan.json"))
+    assert json.loads((tmp_path / "plan.json").read_text()) == records
+
+
+def test_plan_subcommand(tmp_path, capsys):
+    spec = tmp_path / "plan.json"
+    output = tmp_path / "plan.csv"
+    spec.write_text(json.dumps({"defaults": {"static_prices": True, "max_gpus": 2}, "models": [LLAMA]}))
+    with pytest.raises(SystemExit) as exit_info:
+        main(["plan", str(spec), "--offline", "--workers", "1", "-o", str(output)])
+    out = capsys.readouterr().out
+    assert exit_info.value.code == 0
+    assert f"{LLAMA} [int4]:" in out and "best value" in out
+    with open(output, newline='') as f:
+        assert len(list(csv.DictReader(f))) == int(out.split("Wrote ")[1].split()[0])
+
+    # Any failed model makes the run exit non-zero
+    spec.write_text(json.dumps({"defaults": {"static_prices": True}, "models": [LLAMA, "org/not-cached"]}))
+    with pytest.raises(SystemExit) as exit_info:
+        main(["plan", str(spec), "--offline", "--workers", "1"])
+    assert exit_info.value.code == 1
+    assert "org/not-cached: FAILED (could not resolve model params)" in capsys.readouterr().out
+
+    spec.write_text("[{\"users\": 2}]")
+    with pytest.raises(SystemExit) as exit_info:
+        main(["plan", str(spec)])
+    assert exit_info.value.code == 1
+    assert "Failed to load plan spec" in capsys.readouterr().out
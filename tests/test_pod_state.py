@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+
+from runpod_model_serving import pod_state
+
+RECORD = """
+import sys
+from runpod_model_serving import pod_state
+for i in range(40):
+    pod_state.record_pod(f"{sys.argv[1]}-{i}", path=sys.argv[2])
+"""
+
+
+def test_record_and_forget(tmp_path):
+    path = str(tmp_path / "pods.json")
+    pod_state.record_pod("a", path=path, gpu="NVIDIA A40")
+    pod_state.record_pod("b", path=path)
+    pod_state.forget_pods(["a", "missing"], path=path)
+    assert list(pod_state.load_pods(path)) == ["b"]
+    # This process is alive, so its pods are not orphans
+    assert pod_state.orphaned_pods(path) == {}
+
+
+def test_concurrent_processes_keep_every_record(tmp_path):
+    path = str(tmp_path / "pods.json")
+    workers = [subprocess.Popen([sys.executable, "-c", RECORD, f"p{n}", path]) for n in range(4)]
+    assert all(worker.wait(timeout=120) == 0 for worker in workers)
+    assert len(pod_state.load_pods(path)) == 4 * 40
+
+
+def test_entries_without_a_live_owner_are_orphaned(tmp_path, monkeypatch):
+    path = tmp_path / "pods.json"
+    dead = subprocess.Popen([sys.executable, "-c", "pass"])
+    dead.wait()
+    path.write_text(json.dumps({
+        "dead": {"owner_pid": dead.pid}, "missing": {}, "group": {"owner_pid": -1},
+        "zero": {"owner_pid": 0}, "garbage": {"owner_pid": "1234"}, "mine": {"owner_pid": os.getpid()},
+    }))
+    assert set(pod_state.orphaned_pods(str(path))) == {"dead", "missing", "group", "zero", "garbage"}
+
+    # Windows has no signal-0 probe; the process is opened instead
+    monkeypatch.setattr(pod_state.os, "name", "nt")
+    monkeypatch.setattr(pod_state, "_windows_process_alive", lambda pid: pid == os.getpid())
+    monkeypatch.setattr(pod_state.os, "kill", None)
+    assert set(pod_state.orphaned_pods(str(path))) == {"dead", "missing", "group", "zero", "garbage"}
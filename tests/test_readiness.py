@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+
+from runpod_model_serving import readiness
+
+
+@pytest.fixture(autouse=True)
+def fast_polls(monkeypatch):
+    monkeypatch.setattr(readiness, "MIN_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(readiness, "MAX_POLL_INTERVAL", 0.01)
+
+
+class StubPod:
+    """A pod's Runpod API states, one per poll, and its vLLM server that answers once the engine is up."""
+
+    def __init__(self, states):
+        self.states = list(states)
+        self.engine_up = False
+
+    def get_pod(self, pod_id):
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        if isinstance(state, Exception):
+            raise state
+        if state == "ready":
+            self.engine_up = True
+            return {"id": pod_id, "desiredStatus": "RUNNING", "machineId": "m", "runtime": {"uptimeInSeconds": 60}}
+        return {"id": pod_id, **state}
+
+    async def health(self, request):
+        return web.Response(status=200 if self.engine_up else 502)
+
+    async def models(self, request):
+        if not self.engine_up:
+            return web.Response(status=502)
+        return web.json_response({"data": [{"id": "org/model"}]})
+
+
+def watch(stub, timeout=5):
+    """Runs watch_pods for one pod against the stub's API states and a local vLLM stub server."""
+    phases = []
+
+    async def run():
+        app = web.Application()
+        app.router.add_get("/health", stub.health)
+        app.router.add_get("/v1/models", stub.models)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        try:
+            return await readiness.watch_pods(
+                ["pod-1"], urls={"pod-1": f"http://127.0.0.1:{port}/"}, timeout=timeout, get_pod=stub.get_pod,
+                on_phase=lambda pod_id, phase, elapsed: phases.append(phase)
+            )
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(run())["pod-1"], phases
+
+
+def test_phases_until_engine_ready():
+    stub = StubPod([
+        {"desiredStatus": "RUNNING"},
+        {"desiredStatus": "RUNNING", "machineId": "m"},
+        {"desiredStatus": "RUNNING", "machineId": "m"},
+        {"desiredStatus": "RUNNING", "machineId": "m", "runtime": {"uptimeInSeconds": 1}},
+        "ready",
+    ])
+    result, phases = watch(stub)
+    assert phases == readiness.PHASES
+    assert [phase for phase, _ in result["phases"]] == readiness.PHASES
+    assert result["ready"] and result["error"] is None
+
+
+def test_exited_pod_fails():
+    result, phases = watch(StubPod([{"desiredStatus": "RUNNING"}, {"desiredStatus": "EXITED"}]))
+    assert phases == [readiness.SCHEDULED, readiness.FAILED]
+    assert not result["ready"] and result["error"] == "pod exited or was terminated"
+
+
+def test_api_errors_keep_the_phase_until_the_limit():
+    stub = StubPod([{"desiredStatus": "RUNNING", "machineId": "m"}] + [RuntimeError("502")] * readiness.MAX_API_ERRORS)
+    result, phases = watch(stub)
+    assert phases == [readiness.IMAGE_PULLING, readiness.FAILED]
+    assert result["error"] == "Runpod API error: 502"
+
+
+def test_timeout():
+    result, phases = watch(StubPod([{"desiredStatus": "RUNNING"}]), timeout=0.1)
+    assert phases == [readiness.SCHEDULED, readiness.TIMED_OUT]
+    assert result["phase"] == readiness.TIMED_OUT and not result["ready"]
@@ -0,0 +1,254 @@
+import os
+import threading
+import types
+
+import numpy as np
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving import hf_loader, pod_state, runpod_manager, telemetry
+from runpod_model_serving.calculator import checkpoint_size_gb, estimate_cold_start, sweep_performance
+from runpod_model_serving.runpod_manager import FINGERPRINT_ENV, VOLUME_HF_HOME, VOLUME_MOUNT_PATH, RunpodManager, spec_fingerprint
+from runpod_model_serving.utils.gpu_data import GPU_CARDS, GPU_CATALOG, GpuCatalog
+
+MODEL = "Qwen/Qwen2.5-7B-Instruct"
+GPU = "NVIDIA RTX 4090"
+FINGERPRINT = spec_fingerprint(MODEL, GPU, 1)
+
+
+class FakeRunpod:
+    """In-memory stand-in for the Runpod SDK calls the manager makes."""
+
+    def __init__(self, pods=(), fail_names=()):
+        self.pods = {pod['id']: pod for pod in pods}
+        self.fail_names = set(fail_names)
+        self.calls = []
+        self.created = {}  # name -> create_pod kwargs
+        self.lock = threading.Lock()
+
+    def get_pods(self):
+        return list(self.pods.values())
+
+    def create_pod(self, name, **kwargs):
+        with self.lock:
+            self.calls.append(("create", name))
+            self.created[name] = kwargs
+            if name in self.fail_names:
+                raise RuntimeError("no capacity")
+            pod = {"id": f"new-{len(self.pods)}", "name": name, "desiredStatus": "RUNNING", "env": kwargs.get("env")}
+            self.pods[pod['id']] = pod
+            return pod
+
+    def resume_pod(self, pod_id, gpu_count):
+        self.calls.append(("resume", pod_id))
+        self.pods[pod_id]['desiredStatus'] = "RUNNING"
+
+    def stop_pod(self, pod_id):
+        self.calls.append(("stop", pod_id))
+        self.pods[pod_id]['desiredStatus'] = "EXITED"
+
+    def terminate_pod(self, pod_id):
+        with self.lock:
+            self.calls.append(("terminate", pod_id))
+            del self.pods[pod_id]
+
+
+def existing_pod(pod_id, status, fingerprint=FINGERPRINT):
+    return {"id": pod_id, "name": pod_id, "desiredStatus": status, "env": [f"{FINGERPRINT_ENV}={fingerprint}"]}
+
+
+@pytest.fixture
+def manager(monkeypatch):
+    """A manager on a FakeRunpod; pods in manager.busy report in-flight requests on /metrics."""
+    manager = RunpodManager()
+    manager.busy = set()
+    monkeypatch.setattr(manager, "pod_is_idle", lambda pod_id: pod_id not in manager.busy)
+    return manager
+
+
+def use_api(monkeypatch, api):
+    monkeypatch.setattr(runpod_manager, "runpod", api)
+    return api
+
+
+def test_reuse_takes_idle_and_stopped_pods_but_never_busy_ones(monkeypatch, manager):
+    api = use_api(monkeypatch, FakeRunpod([
+        existing_pod("stopped", "EXITED"),
+        existing_pod("busy", "RUNNING"),
+        existing_pod("idle", "RUNNING"),
+        existing_pod("other-spec", "RUNNING", fingerprint="0" * 16),
+    ]))
+    manager.busy = {"busy"}
+
+    assert [pod['id'] for pod in manager.find_reusable_pods(FINGERPRINT)] == ["idle", "stopped"]
+
+    pods = manager.deploy_fleet(3, GPU, MODEL, reuse=True)
+    assert [pod['id'] for pod in pods] == ["idle", "stopped", "new-4"]
+    # Marked so that cleanup only terminates what this run created
+    assert [(pod.get('reused'), pod.get('resumed'), pod.get('created')) for pod in pods] == [(True, None, None), (None, True, None), (None, None, True)]
+    assert api.calls == [("resume", "stopped"), ("create", "llm-serving-pod-3")]
+    assert set(pod_state.load_pods()) == {"idle", "stopped", "new-4"}
+    # The created replica carries the fingerprint, so a later run can reuse it
+    assert api.pods["new-4"]["env"][FINGERPRINT_ENV] == FINGERPRINT
+
+
+def test_pods_owned_by_a_running_cli_are_not_reused(monkeypatch, manager):
+    use_api(monkeypatch, FakeRunpod([existing_pod("idle", "RUNNING"), existing_pod("stopped", "EXITED")]))
+    pod_state.record_pod("idle")
+    assert [pod['id'] for pod in manager.find_reusable_pods(FINGERPRINT)] == ["stopped"]
+
+
+def test_failed_reuse_rolls_back(monkeypatch, manager):
+    api = use_api(monkeypatch, FakeRunpod([existing_pod("idle", "RUNNING"), existing_pod("stopped", "EXITED")], fail_names=["llm-serving-pod-3"]))
+
+    assert manager.deploy_fleet(3, GPU, MODEL, reuse=True) is None
+    # The resumed pod is stopped again, the idle one left running as found; neither stays owned
+    assert ("stop", "stopped") in api.calls and ("stop", "idle") not in api.calls
+    assert api.pods["stopped"]["desiredStatus"] == "EXITED" and api.pods["idle"]["desiredStatus"] == "RUNNING"
+    assert pod_state.load_pods() == {}
+
+
+def test_fleet_creates_replicas_in_parallel(monkeypatch, manager):
+    api = use_api(monkeypatch, FakeRunpod())
+    pods = manager.deploy_fleet(3, GPU, MODEL, pod_name="Serve")
+    assert sorted(pod['name'] for pod in pods) == ["serve-1", "serve-2", "serve-3"]
+    assert set(pod_state.load_pods()) == set(api.pods)
+
+
+def test_partial_fleet_failure_rolls_back(monkeypatch, manager):
+    api = use_api(monkeypatch, FakeRunpod(fail_names=["serve-2"]))
+    assert manager.deploy_fleet(3, GPU, MODEL, pod_name="serve") is None
+    # Both created replicas are terminated again and nothing is left in the state file
+    assert sorted(call[0] for call in api.calls) == ["create", "create", "create", "terminate", "terminate"]
+    assert api.pods == {}
+    assert pod_state.load_pods() == {}
+
+
+def test_caught_deploy_failures_are_error_spans(monkeypatch, manager):
+    use_api(monkeypatch, FakeRunpod(fail_names=["serve-2"]))
+    assert manager.deploy_pod(GPU, MODEL, pod_name="serve-1") is not None
+    assert manager.deploy_pod(GPU, MODEL, pod_name="serve-2") is None
+    assert manager.deploy_fleet(2, GPU, MODEL, pod_name="serve") is None
+
+    spans = {(s["name"], s["labels"]["status"]): s["count"] for s in telemetry.snapshot()["spans"]}
+    # The fleet's own create calls go through deploy_pod as well
+    assert spans == {("deploy_pod", "ok"): 2, ("deploy_pod", "error"): 2, ("deploy_fleet", "error"): 1}
+
+
+def test_pod_is_idle_reads_vllm_metrics(monkeypatch):
+    class RequestException(Exception):
+        pass
+
+    pages = {
+        "idle": 'vllm:num_requests_running{model_name="m"} 0.0\nvllm:num_requests_waiting{model_name="m"} 0.0\n',
+        "queued": 'vllm:num_requests_running{model_name="m"} 0.0\nvllm:num_requests_waiting{model_name="m"} 2.0\n',
+        "no-vllm": "process_cpu_seconds_total 1.0\n",
+    }
+
+    def get(url, timeout):
+        pod_id = url.split("//", 1)[1].split("-8000", 1)[0]
+        if pod_id not in pages:
+            raise RequestException("connection refused")
+        return types.SimpleNamespace(text=pages[pod_id], raise_for_status=lambda: None)
+
+    monkeypatch.setattr(runpod_manager, "requests", types.SimpleNamespace(get=get, RequestException=RequestException))
+    manager = RunpodManager()
+    assert manager.pod_is_idle("idle")
+    assert not manager.pod_is_idle("queued")
+    assert not manager.pod_is_idle("no-vllm")
+    assert not manager.pod_is_idle("unreachable")
+
+
+def exhaustive_best(params, catalog, user_count, gpu_filter=None, runtime_hours=None, network_volume=False):
+    """find_best_gpu by brute force: every card at every count, cheapest first, then fewer GPUs, then earlier card."""
+    catalog = catalog.filter(gpu_filter)
+    sweep = sweep_performance(catalog, params, "int4", "fp8", 8192, user_count, parallel_gpus=range(1, 9))
+    feasible = np.flatnonzero(sweep['success'] & (sweep['full_length_gen_count'] >= user_count))
+    if len(feasible) == 0:
+        return None
+    price = sweep['total_price']
+    if runtime_hours:
+        cold_start = estimate_cold_start(checkpoint_size_gb(params), sweep['count'], network_volume)['total_s']
+        price = price * (1 + cold_start / 3600 / runtime_hours)
+    best = min(feasible, key=lambda i: (round(float(price[i]), 3), sweep['count'][i], sweep['gpu_index'][i]))
+    return catalog[sweep['gpu_index'][best]]['name'], int(sweep['count'][best]), round(float(sweep['total_price'][best]), 3)
+
+
+# Prices on a coarse grid, so many cards and GPU counts tie; every card also has a later twin at the same price
+TIED_CARDS = [{**card, "price_hr": max(0.5, round(card['price_hr'] * 2) / 2)} for card in GPU_CARDS]
+TIED_CATALOG = GpuCatalog(TIED_CARDS + [{**card, "name": f"{card['name']} (twin)"} for card in TIED_CARDS])
+
+
+@pytest.mark.parametrize("model", ["llama-3.1-8b-instruct", "mixtral-8x7b-instruct"])
+@pytest.mark.parametrize("catalog", [GPU_CATALOG, TIED_CATALOG], ids=["catalog", "tied"])
+@pytest.mark.parametrize("user_count, gpu_filter", [(1, None), (16, None), (64, None), (200, None), (16, "A40$|4090"), (64, "H100"), (10**6, None)])
+def test_branch_and_bound_matches_exhaustive_sweep(model, catalog, user_count, gpu_filter):
+    params = hf_loader.get_model_params(os.path.join(FIXTURES_DIR, model), offline=True)
+    setup = RunpodManager().find_best_gpu(params, user_count=user_count, gpu_filter=gpu_filter, catalog=catalog)
+    found = setup and (setup['gpu']['name'], setup['count'], round(setup['total_price'], 3))
+    assert found == exhaustive_best(params, catalog, user_count, gpu_filter)
+    if user_count == 10**6:
+        assert setup is None
+    elif catalog is TIED_CATALOG:
+        # Twins come last in the catalog, so a tie never picks one
+        assert "(twin)" not in setup['gpu']['name']
+
+
+def test_catalog_range_lookups():
+    catalog = GpuCatalog([
+        {"name": "b", "vramGb": 48, "memoryBandwidthGBs": 900, "processPower": {"fp16": 1}, "price_hr": 0.5},
+        {"name": "a", "vramGb": 24, "memoryBandwidthGBs": 1000, "processPower": {"fp16": 1}, "price_hr": 0.5},
+        {"name": "c", "vramGb": 24, "memoryBandwidthGBs": 2000, "processPower": {"fp16": 1}, "price_hr": 0.2},
+    ])
+    # Strictly cheaper, cheapest first and price ties in catalog order
+    assert catalog.cheaper_than(0.5).tolist() == [2]
+    assert catalog.cheaper_than(0.51).tolist() == [2, 0, 1]
+    # At least this much VRAM, smallest first
+    assert catalog.with_min_vram(24).tolist() == [1, 2, 0]
+    assert catalog.with_min_vram(24.1).tolist() == [0]
+    assert catalog.with_min_vram(80).tolist() == []
+
+
+@pytest.mark.parametrize("runtime_hours", [0.25, 2.0])
+@pytest.mark.parametrize("network_volume", [False, True])
+@pytest.mark.parametrize("user_count", [1, 64, 200])
+def test_branch_and_bound_ranks_by_amortized_cold_start(runtime_hours, network_volume, user_count):
+    params = hf_loader.get_model_params(os.path.join(FIXTURES_DIR, "mixtral-8x7b-instruct"), offline=True)
+    setup = RunpodManager().find_best_gpu(params, user_count=user_count, catalog=TIED_CATALOG,
+                                          runtime_hours=runtime_hours, network_volume=network_volume)
+    found = (setup['gpu']['name'], setup['count'], round(setup['total_price'], 3))
+    assert found == exhaustive_best(params, TIED_CATALOG, user_count, runtime_hours=runtime_hours, network_volume=network_volume)
+
+    cold_start = estimate_cold_start(checkpoint_size_gb(params), setup['count'], network_volume)['total_s']
+    assert setup['cold_start_s'] == pytest.approx(cold_start)
+    assert setup['effective_price'] == pytest.approx(setup['total_price'] * (1 + cold_start / 3600 / runtime_hours))
+
+
+def test_estimate_cold_start():
+    local = estimate_cold_start(20.0, gpu_count=2)
+    # 20 GB from HuggingFace at 0.25 GB/s, then read from the container disk by both GPU workers
+    assert local["weight_download_s"] == pytest.approx(80.0) and local["weight_load_s"] == pytest.approx(5.0)
+    assert local["total_s"] == pytest.approx(local["image_pull_s"] + 80.0 + 5.0 + local["engine_init_s"])
+
+    volume = estimate_cold_start(20.0, gpu_count=2, network_volume=True)
+    # Nothing to download, but the volume is slower to read than the local disk
+    assert volume["weight_download_s"] == 0 and volume["weight_load_s"] == pytest.approx(40.0)
+    assert volume["total_s"] < local["total_s"]
+    # Elementwise over arrays, as the fleet search uses it
+    assert estimate_cold_start(np.array([10.0, 20.0]), np.array([1, 2]))["weight_load_s"].tolist() == [5.0, 5.0]
+
+
+def test_deploy_pod_on_a_network_volume(monkeypatch):
+    api = use_api(monkeypatch, FakeRunpod())
+    manager = RunpodManager()
+    manager.deploy_pod(GPU, MODEL, pod_name="Local", model_size_gb=16)
+    manager.deploy_pod(GPU, MODEL, pod_name="Volume", model_size_gb=16, network_volume_id="vol-1", env={"A": "1"})
+
+    local, volume = api.created["local"], api.created["volume"]
+    # Without a volume the container disk holds the weights (+25%) next to the 30 GB for the image
+    assert local["container_disk_in_gb"] == 50 and local["network_volume_id"] is None
+    assert not (local["env"] or {}).get("HF_HOME")
+    # On a volume the HF cache lives there, so the container disk only needs room for the image
+    assert volume["container_disk_in_gb"] == 30
+    assert volume["env"] == {"A": "1", "HF_HOME": VOLUME_HF_HOME} and VOLUME_HF_HOME == "/runpod-volume/huggingface"
+    assert (volume["network_volume_id"], volume["volume_mount_path"]) == ("vol-1", VOLUME_MOUNT_PATH)
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving.safetensors_reader import get_safetensors_totals, summarize_headers, weight_bits
+
+GPTQ_MODEL = os.path.join(FIXTURES_DIR, "qwen2.5-7b-instruct-gptq-int4")
+# Linear layers of Qwen2.5-7B, and everything else (embeddings, lm_head, norms, biases)
+LINEAR_PARAMS = 6_525_288_448
+DENSE_PARAMS = 1_090_328_064
+
+
+def tensor(dtype, numel, itemsize):
+    return {"dtype": dtype, "shape": [numel], "data_offsets": [0, numel * itemsize]}
+
+
+@pytest.mark.parametrize("quantization_config, bits", [
+    ({"quant_method": "gptq", "bits": 4}, 4),
+    ({"quant_method": "awq", "w_bit": 4}, 4),
+    ({"quant_method": "compressed-tensors", "config_groups": {"group_0": {"weights": {"num_bits": 8}}}}, 8),
+    ({"quant_method": "fp8"}, None),
+    (None, None),
+])
+def test_weight_bits(quantization_config, bits):
+    assert weight_bits(quantization_config) == bits
+
+
+def test_packed_weights_are_unpacked():
+    header = {
+        "layers.0.mlp.qweight": tensor("I32", 1024, 4),
+        "layers.0.mlp.g_idx": tensor("I32", 256, 4),
+        "layers.0.mlp.scales": tensor("F16", 64, 2),
+        "layers.1.mlp.weight_packed": tensor("I32", 512, 4),
+    }
+    packed = summarize_headers([header])
+    assert packed["dtypes"]["I32"] == {"params": 1024 + 256 + 512, "bytes": (1024 + 256 + 512) * 4}
+
+    unpacked = summarize_headers([header], {"quant_method": "gptq", "bits": 4})
+    # Only the packed weight tensors hold eight values per element; g_idx is a plain index
+    assert unpacked["dtypes"]["I32"] == {"params": 8 * 1024 + 256 + 8 * 512, "bytes": (1024 + 256 + 512) * 4}
+    assert unpacked["total_bytes"] == packed["total_bytes"]
+
+
+def test_sharded_gptq_snapshot():
+    totals = get_safetensors_totals(GPTQ_MODEL, quantization_config={"quant_method": "gptq", "bits": 4})
+    # Unpacked qweights plus the fp16 tensors, plus the (raw) GPTQ scales, zeros and g_idx
+    metadata = LINEAR_PARAMS // 128 + LINEAR_PARAMS // 128 // 8 + 28 * (6 * 3584 + 18944)
+    assert totals["total_params"] == LINEAR_PARAMS + DENSE_PARAMS + metadata
+    # About half a byte per linear weight, as stored
+    assert totals["total_bytes"] == pytest.approx(LINEAR_PARAMS * 0.5 + DENSE_PARAMS * 2, rel=0.03)
+    assert get_safetensors_totals(GPTQ_MODEL)["total_params"] < totals["total_params"] / 3
@@ -0,0 +1,46 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import FIXTURES_DIR
+
+# Only the deploy, bench and autoscale paths may execute these (see utils/lazy.py)
+DEPLOY_ONLY_MODULES = ("runpod", "huggingface_hub", "aiohttp", "requests", "asyncio")
+
+_REPORT = """
+import json, signal, sys, types
+print(json.dumps({
+    "loaded": [m for m in %r if type(sys.modules.get(m)) is types.ModuleType],
+    "sigterm_handler": signal.getsignal(signal.SIGTERM) is not signal.SIG_DFL,
+}))
+""" % (DEPLOY_ONLY_MODULES,)
+
+
+def run_isolated(code, tmp_path):
+    env = {**os.environ, "RUNPOD_SERVE_CACHE": str(tmp_path / "cache"), "RUNPOD_SERVE_CALIBRATION": str(tmp_path / "calibration")}
+    # No key and no market fixture, as for scripts that only plan
+    env.pop("RUNPOD_API_KEY", None)
+    env.pop("RUNPOD_SERVE_GPU_MARKET", None)
+    result = subprocess.run([sys.executable, "-c", code + _REPORT], capture_output=True, text=True, env=env, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_importing_the_cli_loads_no_sdk_and_installs_no_handlers(tmp_path):
+    report = run_isolated("import runpod_model_serving.cli", tmp_path)
+    assert report == {"loaded": [], "sigterm_handler": False}
+
+
+@pytest.mark.parametrize("flags", [[], ["--offline"], ["--static-prices", "--offline"]])
+def test_dry_run_from_local_snapshot_loads_no_sdk(tmp_path, flags):
+    model = os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct")
+    code = f"from runpod_model_serving.cli import main\nmain({['--model', model, '--dry-run', *flags]!r})\n"
+    assert run_isolated(code, tmp_path)["loaded"] == []
+
+
+def test_sdk_loads_on_first_use(tmp_path):
+    code = "from runpod_model_serving import runpod_manager\nrunpod_manager.runpod.api_key\n"
+    assert "runpod" in run_isolated(code, tmp_path)["loaded"]
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving.cli import main
+from runpod_model_serving.vllm_profile import build_vllm_profile, deployable_quants, format_vllm_args, merge_vllm_args
+
+DETAILS = {"full_length_gen_count": 12.5, "kv_cache_vram": 4.0}
+
+
+def profile_for(quant, quant_method=None):
+    return dict(build_vllm_profile(DETAILS, {"quant_method": quant_method}, "org/model", quant, "fp8", 8192, 0.9))
+
+
+def test_online_quantization():
+    assert profile_for("fp8")["--quantization"] == "fp8"
+    assert profile_for("int4")["--quantization"] == "bitsandbytes"
+    assert "--quantization" not in profile_for("fp16")
+    # Pre-quantized checkpoints keep their method, also for int8
+    assert profile_for("int8", quant_method="gptq")["--quantization"] == "gptq"
+    # bitsandbytes would load int8 as 4-bit
+    with pytest.raises(ValueError):
+        profile_for("int8")
+
+
+def test_int8_of_unquantized_checkpoint_is_planned_as_int4(capsys):
+    main(["--model", os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct"), "--quant", "int8", "--static-prices", "--print-vllm-args"])
+    out = capsys.readouterr().out
+    assert "planning with int4 instead" in out
+    assert "--quantization bitsandbytes" in out.strip().splitlines()[-1]
+
+
+def test_int4_kv_cache_is_planned_as_fp8(capsys):
+    # Launched as fp8, a KV pool sized at 0.5 bytes per value would hold half the planned sequences
+    with pytest.raises(ValueError):
+        build_vllm_profile(DETAILS, {}, "org/model", "int4", "int4", 8192, 0.9)
+    assert deployable_quants("int4", "int4", {}) == ("int4", "fp8", ["vLLM has no int4 KV cache; planning with an fp8 KV cache instead."])
+    assert deployable_quants("int8", "int8", {"quant_method": "gptq"}) == ("int8", "int8", [])
+
+    model = os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct")
+    main(["--model", model, "--kv-quant", "int4", "--static-prices", "--print-vllm-args"])
+    replanned = capsys.readouterr().out
+    main(["--model", model, "--kv-quant", "fp8", "--static-prices", "--print-vllm-args"])
+    fp8 = capsys.readouterr().out
+    assert "planning with an fp8 KV cache instead" in replanned
+    # Same plan, so --max-num-seqs matches the fp8 KV pool
+    assert replanned.strip().splitlines()[-1] == fp8.strip().splitlines()[-1]
+
+
+def test_negated_flag_replaces_planned_boolean():
+    profile = [("--max-num-seqs", 12), ("--enable-prefix-caching", None)]
+    merged, warnings = merge_vllm_args(profile, "--no-enable-prefix-caching")
+    assert format_vllm_args(merged) == "--max-num-seqs 12 --no-enable-prefix-caching"
+    assert warnings == ["--no-enable-prefix-caching disables the planned --enable-prefix-caching"]
+
+
+def test_user_values_override_planned_ones():
+    merged, warnings = merge_vllm_args([("--max-num-seqs", 12)], "--max-num-seqs=4 --enforce-eager")
+    assert merged == [("--max-num-seqs", "4"), ("--enforce-eager", None)]
+    assert len(warnings) == 1
+    with pytest.raises(ValueError):
+        merge_vllm_args([], "-q awq --quantization gptq")
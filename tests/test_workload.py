@@ -0,0 +1,104 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from conftest import FIXTURES_DIR
+from runpod_model_serving import hf_loader
+from runpod_model_serving.calculator import Z_P99, compute_workload_kv, workload_concurrency
+from runpod_model_serving.cli import main
+from runpod_model_serving.runpod_manager import RunpodManager
+from runpod_model_serving.workload import load_workload, make_workload, workload_summary
+
+# One full-attention group: 1 KiB per token at fp8, so 16-token multiples map to exact block counts
+ATTENTION = [{"type": "full", "count": 1, "token_elems": 1024, "window": None, "state_elems": 0}]
+GB_PER_TOKEN = 1024 / 1024**3
+
+
+def test_load_workload_trace_and_histogram(tmp_path):
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text('{"input_tokens": 100, "completion_tokens": 20}\n\n{"prompt_len": 300, "output_len": 40}\n')
+    workload = load_workload(str(trace), shared_prefix_ratio=0.25)
+    assert workload["prompt_lens"].tolist() == [100, 300] and workload["output_lens"].tolist() == [20, 40]
+    assert workload["counts"].tolist() == [1, 1] and workload["shared_prefix_ratio"] == 0.25
+
+    histogram = tmp_path / "histogram.json"
+    histogram.write_text(json.dumps([
+        {"prompt_tokens": 100, "output_tokens": 10, "count": 99},
+        {"prompt_tokens": 8000, "output_tokens": 500, "count": 1},
+    ]))
+    summary = workload_summary(load_workload(str(histogram)))
+    # Bins are weighted by their count: the long request is the 1%
+    assert summary["prompt_mean"] == pytest.approx(0.99 * 100 + 0.01 * 8000)
+    assert (summary["prompt_p50"], summary["prompt_p99"], summary["output_p99"]) == (100, 100, 10)
+
+    trace.write_text('{"prompt_tokens": 100}\n')
+    with pytest.raises(ValueError):
+        load_workload(str(trace))
+    with pytest.raises(ValueError):
+        make_workload([100], [10], shared_prefix_ratio=1.0)
+
+
+def test_shared_prefix_is_stored_once():
+    prompts, outputs = [1024, 3072], [256, 256]
+    plain = compute_workload_kv(ATTENTION, make_workload(prompts, outputs), "fp8")
+    shared = compute_workload_kv(ATTENTION, make_workload(prompts, outputs, shared_prefix_ratio=0.5), "fp8")
+    # Per request: prompt + output / 2 tokens, of which half the prompt is the common prefix
+    assert plain["mean_gb"] == pytest.approx((2048 + 128) * GB_PER_TOKEN)
+    assert shared["mean_gb"] == pytest.approx((1024 + 128) * GB_PER_TOKEN)
+    assert shared["shared_gb"] == pytest.approx(1024 * GB_PER_TOKEN) and plain["shared_gb"] == 0
+    assert shared["peak_p99_gb"] == pytest.approx((1536 + 256) * GB_PER_TOKEN)
+
+
+@pytest.mark.parametrize("users", [1, 7, 64])
+def test_workload_concurrency_inverts_the_kv_statistics(users):
+    stats = compute_workload_kv(ATTENTION, make_workload([1000, 4000, 500], [200, 800, 100], counts=[5, 1, 2], shared_prefix_ratio=0.2), "fp8")
+    # A pool that exactly fits the p99 occupancy of `users` requests
+    pool = users * stats["mean_gb"] + Z_P99 * np.sqrt(users) * stats["std_gb"] + stats["shared_gb"]
+
+    fits = workload_concurrency(pool * (1 + 1e-9), stats, users)
+    assert fits["workload_concurrency"] == users
+    assert fits["kv_occupancy_p99"] == pytest.approx(pool)
+    # Sized at the 99th percentile, so about 1% of the time the pool overflows
+    assert fits["preemption_risk"] == pytest.approx(0.01, abs=1e-4)
+    assert workload_concurrency(pool * (1 - 1e-6), stats, users)["workload_concurrency"] == users - 1
+
+    # More users on the same pool overflow it more often
+    assert workload_concurrency(pool, stats, users + 1)["preemption_risk"] > fits["preemption_risk"]
+
+
+def test_preemption_risk_of_identical_requests_is_all_or_nothing():
+    stats = compute_workload_kv(ATTENTION, make_workload([1024], [256]), "fp8")
+    assert stats["std_gb"] == 0
+    result = workload_concurrency(np.array([10, 11]) * stats["mean_gb"], stats, np.array([11, 11]))
+    assert result["workload_concurrency"].tolist() == [10, 11]
+    assert result["preemption_risk"].tolist() == [1.0, 0.0]
+
+
+@pytest.fixture
+def llama():
+    return hf_loader.get_model_params(os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct"), offline=True)
+
+
+def test_find_best_gpu_sizes_the_kv_pool_for_the_workload(llama):
+    manager = RunpodManager()
+    workload = make_workload([400, 1500], [150, 400], counts=[3, 1])
+    sized = manager.find_best_gpu(llama, user_count=64, max_length=32768, workload=workload)
+    full_length = manager.find_best_gpu(llama, user_count=64, max_length=32768)
+
+    assert sized["details"]["workload_concurrency"] >= 64
+    assert sized["details"]["preemption_risk"] < 0.01
+    # 64 full 32k contexts need far more KV than 64 requests of this traffic
+    assert full_length["details"]["full_length_gen_count"] >= 64
+    assert sized["total_price"] < full_length["total_price"]
+
+
+def test_cli_reports_the_preemption_risk(tmp_path, capsys):
+    trace = tmp_path / "trace.jsonl"
+    trace.write_text("".join(json.dumps({"prompt_tokens": p, "output_tokens": o}) + "\n" for p, o in [(400, 150), (1500, 400), (800, 200)]))
+    main(["--model", os.path.join(FIXTURES_DIR, "llama-3.1-8b-instruct"), "--workload", str(trace), "--users", "32",
+          "--static-prices", "--dry-run"])
+    out = capsys.readouterr().out
+    assert "Workload: prompt mean/p99 900/" in out
+    assert "Workload Concurrency:" in out and "Preemption Risk:" in out